@@ -1,8 +1,55 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routes.analysis import router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .routes.analysis import router, run_analysis_job
+from .services.pipeline import warm_constants, warm_renderer
+from .utils.executor import executor
+from .utils.jobs import job_queue
+from .utils import metrics
+from .utils.metrics import TimingMiddleware
+from .utils.profiler import SamplingProfiler
 
-app = FastAPI(title="Agricultural Planning API", version="1.0.0")
+# Estado do aquecimento em segundo plano (lido por /ready)
+readiness = {"ready": False, "error": None, "warm_up_s": None}
+
+
+def _warm_up():
+    started = time.perf_counter()
+    try:
+        warm_constants()
+        import scipy.linalg  # noqa: F401  (caminho QR)
+        warm_renderer()
+        executor.prestart()
+    except Exception as e:
+        readiness["error"] = str(e)
+        return
+    readiness["warm_up_s"] = time.perf_counter() - started
+    readiness["ready"] = True
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # O servidor aceita conexões logo; matplotlib/seaborn e as constantes
+    # são carregados numa thread e /ready só fica 200 quando terminam
+    executor.initializer = warm_renderer
+    warm_task = asyncio.create_task(asyncio.to_thread(_warm_up))
+    # Fila de jobs: retoma os que ficaram pendentes antes do reinício
+    job_queue.handler = run_analysis_job
+    job_queue.start()
+    yield
+    job_queue.stop()
+    executor.shutdown()
+    if not warm_task.done():
+        warm_task.cancel()
+
+app = FastAPI(title="Agricultural Planning API", version="1.0.0", lifespan=lifespan)
+
+# Server-Timing e histogramas por rota; PROFILE_SLOW_MS liga o profiler
+profiler = SamplingProfiler.from_env()
+app.add_middleware(TimingMiddleware, profiler=profiler)
 
 app.add_middleware(
     CORSMiddleware,
@@ -10,6 +57,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "ETag", "Vary", "Location", "Server-Timing"],
 )
 
 app.include_router(router)
@@ -18,6 +66,34 @@ app.include_router(router)
 def health():
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    """Prontidão: 503 enquanto o aquecimento não terminou (ou se falhou)."""
+    if readiness["ready"]:
+        return {"status": "ready", "warm_up_s": readiness["warm_up_s"]}
+    if readiness["error"] is not None:
+        return JSONResponse(status_code=503, content={"status": "error", "detail": readiness["error"]})
+    return JSONResponse(status_code=503, content={"status": "warming_up"}, headers={"Retry-After": "1"})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Histogramas e medidores no formato de texto do Prometheus."""
+    pool = executor.stats()
+    parts = [h.render() for h in metrics.HISTOGRAMS]
+    parts += [
+        metrics.scalar("agromonitor_executor_in_flight", "Tarefas no pool de análise", pool["in_flight"]),
+        metrics.scalar("agromonitor_executor_queue_depth", "Tarefas aguardando worker", pool["queue_depth"]),
+        metrics.scalar("agromonitor_executor_completed_total", "Tarefas concluídas no pool",
+                       pool["completed"], "counter"),
+        metrics.scalar("agromonitor_executor_rejected_total", "Tarefas recusadas com fila cheia",
+                       pool["rejected"], "counter"),
+    ]
+    if profiler is not None:
+        parts.append(metrics.scalar(
+            "agromonitor_profiles_total", "Perfis de requisições lentas gravados", profiler.dumps, "counter"
+        ))
+    return PlainTextResponse("\n".join(parts) + "\n", media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
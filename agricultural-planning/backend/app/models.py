@@ -1,14 +1,116 @@
-from pydantic import BaseModel
-from typing import List
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+from pydantic_core import core_schema
+from typing import Annotated, List, Literal, Optional, Tuple
+
+class NumpyArray:
+    """Campo pydantic convertido em ndarray de uma vez (np.asarray).
+
+    Tipo, número de dimensões e finitude são checados de forma vetorizada,
+    sem um float Python validado por elemento. ndarrays já no dtype certo
+    (formatos binários) passam sem cópia.
+    """
+
+    def __init__(self, ndim, dtype=np.float64):
+        self.ndim = (ndim,) if isinstance(ndim, int) else tuple(ndim)
+        self.dtype = np.dtype(dtype)
+
+    def __get_pydantic_core_schema__(self, source, handler):
+        return core_schema.no_info_plain_validator_function(
+            self.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda a: a.tolist(), when_used="json"
+            ),
+        )
+
+    def __get_pydantic_json_schema__(self, schema, handler):
+        item = {"type": "integer" if self.dtype.kind in "iu" else "number"}
+        variants = []
+        for ndim in self.ndim:
+            variant = item
+            for _ in range(ndim):
+                variant = {"type": "array", "items": variant}
+            variants.append(variant)
+        return variants[0] if len(variants) == 1 else {"anyOf": variants}
+
+    def validate(self, value):
+        try:
+            array = np.asarray(value)
+        except ValueError:
+            raise ValueError("linhas com tamanhos diferentes")
+        kinds = "iu" if self.dtype.kind in "iu" else "iuf"
+        if array.dtype.kind not in kinds:
+            raise ValueError(f"esperados valores {self.dtype.name} (há nulos ou não numéricos)")
+        if array.ndim not in self.ndim:
+            expected = " ou ".join(str(d) for d in self.ndim)
+            raise ValueError(f"esperadas {expected} dimensões, recebidas {array.ndim}")
+        array = array.astype(self.dtype, copy=False)
+        if self.dtype.kind == "f" and not np.isfinite(array).all():
+            raise ValueError("valores não finitos")
+        return array
+
+Vector = Annotated[np.ndarray, NumpyArray(1)]
+Matrix = Annotated[np.ndarray, NumpyArray(2)]
+IndexVector = Annotated[np.ndarray, NumpyArray(1, np.int64)]
 
 class ModelInput(BaseModel):
     """Input para análise agrícola"""
     resources: List[str]  # ["Terra", "Mão de obra", "Água", "Fertilizante"]
     crops: List[str]      # ["Milho", "Soja", "Trigo"]
-    A: List[List[float]]  # matriz de coeficientes
-    b: List[float]        # vetor de recursos disponíveis
-    profit: List[float]   # lucro por cultura
+    A: Matrix             # matriz de coeficientes
+    b: Vector             # vetor de recursos disponíveis
+    profit: Vector        # lucro por cultura
+    rel_perturb: float = 0.05
+    mc_samples: int = Field(0, ge=0, le=1_000_000)  # amostras Monte Carlo (0 = desligado)
+    mc_perturb_A: float = Field(0.0, ge=0.0)        # perturbação relativa de A no Monte Carlo
+    mc_seed: int = 0                                # semente (resultados reprodutíveis)
+    lambda_method: Literal["lcurve", "gcv"] = "lcurve"  # escolha automática de λ (Tikhonov)
+    perturb_direction: Literal["random", "worst"] = "random"  # Δb aleatório ou de pior caso (vetor singular)
+    equilibrate: bool = False                       # equilibra linhas/colunas de A antes de fatorar (Ruiz)
+
+    @model_validator(mode="after")
+    def _check_shapes(self):
+        return _check_system_shapes(self)
+
+def _check_system_shapes(model):
+    m, n = model.A.shape
+    if m == 0 or n == 0:
+        raise ValueError("A não pode ser vazia")
+    if len(model.b) != m:
+        raise ValueError(f"b tem {len(model.b)} valores, mas A tem {m} linhas")
+    if len(model.profit) != n:
+        raise ValueError(f"profit tem {len(model.profit)} valores, mas A tem {n} colunas")
+    if len(model.resources) != m:
+        raise ValueError(f"resources tem {len(model.resources)} nomes, mas A tem {m} linhas")
+    if len(model.crops) != n:
+        raise ValueError(f"crops tem {len(model.crops)} nomes, mas A tem {n} colunas")
+    return model
+
+class ModelRegistration(BaseModel):
+    """Modelo nomeado para o registro (POST /api/models)"""
+    name: str = Field(..., pattern=r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+    description: Optional[str] = None
+    resources: List[str]
+    crops: List[str]
+    A: Matrix
+    b: Vector
+    profit: Vector
+
+    @model_validator(mode="after")
+    def _check_shapes(self):
+        return _check_system_shapes(self)
+
+class ScenarioInput(BaseModel):
+    """Cenário sobre um modelo registrado: b e profit opcionais substituem os do modelo"""
+    b: Optional[Vector] = None
+    profit: Optional[Vector] = None
     rel_perturb: float = 0.05
+    mc_samples: int = Field(0, ge=0, le=1_000_000)
+    mc_perturb_A: float = Field(0.0, ge=0.0)
+    mc_seed: int = 0
+    lambda_method: Literal["lcurve", "gcv"] = "lcurve"
+    perturb_direction: Literal["random", "worst"] = "random"
+    equilibrate: bool = False
 
 class AnalysisOutput(BaseModel):
     """Output da análise"""
@@ -22,3 +124,93 @@ class AnalysisOutput(BaseModel):
     comparison_base64: str
     sensitivity_base64: str
     regularization_base64: str
+
+class BatchInput(BaseModel):
+    """Input para análise de cenários em lote"""
+    A: Annotated[np.ndarray, NumpyArray((2, 3))]  # matriz única ou uma por cenário
+    B: Matrix                                     # um vetor b por cenário (linhas)
+    profit: Optional[Vector] = None               # lucro por cultura (comum)
+    profits: Optional[Matrix] = None              # lucro por cultura, por cenário
+    ref_index: int = 0                            # cenário de referência para o desvio
+
+    @model_validator(mode="after")
+    def _check_shapes(self):
+        k, m, n = self.B.shape[0], self.A.shape[-2], self.A.shape[-1]
+        if self.B.shape[1] != m:
+            raise ValueError(f"B tem {self.B.shape[1]} colunas, mas A tem {m} linhas")
+        if self.A.ndim == 3 and self.A.shape[0] != k:
+            raise ValueError(f"A tem {self.A.shape[0]} matrizes para {k} cenários")
+        if self.profit is not None and len(self.profit) != n:
+            raise ValueError(f"profit tem {len(self.profit)} valores, mas A tem {n} colunas")
+        if self.profits is not None and self.profits.shape != (k, n):
+            raise ValueError(f"profits deve ter forma ({k}, {n})")
+        return self
+
+class SparseMatrix(BaseModel):
+    """Matriz esparsa: triplas COO (row, col, data) ou arrays CSR (indptr, indices, data)"""
+    shape: Tuple[int, int]
+    data: Vector
+    row: Optional[IndexVector] = None      # COO
+    col: Optional[IndexVector] = None
+    indptr: Optional[IndexVector] = None   # CSR
+    indices: Optional[IndexVector] = None
+
+class SparseAnalysisInput(BaseModel):
+    """Input para o modo esparso (fazendas grandes): min ||A x - b||^2 + lam ||x||^2"""
+    A: SparseMatrix
+    b: Vector
+    profit: Optional[Vector] = None
+    lam: float = Field(0.0, ge=0.0)                 # Tikhonov (LSQR/LSMR amortecido, damp = √lam)
+    solver: Literal["lsmr", "lsqr"] = "lsmr"
+    atol: float = Field(1e-10, gt=0.0)              # tolerâncias de parada
+    btol: float = Field(1e-10, gt=0.0)
+    maxiter: Optional[int] = Field(None, gt=0)
+    estimate_kappa: bool = True                     # estimativa de kappa sem SVD completa
+    equilibrate: bool = False                       # LSMR/LSQR sobre D_r A D_c (Ruiz)
+
+class SessionEdit(BaseModel):
+    """Edição incremental de uma sessão (entrada, linha ou coluna de A, b ou profit)"""
+    op: Literal[
+        "set_entry", "set_row", "set_column", "insert_row", "delete_row",
+        "insert_column", "delete_column", "set_b", "set_profit",
+    ]
+    i: Optional[int] = None          # linha (recurso)
+    j: Optional[int] = None          # coluna (cultura)
+    value: Optional[float] = None    # entrada de A, b[i], profit[j] ou b/lucro da linha/coluna inserida
+    values: Optional[Vector] = None  # linha/coluna de A, ou b/profit completos
+
+    @model_validator(mode="after")
+    def _check_fields(self):
+        required = {
+            "set_entry": ("i", "j", "value"),
+            "set_row": ("i", "values"), "insert_row": ("i", "values"),
+            "set_column": ("j", "values"), "insert_column": ("j", "values"),
+            "delete_row": ("i",), "delete_column": ("j",),
+        }.get(self.op)
+        if required is None:
+            # set_b / set_profit: vetor completo ou (índice, valor)
+            index = "i" if self.op == "set_b" else "j"
+            required = ("values",) if self.values is not None else (index, "value")
+        missing = [f for f in required if getattr(self, f) is None]
+        if missing:
+            raise ValueError(f"{self.op} requer {', '.join(missing)}")
+        if self.value is not None and not np.isfinite(self.value):
+            raise ValueError("value não finito")
+        return self
+
+class SessionPatch(BaseModel):
+    """Edições aplicadas em ordem, numa única atualização da sessão"""
+    edits: List[SessionEdit] = Field(..., min_length=1)
+
+class OptimizeInput(ModelInput):
+    """Input para otimização LP: max profit·x s.a. A x ≤ b (todas as linhas)"""
+    bounds: Optional[List[Tuple[Optional[float], Optional[float]]]] = None  # (mín, máx) por cultura; None = 0 / sem limite
+    method: Literal["auto", "simplex", "ipm"] = "auto"  # HiGHS: dual simplex ou pontos interiores
+    sparse: Optional[bool] = None                        # None = decide pelo tamanho/densidade de A
+    warm_start: bool = True                              # reaproveita a base da última solução do mesmo problema
+
+    @model_validator(mode="after")
+    def _check_bounds(self):
+        if self.bounds is not None and len(self.bounds) != len(self.crops):
+            raise ValueError("bounds deve ter um par (mín, máx) por cultura")
+        return self
@@ -1,101 +1,859 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import base64
+import json
+import os
+import re
+import time
+import uuid
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import numpy as np
-from ..models import ModelInput, AnalysisOutput
-from ..services.linear_algebra import (
-    solve_linear_system, condition_number, 
-    tikhonov_regularization, compare_regularized_solution
+from pydantic import ValidationError
+from ..models import (
+    ModelInput, BatchInput, OptimizeInput, SparseAnalysisInput, SessionPatch,
+    ModelRegistration, ScenarioInput
 )
-from ..services.sensitivity import sensitivity_analysis, local_sensitivity_matrix
-from ..utils.visualization import (
-    plot_sensitivity_heatmap, plot_base_vs_perturbed,
-    plot_sensitivity_comparison, plot_regularization
+from ..services.pipeline import (
+    run_solve_phase, run_render_phase, run_stage_group, stream_plan, CHART_OUTPUTS, EQUALITY_ROWS
 )
+from ..services.scenarios import solve_scenarios, export_scenarios
+from ..services.incremental import IncrementalSystem
+from ..services.registry import registry, register_model, ModelNotFoundError
+from ..services.optimization import optimize_allocation
+from ..services.sparse_analysis import analyze_sparse
+from ..services.linear_algebra import sparse_matrix
+from ..utils.cache import (
+    canonical_key, variant_key, result_cache, analysis_store, image_cache, basis_store,
+    session_store
+)
+from ..utils.executor import executor, QueueFullError
+from ..utils.jobs import job_queue, ClientLimitError
+from ..utils import codec, metrics, sinks
 
+# Extensão das URLs de imagem e media type por chart_format
+CHART_EXTENSIONS = {"png": "png", "webp": "webp", "svg": "svg", "spec": "json"}
+MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+    "spec": "application/json",
+}
 
-
+# Exportações de /api/analyze/batch?export=..., lidas por /api/exports/{id}
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "data/exports")
+EXPORT_RETENTION = float(os.environ.get("EXPORT_RETENTION", str(7 * 86400)))
+EXPORT_PAGE_MAX = 100_000
+EXPORT_ID = re.compile(r"^[0-9a-f]{64}$")
 
 router = APIRouter(prefix="/api", tags=["analysis"])
 
-def build_ill_conditioned_example():
-    """Exemplo mal condicionado."""
-    A_ill = np.array([
-        [1.0,   1.0,   1.0],
-        [2.01,  2.00,  1.99],
-        [3.01,  3.00,  2.99]
-    ])
-    b_ill = np.array([100.0, 200.0, 300.0])
-    return A_ill, b_ill
-
-@router.post("/analyze")
-async def analyze(input_data: ModelInput):
+
+def _etag_matches(request, etag):
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+
+
+# Partes opcionais da resposta que não são gráficos
+INCLUDE_EXTRAS = ("derivatives",)
+
+
+def _parse_include(include, images):
+    """(gráficos, derivatives) pedidos em `include`.
+
+    Omitido: todos os gráficos e sem o tensor dx_dA. Com images=none os
+    gráficos listados são ignorados.
+    """
+    if include is None:
+        return () if images == "none" else CHART_OUTPUTS, False
+    parts = tuple(c.strip() for c in include.split(",") if c.strip())
+    options = CHART_OUTPUTS + INCLUDE_EXTRAS
+    unknown = [c for c in parts if c not in options]
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Itens desconhecidos em include: {', '.join(unknown)}. Opções: {', '.join(options)}"
+        )
+    charts = () if images == "none" else tuple(c for c in parts if c in CHART_OUTPUTS)
+    return charts, "derivatives" in parts
+
+
+def _negotiate(request):
+    """Formato da resposta pelo Accept (406 se nenhum suportado)."""
+    media_type = codec.response_format(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(
+            status_code=406, detail=f"Formatos de resposta: {', '.join(codec.FORMATS)}"
+        )
+    return media_type
+
+
+async def _read_input(request, model):
+    """Corpo da requisição em JSON, MessagePack ou buffer float64.
+
+    Em JSON o pydantic decodifica direto dos bytes; nos formatos binários os
+    arrays saem de np.frombuffer. Nos dois casos os campos NumpyArray chegam
+    à rota como float64 já validados, sem cópia adicional.
+    """
     try:
-        A_base = np.array(input_data.A)
-        b_base = np.array(input_data.b)
-        profit = np.array(input_data.profit)
-
-        # Solução base
-        A_eq = A_base[:3, :]
-        b_eq = b_base[:3]
-        x_base = solve_linear_system(A_eq, b_eq)
-        kappa_base = condition_number(A_eq)
-        total_profit_base = float(profit @ x_base)
-
-        # Sensibilidade COM perturbação do usuário (para diagnósticos)
-        sens_base = sensitivity_analysis(A_eq, b_eq, input_data.rel_perturb)
-        
-        # NOVO: Lucro perturbado PESSIMISTA (redução de recursos)
-        b_perturbed_pessimistic = b_eq * (1 - input_data.rel_perturb)
-        x_pert_pessimistic = solve_linear_system(A_eq, b_perturbed_pessimistic)
-        total_profit_pert_pessimistic = float(profit @ x_pert_pessimistic)
-        
-        # Lucro perturbado OTIMISTA (aumento de recursos)
-        b_perturbed_optimistic = b_eq * (1 + input_data.rel_perturb)
-        x_pert_optimistic = solve_linear_system(A_eq, b_perturbed_optimistic)
-        total_profit_pert_optimistic = float(profit @ x_pert_optimistic)
-
-        # Bem x mal condicionado
-        A_ill, b_ill = build_ill_conditioned_example()
-        sens_well = sensitivity_analysis(A_eq, b_eq, input_data.rel_perturb)
-        sens_ill = sensitivity_analysis(A_ill, b_ill, input_data.rel_perturb)
-
-        # Regularização
-        lam = 10.0
-        x_normal_ill, x_reg_ill = compare_regularized_solution(A_ill, b_ill, lam=lam)
-
-        # Visualizações
-        S_base = local_sensitivity_matrix(A_base, x_base)
-        heatmap_img = plot_sensitivity_heatmap(S_base, input_data.resources, input_data.crops)
-        comparison_img = plot_base_vs_perturbed(
-            sens_base["x_base"],
-            sens_base["x_pert_b"],
-            input_data.crops,
-            fixed_perturb=input_data.rel_perturb
+        media_type = codec.request_format(request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    body = await request.body()
+    try:
+        with metrics.timed("parse"):
+            if media_type == codec.JSON:
+                return model.model_validate_json(body)
+            return model.model_validate(codec.decode(body, media_type))
+    except ValidationError as e:
+        # Sem ecoar a entrada: com matrizes grandes o erro teria o tamanho do corpo
+        errors = e.errors(include_url=False, include_context=False, include_input=False)
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in errors])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _encode(payload, media_type):
+    """Payload (com ndarrays) → bytes no formato negociado."""
+    with metrics.timed("serialize"):
+        if media_type == codec.JSON:
+            return JSONResponse(_to_json(payload)).body
+        return codec.encode(payload, media_type)
+
+
+async def _run(fn, *args):
+    """Executa uma fase no pool, convertendo erros em respostas HTTP."""
+    try:
+        return await executor.run(fn, *args)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
-        sensitivity_img = plot_sensitivity_comparison(sens_well, sens_ill)
-        regularization_img = plot_regularization(x_normal_ill, x_reg_ill, ["C1", "C2", "C3"], lam)
-
-        return {
-            "x_base": [float(x) for x in x_base],
-            "kappa": float(kappa_base),
-            "profit_base": total_profit_base,
-            "profit_pert_pessimistic": total_profit_pert_pessimistic,  # NOVO
-            "profit_pert_optimistic": total_profit_pert_optimistic,    # NOVO
-            "rel_dx": float(sens_base["rel_dx"]),
-            "rel_db": float(sens_base["rel_db"]),
-            "bound": float(sens_base["bound"]),
-            "heatmap": heatmap_img,
-            "comparison": comparison_img,
-            "sensitivity": sensitivity_img,
-            "regularization": regularization_img,
-            "diagnostics": {
-                "kappa_well": float(sens_well["kappa"]),
-                "kappa_ill": float(sens_ill["kappa"]),
-                "rel_dx_well": float(sens_well["rel_dx"]),
-                "rel_dx_ill": float(sens_ill["rel_dx"]),
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _request_body(model):
+    """openapi_extra das rotas que leem o corpo com _read_input."""
+    binary = {"schema": {"type": "string", "format": "binary"}}
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def inline(node):
+        # Submodelos ($defs) não entram em components: resolve no lugar
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(defs[node["$ref"].rsplit("/", 1)[-1]])
+            return {k: inline(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [inline(v) for v in node]
+        return node
+
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                codec.JSON: {"schema": inline(schema)},
+                codec.MSGPACK: binary,
+                codec.FLOAT64: binary,
             },
         }
+    }
+
+
+@router.post("/analyze", openapi_extra=_request_body(ModelInput))
+async def analyze(
+    request: Request,
+    images: Literal["inline", "url", "none"] = Query("inline"),
+    include: Optional[str] = Query(
+        None, description="Gráficos e/ou derivatives (tensor dx_dA), separados por vírgula"
+    ),
+    chart_format: Literal["png", "webp", "svg", "spec"] = Query("png"),
+):
+    charts, derivatives = _parse_include(include, images)
+    media_type = _negotiate(request)
+    input_data = await _read_input(request, ModelInput)
+    return await _analysis_response(
+        request, input_data, images, charts, chart_format, media_type, derivatives
+    )
+
+
+async def _analysis_response(request, input_data, images, charts, chart_format, media_type,
+                             derivatives=False, precomputed=None):
+    """Corpo de /api/analyze (com ETag e cache de resultados) para uma entrada validada."""
+    A_base, b_base, profit = input_data.A, input_data.b, input_data.profit
+    mc_options = _mc_options(input_data)
+    analysis_id = _analysis_id(input_data, charts)
+    key = variant_key(
+        analysis_id, images, ",".join(charts), input_data.lambda_method, chart_format, media_type,
+        *(("derivatives",) if derivatives else ())
+    )
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = result_cache.get(key)
+    if body is not None and images == "url" and analysis_store.get(analysis_id) is None:
+        body = None  # as URLs dependem dos resultados numéricos armazenados
+    if body is None:
+        # Álgebra linear e gráficos rodam fora do event loop
+        numeric = await _run(
+            run_solve_phase, A_base, b_base, profit, input_data.rel_perturb, mc_options,
+            input_data.lambda_method, input_data.perturb_direction, precomputed,
+            input_data.equilibrate, derivatives
+        )
+        rendered, image_urls = {}, None
+        if images == "inline" and charts:
+            rendered = await _run(
+                run_render_phase, numeric, input_data.resources, input_data.crops,
+                input_data.rel_perturb, charts, chart_format
+            )
+        elif images == "url":
+            # Renderização adiada até o primeiro GET de cada imagem
+            analysis_store.set(analysis_id, (
+                numeric, input_data.resources, input_data.crops, input_data.rel_perturb
+            ))
+            ext = CHART_EXTENSIONS[chart_format]
+            image_urls = {
+                chart: f"{request.scope.get('root_path', '')}/api/analysis/{analysis_id}/{chart}.{ext}"
+                for chart in charts
+            }
+
+        body = _encode(_build_payload(
+            numeric, rendered, image_urls, chart_format if charts else None
+        ), media_type)
+        result_cache.set(key, body)
+
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _analysis_id(input_data, charts):
+    """Resultado determinístico: a chave identifica o conteúdo da resposta.
+
+    Rótulos só entram na chave quando há gráficos; a equilibragem, só quando
+    ligada (as chaves das análises sem ela não mudam).
+    """
+    return variant_key(canonical_key(
+        (input_data.A, input_data.b, input_data.profit),
+        (input_data.rel_perturb, input_data.mc_samples, input_data.mc_perturb_A, input_data.mc_seed),
+        labels=(input_data.resources, input_data.crops) if charts else None
+    ), input_data.perturb_direction, *(("equilibrate",) if input_data.equilibrate else ()))
+
+
+def _mc_options(input_data):
+    if not input_data.mc_samples:
+        return None
+    return {
+        "samples": input_data.mc_samples,
+        "perturb_A": input_data.mc_perturb_A,
+        "seed": input_data.mc_seed,
+    }
+
+
+def _sse(event, data):
+    body = json.dumps(_to_json(data), ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {body}\n\n"
+
+
+@router.post("/analyze/stream", openapi_extra=_request_body(ModelInput))
+async def analyze_stream(
+    request: Request,
+    images: Literal["inline", "none"] = Query("inline"),
+    include: Optional[str] = Query(
+        None, description="Gráficos e/ou derivatives (tensor dx_dA), separados por vírgula"
+    ),
+    chart_format: Literal["png", "webp", "svg", "spec"] = Query("png"),
+):
+    """Análise em Server-Sent Events, um evento por grupo de estágios.
+
+    Ordem: solution (x_base, kappa, lucros), sensitivity, regularization,
+    monte_carlo (se pedido), um evento por gráfico e done. Cada grupo roda
+    no pool; se o cliente desconectar, os grupos restantes não são enviados.
+    """
+    started = time.perf_counter()
+    charts, derivatives = _parse_include(include, images)
+    input_data = await _read_input(request, ModelInput)
+    mc_options = _mc_options(input_data)
+    plan = stream_plan(mc_options, charts)
+    values = {
+        "A_base": input_data.A, "b_base": input_data.b, "profit": input_data.profit,
+        "rel_perturb": input_data.rel_perturb, "mc_options": mc_options,
+        "lambda_method": input_data.lambda_method,
+        "perturb_direction": input_data.perturb_direction,
+        "equilibrate": input_data.equilibrate, "derivatives": derivatives,
+        "resources": input_data.resources, "crops": input_data.crops,
+        "chart_format": chart_format,
+    }
+
+    def event(name, names, values):
+        elapsed = {"elapsed_ms": (time.perf_counter() - started) * 1e3}
+        if name == "chart":
+            # Gráfico já enviado não volta para o pool nos grupos seguintes
+            chart = names[0]
+            return _sse(name, {"name": chart, "format": chart_format,
+                               "data": values.pop(chart), **elapsed})
+        return _sse(name, {**STREAM_SECTIONS[name](values), **elapsed})
+
+    # Primeiro grupo antes de abrir o stream: entrada inválida e fila cheia
+    # ainda respondem com o status HTTP
+    values = await _run(run_stage_group, values, plan[0][1])
+    first = event(*plan[0], values)
+
+    async def events(values):
+        yield first
+        for name, names in plan[1:]:
+            if await request.is_disconnected():
+                return
+            try:
+                values = await executor.run(run_stage_group, values, names)
+            except Exception as e:
+                yield _sse("error", {"stage": name, "detail": str(e)})
+                return
+            yield event(name, names, values)
+        yield _sse("done", {"elapsed_ms": (time.perf_counter() - started) * 1e3})
+
+    return StreamingResponse(
+        events(values), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def run_analysis_job(params, input_blob):
+    """Handler da fila de jobs: mesma análise de /api/analyze, em JSON.
+
+    Roda na thread worker da fila, fora do pool das requisições síncronas.
+    O corpo também vai para o cache de resultados, com a chave que um
+    /api/analyze equivalente usaria.
+    """
+    input_data = ModelInput.model_validate(codec.decode_float64(input_blob))
+    charts, chart_format = tuple(params["charts"]), params["chart_format"]
+    numeric = run_solve_phase(
+        input_data.A, input_data.b, input_data.profit, input_data.rel_perturb,
+        _mc_options(input_data), input_data.lambda_method, input_data.perturb_direction,
+        equilibrate=input_data.equilibrate, derivatives=params.get("derivatives", False)
+    )
+    rendered = {}
+    if charts:
+        rendered = run_render_phase(
+            numeric, input_data.resources, input_data.crops, input_data.rel_perturb,
+            charts, chart_format
+        )
+    body = _encode(_build_payload(numeric, rendered, None, chart_format if charts else None), codec.JSON)
+    result_cache.set(params["cache_key"], body)
+    return body
+
+
+def _job_url(request, job_id):
+    return f"{request.scope.get('root_path', '')}/api/jobs/{job_id}"
+
+
+@router.post("/jobs", status_code=202, openapi_extra=_request_body(ModelInput))
+async def submit_job(
+    request: Request,
+    images: Literal["inline", "none"] = Query("inline"),
+    include: Optional[str] = Query(
+        None, description="Gráficos e/ou derivatives (tensor dx_dA), separados por vírgula"
+    ),
+    chart_format: Literal["png", "webp", "svg", "spec"] = Query("png"),
+):
+    """Enfileira uma análise longa e devolve o id do job (202).
+
+    O id é a chave de conteúdo: uma submissão idêntica a um job existente
+    devolve esse job (200) em vez de enfileirar outro. O cliente é o
+    cabeçalho X-Client-Id (ou o IP) e tem um limite de jobs ativos (429).
+    """
+    charts, derivatives = _parse_include(include, images)
+    input_data = await _read_input(request, ModelInput)
+    cache_key = variant_key(
+        _analysis_id(input_data, charts), images, ",".join(charts), input_data.lambda_method,
+        chart_format, codec.JSON, *(("derivatives",) if derivatives else ())
+    )
+    job_id = variant_key(cache_key, "job")
+    client = request.headers.get("x-client-id") or (request.client.host if request.client else "-")
+    params = {"charts": list(charts), "chart_format": chart_format, "cache_key": cache_key,
+              "derivatives": derivatives}
+    try:
+        # Entrada guardada no formato float64 (arrays em bytes, sem JSON por elemento)
+        status, created = await asyncio.to_thread(
+            job_queue.submit, job_id, client, params,
+            codec.encode_float64(input_data.model_dump())
+        )
+    except ClientLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+    url = _job_url(request, job_id)
+    return JSONResponse(
+        status_code=202 if created else 200,
+        content={"id": job_id, "status": status, "url": url},
+        headers={"Location": url},
+    )
+
+
+@router.get("/jobs/stats")
+async def job_stats():
+    """Jobs por estado, workers e limite por cliente."""
+    return await asyncio.to_thread(job_queue.stats)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Estado do job; quando "done", `result` traz a resposta de /api/analyze."""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    result = job.pop("result")
+    body = json.dumps(job, separators=(",", ":")).encode()
+    if result:
+        # Resultado já está em JSON: entra no corpo sem ser decodificado
+        body = body[:-1] + b',"result":' + result + b"}"
+    return Response(content=body, media_type=codec.JSON)
+
+
+@router.get("/analysis/{analysis_id}/{chart}.{ext}")
+async def analysis_image(analysis_id: str, chart: str, ext: str, request: Request):
+    """Gráfico de uma análise, renderizado no primeiro acesso e memoizado."""
+    chart_format = next((f for f, e in CHART_EXTENSIONS.items() if e == ext), None)
+    if chart not in CHART_OUTPUTS or chart_format is None:
+        raise HTTPException(status_code=404, detail=f"Gráfico desconhecido: {chart}.{ext}")
+    etag = f'"{analysis_id}-{chart}-{ext}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    image_key = f"{analysis_id}:{chart}.{ext}"
+    content = image_cache.get(image_key)
+    if content is None:
+        stored = analysis_store.get(analysis_id)
+        if stored is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Análise não encontrada ou expirada. Reenvie /api/analyze."
+            )
+        numeric, resources, crops, rel_perturb = stored
+        rendered = await _run(
+            run_render_phase, numeric, resources, crops, rel_perturb, (chart,), chart_format
+        )
+        if chart_format == "spec":
+            content = json.dumps(rendered[chart], ensure_ascii=False).encode()
+        else:
+            content = base64.b64decode(rendered[chart])
+        image_cache.set(image_key, content)
+
+    return Response(content=content, media_type=MEDIA_TYPES[chart_format], headers=headers)
+
+
+@router.post("/analyze/batch", openapi_extra=_request_body(BatchInput))
+async def analyze_batch(
+    request: Request,
+    export: Optional[Literal["npy", "parquet"]] = Query(
+        None, description="Grava os resultados em disco em vez de devolvê-los"
+    ),
+    chunk_rows: int = Query(65536, ge=1, le=1_000_000, description="Cenários por bloco exportado"),
+):
+    """Resolve muitos cenários de b (e de lucro) em uma única chamada vetorizada.
+
+    Com `export`, os resultados são calculados e gravados bloco a bloco
+    (memória limitada a `chunk_rows` cenários) e a resposta traz o id para
+    lê-los por intervalo em /api/exports/{id}.
+    """
+    media_type = _negotiate(request)
+    input_data = await _read_input(request, BatchInput)
+    profits = input_data.profits if input_data.profits is not None else input_data.profit
+    # Mesmas restrições de igualdade de /api/analyze
+    A = input_data.A[..., :EQUALITY_ROWS, :]
+    B = input_data.B[:, :EQUALITY_ROWS]
+    if export is not None:
+        return await _export_batch(request, A, B, profits, input_data.ref_index, export, chunk_rows)
+
+    result = await _run(solve_scenarios, A, B, profits, input_data.ref_index)
+    payload = {
+        "n_scenarios": int(B.shape[0]),
+        "x": result["x"],
+        "profit": result["profit"],
+        "rel_dev": result["rel_dev"],
+        "kappa": result["kappa"],
+    }
+    return Response(content=_encode(payload, media_type), media_type=media_type)
+
+
+def _export_path(export_id):
+    """Caminho de uma exportação existente (diretório npy ou .parquet), ou None."""
+    for format in sinks.SINK_FORMATS:
+        path = os.path.join(EXPORT_DIR, export_id + sinks.EXTENSIONS[format])
+        if os.path.exists(path):
+            return path
+    return None
+
+
+async def _export_batch(request, A, B, profits, ref_index, export, chunk_rows):
+    if not sinks.available(export):
+        raise HTTPException(status_code=501, detail=f"Exportação {export} indisponível (pyarrow)")
+    # Mesma entrada, mesmo id: exportação já gravada é reaproveitada
+    export_id = variant_key(canonical_key(
+        (A, B, np.empty(0) if profits is None else profits), (ref_index,)
+    ), export)
+    path = os.path.join(EXPORT_DIR, export_id + sinks.EXTENSIONS[export])
+    created = not os.path.exists(path)
+    if created:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        await asyncio.to_thread(sinks.prune, EXPORT_DIR, EXPORT_RETENTION)
+        await _run(export_scenarios, A, B, profits, ref_index, path, export, chunk_rows)
+    results = await asyncio.to_thread(sinks.open_results, path)
+    url = f"{request.scope.get('root_path', '')}/api/exports/{export_id}"
+    return JSONResponse(
+        status_code=201 if created else 200,
+        content={
+            "id": export_id, "format": export, "rows": results.rows,
+            "columns": results.layout, "kappa": results.metadata.get("kappa"), "url": url,
+        },
+        headers={"Location": url},
+    )
+
+
+@router.get("/exports/{export_id}")
+async def read_export(
+    export_id: str,
+    request: Request,
+    start: int = Query(0, ge=0),
+    stop: Optional[int] = Query(None, ge=0, description="Exclusivo; padrão: start + limit"),
+    limit: int = Query(10_000, ge=1, le=EXPORT_PAGE_MAX),
+    columns: Optional[str] = Query(None, description="Colunas separadas por vírgula"),
+):
+    """Linhas [start, stop) de uma exportação, lendo só os blocos do intervalo.
+
+    No máximo `limit` linhas por resposta; `next` é o start da página
+    seguinte (null no fim).
+    """
+    media_type = _negotiate(request)
+    path = _export_path(export_id) if EXPORT_ID.match(export_id) else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Exportação não encontrada ou expirada")
+    results = await asyncio.to_thread(sinks.open_results, path)
+    stop = min(start + limit, results.rows if stop is None else stop, results.rows)
+    names = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    try:
+        data = await asyncio.to_thread(sinks.read_results, path, start, max(stop, start), names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    payload = {
+        "id": export_id, "rows": results.rows, "start": start, "stop": max(stop, start),
+        "next": stop if stop < results.rows else None, **data,
+    }
+    return Response(content=_encode(payload, media_type), media_type=media_type)
+
+
+@router.post("/analyze/sparse", openapi_extra=_request_body(SparseAnalysisInput))
+async def analyze_sparse_route(request: Request):
+    """Modo esparso: LSMR/LSQR e kappa estimado, sem matrizes densas."""
+    media_type = _negotiate(request)
+    input_data = await _read_input(request, SparseAnalysisInput)
+    try:
+        M = input_data.A
+        A = sparse_matrix(M.shape, M.data, M.row, M.col, M.indptr, M.indices)
+        if len(input_data.b) != A.shape[0]:
+            raise ValueError("b deve ter um valor por linha de A")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = await _run(
+        analyze_sparse, A, input_data.b, input_data.profit, input_data.lam, input_data.solver,
+        input_data.atol, input_data.btol, input_data.maxiter, input_data.estimate_kappa,
+        input_data.equilibrate
+    )
+    return Response(content=_encode(result, media_type), media_type=media_type)
+
+
+@router.post("/optimize", openapi_extra=_request_body(OptimizeInput))
+async def optimize(request: Request):
+    """Alocação ótima (LP) com preços-sombra por recurso."""
+    media_type = _negotiate(request)
+    input_data = await _read_input(request, OptimizeInput)
+    A, b, profit = input_data.A, input_data.b, input_data.profit
+    try:
+        bounds = input_data.bounds
+        # A base só depende de A, lucro e limites: novo b reaproveita a anterior
+        lo_hi = np.array(
+            [[np.nan if v is None else v for v in pair] for pair in bounds] if bounds else [], dtype=float
+        )
+        basis_key = variant_key(
+            canonical_key((A, profit, lo_hi)), input_data.method, str(input_data.sparse)
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    basis = basis_store.get(basis_key) if input_data.warm_start else None
+    result = await _run(
+        optimize_allocation, A, b, profit, bounds, input_data.method, input_data.sparse, basis
+    )
+    if result["basis"] is not None and result["basis"] is not basis:
+        basis_store.set(basis_key, result["basis"])
+
+    summary = {k: v for k, v in result.items() if k != "basis"}
+    payload = {**summary, "resources": input_data.resources, "crops": input_data.crops}
+    return Response(content=_encode(payload, media_type), media_type=media_type)
+
+
+def _model_meta(meta):
+    return {k: v for k, v in meta.items() if k != "key"}
+
+
+@router.post("/models", status_code=201, openapi_extra=_request_body(ModelRegistration))
+async def create_model(request: Request):
+    """Registra uma versão de um modelo nomeado (A, b, profit e rótulos).
+
+    A SVD, a pseudo-inversa e o caminho λ das restrições de igualdade são
+    calculados uma vez e gravados com os arrays. Conteúdo igual ao da última
+    versão não cria outra (200).
+    """
+    data = await _read_input(request, ModelRegistration)
+    meta, created = await _run(
+        register_model, data.name, data.resources, data.crops, data.A, data.b, data.profit,
+        data.description
+    )
+    url = f"{request.scope.get('root_path', '')}/api/models/{meta['name']}?version={meta['version']}"
+    return JSONResponse(
+        status_code=201 if created else 200, content=_model_meta(meta), headers={"Location": url}
+    )
+
+
+@router.get("/models")
+async def list_models():
+    """Última versão de cada modelo registrado."""
+    return [_model_meta(meta) for meta in await asyncio.to_thread(registry.list)]
+
+
+@router.get("/models/{name}")
+async def get_model(name: str, version: Optional[int] = Query(None, description="Padrão: a última")):
+    """Metadados de uma versão (ou de todas, com `version` omitido)."""
+    try:
+        if version is not None:
+            model = await asyncio.to_thread(registry.get, name, version)
+            return _model_meta(model.meta)
+        versions = await asyncio.to_thread(registry.versions, name)
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"name": name, "versions": [_model_meta(meta) for meta in versions]}
+
+
+@router.post("/models/{name}/analyze", openapi_extra=_request_body(ScenarioInput))
+async def analyze_model(
+    name: str,
+    request: Request,
+    version: Optional[int] = Query(None, description="Padrão: a última"),
+    images: Literal["inline", "url", "none"] = Query("inline"),
+    include: Optional[str] = Query(
+        None, description="Gráficos e/ou derivatives (tensor dx_dA), separados por vírgula"
+    ),
+    chart_format: Literal["png", "webp", "svg", "spec"] = Query("png"),
+):
+    """/api/analyze sobre um modelo registrado, com b/profit do cenário.
+
+    A fatoração registrada (e o caminho λ, se as restrições de igualdade de
+    b não mudaram) entra pronta no grafo de análise. A resposta e o cache
+    são os de um /api/analyze com a mesma entrada.
+    """
+    charts, derivatives = _parse_include(include, images)
+    media_type = _negotiate(request)
+    scenario = await _read_input(request, ScenarioInput)
+    try:
+        model = await asyncio.to_thread(registry.get, name, version)
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    m, n = model.meta["shape"]
+    if scenario.b is not None and len(scenario.b) != m:
+        raise HTTPException(status_code=400, detail=f"b deve ter {m} valores")
+    if scenario.profit is not None and len(scenario.profit) != n:
+        raise HTTPException(status_code=400, detail=f"profit deve ter {n} valores")
+
+    # Campos já validados no registro: sem nova passada sobre A
+    input_data = ModelInput.model_construct(
+        resources=model.meta["resources"], crops=model.meta["crops"], A=model.A,
+        b=model.b if scenario.b is None else scenario.b,
+        profit=model.profit if scenario.profit is None else scenario.profit,
+        **scenario.model_dump(exclude={"b", "profit"}),
+    )
+    # Fatoração registrada é a de A sem equilibragem
+    precomputed = None
+    if not scenario.equilibrate:
+        precomputed = await asyncio.to_thread(model.precomputed, scenario.b)
+    return await _analysis_response(
+        request, input_data, images, charts, chart_format, media_type, derivatives, precomputed
+    )
+
+
+def _session(session_id):
+    system = session_store.get(session_id)
+    if system is None:
+        raise HTTPException(status_code=404, detail="Sessão não encontrada ou expirada")
+    return system
+
+
+def _session_state(system):
+    with system.lock:
+        return system.state()
+
+
+@router.post("/sessions", status_code=201, openapi_extra=_request_body(ModelInput))
+async def create_session(
+    request: Request,
+    rows: Literal["equality", "all"] = Query(
+        "equality", description="equality: as restrições de igualdade de /api/analyze"
+    ),
+):
+    """Abre uma sessão de edição: fatora A uma vez e devolve a solução.
+
+    As edições seguintes (PATCH) atualizam a fatoração em O(m·n) em vez de
+    refazer a análise do zero.
+    """
+    media_type = _negotiate(request)
+    input_data = await _read_input(request, ModelInput)
+    k = EQUALITY_ROWS if rows == "equality" else len(input_data.b)
+    try:
+        system = await asyncio.to_thread(
+            IncrementalSystem, input_data.A[:k], input_data.b[:k], input_data.profit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    state = await asyncio.to_thread(_session_state, system)
+    session_id = uuid.uuid4().hex
+    session_store.set(session_id, system)
+    url = f"{request.scope.get('root_path', '')}/api/sessions/{session_id}"
+    return Response(
+        status_code=201, content=_encode({"id": session_id, **state}, media_type),
+        media_type=media_type, headers={"Location": url},
+    )
+
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str, request: Request):
+    """Solução atual da sessão."""
+    media_type = _negotiate(request)
+    state = await asyncio.to_thread(_session_state, _session(session_id))
+    return Response(content=_encode({"id": session_id, **state}, media_type), media_type=media_type)
+
+
+@router.patch("/sessions/{session_id}", openapi_extra=_request_body(SessionPatch))
+async def edit_session(session_id: str, request: Request):
+    """Aplica edições (entrada, linha ou coluna de A, b, lucro) e re-resolve.
+
+    As edições são validadas antes: se uma for inválida (400), nenhuma é
+    aplicada. `elapsed_ms` é o tempo de atualização + solução.
+    """
+    media_type = _negotiate(request)
+    system = _session(session_id)
+    patch = await _read_input(request, SessionPatch)
+    edits = [edit.model_dump(exclude_none=True) for edit in patch.edits]
+
+    def apply():
+        started = time.perf_counter()
+        with system.lock:
+            system.apply(edits)
+            state = system.state()
+        state["elapsed_ms"] = (time.perf_counter() - started) * 1e3
+        return state
+
+    try:
+        state = await asyncio.to_thread(apply)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    session_store.set(session_id, system)  # renova o TTL
+    return Response(content=_encode({"id": session_id, **state}, media_type), media_type=media_type)
+
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    """Encerra a sessão e libera a fatoração."""
+    if session_store.pop(session_id) is None:
+        raise HTTPException(status_code=404, detail="Sessão não encontrada ou expirada")
+    return Response(status_code=204)
+
+
+def _solution_section(numeric):
+    section = {
+        "x_base": numeric["x_base"],
+        "kappa": float(numeric["kappa"]),
+        "profit_base": numeric["profit_base"],
+        "profit_pert_pessimistic": numeric["profit_pert_pessimistic"],  # NOVO
+        "profit_pert_optimistic": numeric["profit_pert_optimistic"],    # NOVO
+    }
+    if numeric.get("equilibrated") is not None:
+        # Só com equilibrate: False se A (posto incompleto) não foi escalada
+        section["equilibrated"] = numeric["equilibrated"]
+    if numeric.get("kappa_scaled") is not None:
+        # Só com equilibrate: kappa de D_r A D_c, a matriz de fato fatorada
+        section["kappa_scaled"] = float(numeric["kappa_scaled"])
+    return section
+
+
+def _sensitivity_section(numeric):
+    sens_base = numeric["sens_base"]
+    sens_well = numeric["sens_well"]
+    sens_ill = numeric["sens_ill"]
+    return {
+        "rel_dx": float(sens_base["rel_dx"]),
+        "rel_db": float(sens_base["rel_db"]),
+        "bound": float(sens_base["bound"]),
+        "diagnostics": {
+            "kappa_well": float(sens_well["kappa"]),
+            "kappa_ill": float(sens_ill["kappa"]),
+            "rel_dx_well": float(sens_well["rel_dx"]),
+            "rel_dx_ill": float(sens_ill["rel_dx"]),
+        },
+        "analytic_sensitivity": numeric["analytic"],
+    }
+
+
+# Trechos da resposta de /api/analyze, também enviados um a um no streaming
+STREAM_SECTIONS = {
+    "solution": _solution_section,
+    "sensitivity": _sensitivity_section,
+    "regularization": lambda numeric: {"tikhonov": numeric["tikhonov"]},
+    "monte_carlo": lambda numeric: {"monte_carlo": numeric["monte_carlo"]},
+}
+
+
+def _build_payload(numeric, images, image_urls=None, chart_format=None):
+    payload = {}
+    for name, section in STREAM_SECTIONS.items():
+        if name != "monte_carlo" or "monte_carlo" in numeric:
+            payload.update(section(numeric))
+    payload.update(images)
+    if image_urls is not None:
+        payload["images"] = image_urls
+    if chart_format is not None:
+        payload["chart_format"] = chart_format
+    return payload
+
+
+def _to_json(summary):
+    """Converte arrays/escalares NumPy de um resumo em tipos JSON (não finitos viram null)."""
+    def convert(v):
+        if isinstance(v, dict):
+            return _to_json(v)
+        if isinstance(v, np.ndarray):
+            if v.dtype.kind == "f" and not np.isfinite(v).all():
+                return convert(np.where(np.isfinite(v), v, None))
+            return v.tolist()
+        if isinstance(v, np.generic):
+            v = v.item()
+        if isinstance(v, float) and not np.isfinite(v):
+            return None
+        return v
+    return {k: convert(v) for k, v in summary.items()}
+
+
+@router.get("/executor/stats")
+def executor_stats():
+    """Profundidade da fila e tempos de espera do pool de análise."""
+    return executor.stats()
+
 
+@router.get("/cache/stats")
+def cache_stats():
+    """Acertos, erros e ocupação dos caches de resultados e imagens."""
+    return {"results": result_cache.stats(), "images": image_cache.stats()}
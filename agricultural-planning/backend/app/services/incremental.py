@@ -0,0 +1,310 @@
+import threading
+import time
+
+import numpy as np
+
+# Atualizações seguidas antes de refatorar do zero (limita o acúmulo de erro
+# de arredondamento em Q)
+REFACTOR_EVERY = 200
+
+# Operações de edição e seus argumentos. Em insert_row/insert_column,
+# `value` é o b da nova linha / o lucro da nova coluna.
+OPS = {
+    "set_entry": ("i", "j", "value"),
+    "set_row": ("i", "values"),
+    "set_column": ("j", "values"),
+    "insert_row": ("i", "values", "value"),
+    "delete_row": ("i",),
+    "insert_column": ("j", "values", "value"),
+    "delete_column": ("j",),
+    "set_b": ("values", "i", "value"),
+    "set_profit": ("values", "j", "value"),
+}
+
+
+def _check_edit(edit, m, n):
+    """Valida índices e tamanhos de uma edição para A m×n; devolve a nova forma."""
+    op = edit["op"]
+    i, j, values = edit.get("i"), edit.get("j"), edit.get("values")
+    insert_row, insert_col = op == "insert_row", op == "insert_column"
+    if i is not None and not 0 <= i < m + insert_row:
+        raise ValueError(f"índice de linha fora do intervalo: {i}")
+    if j is not None and not 0 <= j < n + insert_col:
+        raise ValueError(f"índice de coluna fora do intervalo: {j}")
+    if values is not None:
+        size = n if op in ("set_row", "insert_row", "set_profit") else m
+        if len(values) != size:
+            raise ValueError(f"values deve ter {size} valores")
+    if op == "insert_row":
+        return m + 1, n
+    if op == "insert_column":
+        return m, n + 1
+    if op == "delete_row":
+        if m == 1:
+            raise ValueError("A precisa de ao menos uma linha")
+        return m - 1, n
+    if op == "delete_column":
+        if n == 1:
+            raise ValueError("A precisa de ao menos uma coluna")
+        return m, n - 1
+    return m, n
+
+
+class IncrementalSystem:
+    """Sistema A x ≈ b com a QR mantida por atualizações de posto baixo.
+
+    Com m ≥ n guarda A = QR (econômica) e resolve x = R⁻¹Qᵀb; com m < n
+    guarda Aᵀ = QR e devolve a solução de norma mínima x = Q R⁻ᵀ b. Cada
+    edição (entrada, linha, coluna, inserção ou remoção) atualiza Q e R com
+    rotações de Givens (scipy.linalg.qr_update/qr_insert/qr_delete) em
+    O(m·n), sem refatorar. Se R ficar numericamente singular, a solução vem
+    da SVD de A (custo cheio), até uma edição devolver o posto completo.
+    """
+
+    def __init__(self, A, b, profit):
+        self.A = np.array(A, dtype=float)
+        self.b = np.array(b, dtype=float)
+        self.profit = np.array(profit, dtype=float)
+        m, n = self.A.shape
+        if self.b.shape != (m,) or self.profit.shape != (n,):
+            raise ValueError("Dimensões incompatíveis entre A, b e profit")
+        self.lock = threading.Lock()
+        self.version = 0
+        self.last_update = "factorize"
+        self._factor()
+
+    def _factor(self):
+        from scipy.linalg import qr
+        m, n = self.A.shape
+        self.transposed = m < n
+        target = self.A.T if self.transposed else self.A
+        self.Q, self.R = qr(target, mode="economic", check_finite=False)
+        self._updates = 0
+
+    def _oriented(self, which):
+        """Linha de A é coluna de Aᵀ: troca o eixo quando a QR é de Aᵀ."""
+        if not self.transposed:
+            return which
+        return "col" if which == "row" else "row"
+
+    def _rank_one(self, u, v):
+        """A += u vᵀ."""
+        from scipy.linalg import qr_update
+        if self.transposed:
+            u, v = v, u
+        self.Q, self.R = qr_update(self.Q, self.R, u, v, check_finite=False)
+
+    def _after_update(self, kind):
+        k = self.R.shape[1]
+        if self.R.shape[0] > k:
+            # Q quadrada é tratada como QR completa: volta à forma econômica
+            # (as linhas de R abaixo da k-ésima são nulas)
+            self.Q, self.R = self.Q[:, :k], self.R[:k]
+        self._updates += 1
+        self.version += 1
+        m, n = self.A.shape
+        if (m < n) != self.transposed or self._updates >= REFACTOR_EVERY:
+            # Mudou de orientação (ou muitas atualizações): QR nova
+            self._factor()
+            kind = "refactor"
+        self.last_update = kind
+
+    # ===== EDIÇÕES =====
+
+    def apply(self, edits):
+        """Aplica as edições ({"op", ...} de OPS) em ordem.
+
+        Todas são validadas antes: se uma for inválida, nenhuma é aplicada.
+        """
+        m, n = self.A.shape
+        for k, edit in enumerate(edits):
+            if edit["op"] not in OPS:
+                raise ValueError(f"edição {k}: operação desconhecida {edit['op']}")
+            try:
+                m, n = _check_edit(edit, m, n)
+            except ValueError as e:
+                raise ValueError(f"edição {k}: {e}")
+        for edit in edits:
+            getattr(self, edit["op"])(**{a: edit[a] for a in OPS[edit["op"]] if a in edit})
+
+    def set_entry(self, i, j, value):
+        i, j = self._index(i, 0), self._index(j, 1)
+        delta = value - self.A[i, j]
+        if delta:
+            u = np.zeros(self.A.shape[0])
+            v = np.zeros(self.A.shape[1])
+            u[i], v[j] = delta, 1.0
+            self._rank_one(u, v)
+            self.A[i, j] = value
+        self._after_update("rank_one")
+
+    def set_row(self, i, values):
+        i = self._index(i, 0)
+        values = self._vector(values, self.A.shape[1], "linha")
+        u = np.zeros(self.A.shape[0])
+        u[i] = 1.0
+        self._rank_one(u, values - self.A[i])
+        self.A[i] = values
+        self._after_update("rank_one")
+
+    def set_column(self, j, values):
+        j = self._index(j, 1)
+        values = self._vector(values, self.A.shape[0], "coluna")
+        v = np.zeros(self.A.shape[1])
+        v[j] = 1.0
+        self._rank_one(values - self.A[:, j], v)
+        self.A[:, j] = values
+        self._after_update("rank_one")
+
+    def insert_row(self, i, values, value=0.0):
+        from scipy.linalg import qr_insert
+        i = self._index(i, 0, insert=True)
+        values = self._vector(values, self.A.shape[1], "linha")
+        self.Q, self.R = qr_insert(
+            self.Q, self.R, values, i, which=self._oriented("row"), check_finite=False
+        )
+        self.A = np.insert(self.A, i, values, axis=0)
+        self.b = np.insert(self.b, i, value)
+        self._after_update("insert")
+
+    def delete_row(self, i):
+        from scipy.linalg import qr_delete
+        i = self._index(i, 0)
+        if self.A.shape[0] == 1:
+            raise ValueError("A precisa de ao menos uma linha")
+        self.Q, self.R = qr_delete(self.Q, self.R, i, 1, which=self._oriented("row"),
+                                   check_finite=False)
+        self.A = np.delete(self.A, i, axis=0)
+        self.b = np.delete(self.b, i)
+        self._after_update("delete")
+
+    def insert_column(self, j, values, value=0.0):
+        from scipy.linalg import qr_insert
+        j = self._index(j, 1, insert=True)
+        values = self._vector(values, self.A.shape[0], "coluna")
+        self.Q, self.R = qr_insert(
+            self.Q, self.R, values, j, which=self._oriented("col"), check_finite=False
+        )
+        self.A = np.insert(self.A, j, values, axis=1)
+        self.profit = np.insert(self.profit, j, value)
+        self._after_update("insert")
+
+    def delete_column(self, j):
+        from scipy.linalg import qr_delete
+        j = self._index(j, 1)
+        if self.A.shape[1] == 1:
+            raise ValueError("A precisa de ao menos uma coluna")
+        self.Q, self.R = qr_delete(self.Q, self.R, j, 1, which=self._oriented("col"),
+                                   check_finite=False)
+        self.A = np.delete(self.A, j, axis=1)
+        self.profit = np.delete(self.profit, j)
+        self._after_update("delete")
+
+    def set_b(self, values=None, i=None, value=None):
+        # b e profit não entram na fatoração
+        if i is not None:
+            self.b[self._index(i, 0)] = value
+        else:
+            self.b = self._vector(values, self.A.shape[0], "b").copy()
+        self.version += 1
+        self.last_update = "none"
+
+    def set_profit(self, values=None, j=None, value=None):
+        if j is not None:
+            self.profit[self._index(j, 1)] = value
+        else:
+            self.profit = self._vector(values, self.A.shape[1], "profit").copy()
+        self.version += 1
+        self.last_update = "none"
+
+    def _index(self, k, axis, insert=False):
+        size = self.A.shape[axis] + (1 if insert else 0)
+        if not 0 <= k < size:
+            name = "linha" if axis == 0 else "coluna"
+            raise ValueError(f"Índice de {name} fora do intervalo: {k} (0..{size - 1})")
+        return int(k)
+
+    @staticmethod
+    def _vector(values, size, name):
+        values = np.asarray(values, dtype=float)
+        if values.shape != (size,):
+            raise ValueError(f"{name} deve ter {size} valores")
+        return values
+
+    # ===== SOLUÇÃO =====
+
+    def rcond(self):
+        """Recíproco de kappa_1(R) estimado pelo LAPACK (dtrcon), em O(n²)."""
+        from scipy.linalg.lapack import dtrcon
+        rcond, info = dtrcon(self.R, norm="1")
+        return rcond if info == 0 else 0.0
+
+    def kappa_2(self, tol=1e-3, maxiter=50):
+        """Estimativa de kappa_2(A) = kappa_2(R) em O(n²) por iteração.
+
+        s_max por iteração de potência em RᵀR (produtos com R) e s_min por
+        iteração inversa (as mesmas retrossubstituições da solução). Mesma
+        norma do kappa de /api/analyze; s_max e 1/s_min são limites
+        inferiores, então a estimativa nunca passa de kappa_2.
+        """
+        from scipy.linalg import solve_triangular
+        R = self.R
+        start = np.random.default_rng(0).standard_normal(R.shape[0])
+
+        def dominant(apply):
+            v, value = start / np.linalg.norm(start), 0.0
+            for _ in range(maxiter):
+                w = apply(v)
+                norm = np.linalg.norm(w)
+                if norm == 0 or not np.isfinite(norm):
+                    return norm
+                v, previous, value = w / norm, value, norm
+                if abs(value - previous) <= tol * value:
+                    break
+            return value
+
+        s_max2 = dominant(lambda v: R.T @ (R @ v))
+        # (RᵀR)⁻¹ v = R⁻¹ R⁻ᵀ v
+        inv_s_min2 = dominant(lambda v: solve_triangular(
+            R, solve_triangular(R, v, trans="T", check_finite=False), check_finite=False
+        ))
+        return float(np.sqrt(s_max2 * inv_s_min2))
+
+    def solve(self):
+        """Solução, condicionamento (kappa_2) e resíduo do sistema atual."""
+        from scipy.linalg import solve_triangular
+        m, n = self.A.shape
+        rcond = self.rcond()
+        if rcond > np.finfo(float).eps * max(m, n):
+            if self.transposed:
+                # Aᵀ = QR ⇒ A = RᵀQᵀ; norma mínima: x = Q R⁻ᵀ b
+                x = self.Q @ solve_triangular(self.R, self.b, trans="T", check_finite=False)
+            else:
+                x = solve_triangular(self.R, self.Q.T @ self.b, check_finite=False)
+            solver, kappa = "qr", self.kappa_2()
+        else:
+            # Posto incompleto: mínimos quadrados de norma mínima pela SVD
+            from .linear_algebra import factorize
+            system = factorize(self.A)
+            x = system.solve(self.b)
+            solver, kappa = "svd", system.kappa
+        return {
+            "x": x,
+            "profit": float(self.profit @ x),
+            "kappa_estimate": float(kappa),
+            # Estimativa (QR) ou exato (SVD), sempre na norma 2
+            "kappa_norm": "2",
+            "residual_norm": float(np.linalg.norm(self.A @ x - self.b)),
+            "shape": list(self.A.shape),
+            "solver": solver,
+        }
+
+    def state(self):
+        started = time.perf_counter()
+        result = self.solve()
+        result.update({
+            "version": self.version,
+            "update": self.last_update,
+            "solve_ms": (time.perf_counter() - started) * 1e3,
+        })
+        return result
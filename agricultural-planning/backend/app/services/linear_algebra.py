@@ -1,26 +1,516 @@
+import sys
 import numpy as np
-from scipy import linalg
+
+
+# ============================================================
+# EQUILIBRAGEM (escala diagonal de linhas e colunas)
+# ============================================================
+
+def ruiz_equilibrate(A, max_iter=20, tol=1e-2, columns=True):
+    """Escalas (r, c) de Ruiz: D_r A D_c com linhas e colunas de norma-∞ ≈ 1.
+
+    Cada iteração divide linhas e colunas pela raiz da sua norma-∞. As
+    escalas finais são arredondadas para potências de 2, de modo que
+    aplicá-las (e desfazê-las) não introduz erro de arredondamento; linhas
+    ou colunas nulas ficam com escala 1. Com `columns=False` só as linhas
+    são escaladas (c = 1). Aceita A densa ou esparsa.
+    """
+    m, n = A.shape
+    A_abs = abs(A)
+    r, c = np.ones(m), np.ones(n)
+    for _ in range(max_iter):
+        B = scale_matrix(A_abs, r, c)
+        if issparse(B):
+            row_norm = B.max(axis=1).toarray().ravel()
+            col_norm = B.max(axis=0).toarray().ravel()
+        else:
+            row_norm, col_norm = B.max(axis=1), B.max(axis=0)
+        row_norm[row_norm == 0] = 1.0
+        col_norm[col_norm == 0] = 1.0
+        if not columns:
+            col_norm[:] = 1.0
+        if max(np.abs(1 - row_norm).max(), np.abs(1 - col_norm).max()) <= tol:
+            break
+        r /= np.sqrt(row_norm)
+        c /= np.sqrt(col_norm)
+    return np.exp2(np.round(np.log2(r))), np.exp2(np.round(np.log2(c)))
+
+
+def equilibration_scales(A):
+    """Escalas de `equilibrate=True`: linhas e colunas, ou só linhas se m < n.
+
+    Com m < n (menos restrições que culturas) escalar colunas mudaria qual
+    solução tem norma mínima; escalar só as linhas preserva x = A⁺b sempre
+    que o sistema é consistente (posto completo nas linhas).
+    """
+    m, n = A.shape
+    return ruiz_equilibrate(A, columns=m >= n)
+
+
+def scale_matrix(A, r, c):
+    """D_r A D_c (mantém A esparsa como CSR)."""
+    if issparse(A):
+        from scipy import sparse as sp
+        return (sp.diags(r) @ A @ sp.diags(c)).tocsr()
+    return A * r[:, np.newaxis] * c
+
+
+class FactorizedSystem:
+    """Fatoração única de A (SVD ou QR) reutilizada por todos os serviços.
+
+    Resolve A x ≈ b para qualquer lado direito (vetor ou matriz m×k),
+    fornece kappa_2(A) pelos valores singulares armazenados e a solução de
+    Tikhonov para qualquer λ via fatores de filtro.
+
+    Com `equilibrate=True` fatora D_r A D_c (equilibration_scales) no lugar
+    de A: solve, pinv e tikhonov recebem b e devolvem x nas unidades
+    originais (x = D_c y com D_r A D_c y ≈ D_r b). Com m ≤ n a solução é a
+    mesma (m < n só escala linhas); com m > n os mínimos quadrados passam a
+    ser ponderados por D_r. A de posto incompleto não é equilibrada (a norma
+    mínima mudaria): a fatoração é a de A e `equilibrated` fica False.
+    """
+
+    def __init__(self, A, method="svd", rcond=None, svd=None, pinv=None, equilibrate=False):
+        A = np.asarray(A, dtype=float)
+        if A.ndim != 2:
+            raise ValueError("A deve ser uma matriz 2-D")
+        if method not in ("svd", "qr"):
+            raise ValueError(f"Método de fatoração inválido: {method}")
+        m, n = A.shape
+        self.A = A
+        self.method = method
+        # Mesmo corte padrão de np.linalg.lstsq(rcond=None)
+        self.rcond = np.finfo(float).eps * max(m, n) if rcond is None else rcond
+        self._svd = None
+        self._qr = None
+        self._s = None
+        self._s_raw = None
+        self._svd_raw = None
+        self._pinv = pinv
+        self.row_scale = self.col_scale = None
+
+        if equilibrate:
+            if svd is not None:
+                raise ValueError("Fatoração pré-calculada não pode ser equilibrada")
+            # kappa de A é pedido de qualquer forma; o posto decide se escala
+            self._s_raw = np.linalg.svd(A, compute_uv=False)
+            if self._s_raw.size and self._s_raw[-1] > self.rcond * self._s_raw[0]:
+                self.row_scale, self.col_scale = equilibration_scales(A)
+                A = scale_matrix(A, self.row_scale, self.col_scale)
+        self.A_scaled = A
+
+        if svd is not None:
+            # Fatoração já calculada (ex.: arrays mapeados de um modelo registrado)
+            self._svd = tuple(svd)
+        elif method == "qr" and m >= n:
+            self._qr = np.linalg.qr(A)
+        else:
+            self._svd = np.linalg.svd(A, full_matrices=False)
+
+    @property
+    def shape(self):
+        return self.A.shape
+
+    @property
+    def equilibrated(self):
+        return self.row_scale is not None
+
+    @property
+    def svd(self):
+        """(U, s, Vt) reduzidos da matriz fatorada (D_r A D_c se equilibrada).
+
+        No modo QR vêm da SVD do fator R (n×n).
+        """
+        if self._svd is None:
+            Q, R = self._qr
+            Ur, s, Vt = np.linalg.svd(R)
+            self._svd = (Q @ Ur, s, Vt)
+        return self._svd
+
+    @property
+    def raw_svd(self):
+        """(U, s, Vt) reduzidos de A original, calculados uma vez.
+
+        Sem equilibragem é a própria svd; equilibrada, é a SVD de A (e não
+        de D_r A D_c), pedida por quem mede direções nas unidades originais.
+        """
+        if not self.equilibrated:
+            return self.svd
+        if self._svd_raw is None:
+            self._svd_raw = np.linalg.svd(self.A, full_matrices=False)
+            self._s_raw = self._svd_raw[1]
+        return self._svd_raw
+
+    @property
+    def singular_values(self):
+        if self._svd is not None:
+            return self._svd[1]
+        if self._s is None:
+            self._s = np.linalg.svd(self._qr[1], compute_uv=False)
+        return self._s
+
+    @property
+    def kappa(self):
+        """Número de condição kappa_2(A) = s_max / s_min da matriz original."""
+        s = self.singular_values
+        if self.equilibrated:
+            if self._s_raw is None:
+                self._s_raw = np.linalg.svd(self.A, compute_uv=False)
+            s = self._s_raw
+        return s[0] / s[-1] if s[-1] > 0 else np.inf
+
+    @property
+    def kappa_scaled(self):
+        """kappa_2 da matriz fatorada (igual a kappa sem equilibragem)."""
+        s = self.singular_values
+        return s[0] / s[-1] if s[-1] > 0 else np.inf
+
+    @property
+    def rank(self):
+        s = self.singular_values
+        return int(np.sum(s > self.rcond * s[0])) if s.size else 0
+
+    def _inv_singular_values(self):
+        s = self.svd[1]
+        s_inv = np.zeros_like(s)
+        mask = s > self.rcond * s[0]
+        s_inv[mask] = 1.0 / s[mask]
+        return s_inv
+
+    def _scale(self, v, scale):
+        """D v para vetor ou colunas de uma matriz (sem equilibragem, v)."""
+        if scale is None:
+            return v
+        return v * scale if v.ndim == 1 else v * scale[:, np.newaxis]
+
+    def _apply_filter(self, b, f):
+        U, s, Vt = self.svd
+        coeffs = U.T @ self._scale(b, self.row_scale)
+        if coeffs.ndim == 1:
+            y = Vt.T @ (f * coeffs)
+        else:
+            y = Vt.T @ (f[:, np.newaxis] * coeffs)
+        return self._scale(y, self.col_scale)
+
+    def solve(self, b):
+        """Solução de mínimos quadrados (norma mínima) para b ou colunas de B."""
+        b = np.asarray(b, dtype=float)
+        if self._qr is not None and self._svd is None and self.rank == self.A.shape[1]:
+            # scipy.linalg só é importado quando o caminho QR é usado
+            from scipy.linalg import solve_triangular
+            Q, R = self._qr
+            y = solve_triangular(R, Q.T @ self._scale(b, self.row_scale))
+            return self._scale(y, self.col_scale)
+        return self._apply_filter(b, self._inv_singular_values())
+
+    def pinv(self):
+        """Pseudo-inversa A⁺ (n×m), calculada uma vez.
+
+        Equilibrada, é o operador b → x da solução: D_c (D_r A D_c)⁺ D_r.
+        """
+        if self._pinv is None:
+            U, _, Vt = self.svd
+            P = (Vt.T * self._inv_singular_values()) @ U.T
+            if self.equilibrated:
+                P *= np.outer(self.col_scale, self.row_scale)
+            self._pinv = P
+        return self._pinv
+
+    def filter_factors(self, lam):
+        """Fatores de filtro de Tikhonov s/(s² + λ) (0 onde s = 0)."""
+        s = self.svd[1]
+        return _safe_divide(s, s ** 2 + lam)
+
+    def tikhonov(self, b, lam):
+        """Resolve min ||A x - b||^2 + lam ||x||^2 sem formar A^T A.
+
+        Equilibrada: min ||D_r (A x - b)||^2 + lam ||D_c⁻¹ x||^2.
+        """
+        return self._apply_filter(np.asarray(b, dtype=float), self.filter_factors(lam))
+
+
+def _safe_divide(num, den):
+    """num / den com 0 onde den = 0."""
+    num, den = np.broadcast_arrays(np.asarray(num, dtype=float), den)
+    return np.divide(num, den, out=np.zeros(den.shape), where=den != 0)
+
+
+def factorize(A, method="svd", equilibrate=False):
+    """Devolve A já fatorado (reaproveita um FactorizedSystem existente)."""
+    if isinstance(A, FactorizedSystem):
+        return A
+    return FactorizedSystem(A, method=method, equilibrate=equilibrate)
+
 
 def solve_linear_system(A, b):
     """Resolve A x ≈ b em mínimos quadrados."""
+    if isinstance(A, FactorizedSystem):
+        return A.solve(b)
+    if issparse(A):
+        return iterative_lstsq(A, b)["x"]
     x, residuals, rank, s = np.linalg.lstsq(A, b, rcond=None)
     return x
 
 def condition_number(A):
-    """Número de condição kappa_2(A)."""
+    """Número de condição kappa_2(A) (estimado, se A for esparsa)."""
+    if isinstance(A, FactorizedSystem):
+        return A.kappa
+    if issparse(A):
+        return condition_estimate(A)
     return np.linalg.cond(A, 2)
 
 def tikhonov_regularization(A, b, lam):
     """Resolve min ||A x - b||^2 + lam ||x||^2."""
-    m, n = A.shape
-    I = np.eye(n)
-    AtA = A.T @ A
-    Atb = A.T @ b
-    x_reg = np.linalg.solve(AtA + lam * I, Atb)
-    return x_reg
+    if issparse(A):
+        return iterative_lstsq(A, b, lam=lam)["x"]
+    return factorize(A).tikhonov(b, lam)
 
 def compare_regularized_solution(A, b, lam=10.0):
     """Compara solução normal vs regularizada."""
-    x_normal = solve_linear_system(A, b)
-    x_reg = tikhonov_regularization(A, b, lam)
+    system = factorize(A)
+    x_normal = system.solve(b)
+    x_reg = system.tikhonov(b, lam)
     return x_normal, x_reg
+
+
+def tikhonov_path(A, b, lambdas=None, n_lambdas=200):
+    """Caminho de Tikhonov x(λ) para vários λ a partir de uma única SVD.
+
+    Para cada λ devolve a solução, ||A x - b||, ||x||, a função GCV e a
+    curvatura da curva L (log ||A x - b|| × log ||x||). Num sistema
+    equilibrado as normas (e o λ) são as do problema equilibrado,
+    ||D_r (A x - b)|| e ||D_c⁻¹ x||; as soluções voltam às unidades originais.
+    """
+    system = factorize(A)
+    U, s, Vt = system.svd
+    b = np.asarray(b, dtype=float)
+    if system.equilibrated:
+        b = b * system.row_scale
+    m = system.shape[0]
+    beta = U.T @ b
+    # Parte de b fora da imagem de A (resíduo que nenhum λ remove)
+    res_perp2 = max(float(b @ b - beta @ beta), 0.0)
+
+    if lambdas is None:
+        s_floor = max(s[-1], s[0] * 1e-8)
+        lambdas = np.logspace(np.log10(s[0] ** 2), np.log10(s_floor ** 2 * 1e-2), n_lambdas)
+    lambdas = np.asarray(lambdas, dtype=float)
+
+    s2 = s ** 2
+    # Valores singulares nulos não contribuem (como em filter_factors)
+    s_inv = _safe_divide(1.0, s)
+    F = _safe_divide(s2, s2 + lambdas[:, np.newaxis])   # fatores de filtro (L × r)
+    coeffs = F * s_inv * beta                        # coeficientes em V
+    X = coeffs @ Vt
+    if system.equilibrated:
+        X *= system.col_scale
+    eta = np.sum(coeffs ** 2, axis=1)                # ||x||²
+    rho = np.sum(((1 - F) * beta) ** 2, axis=1) + res_perp2   # ||A x - b||²
+
+    dof = m - F.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gcv = rho / dof ** 2
+        # Curvatura da curva L (log ||A x - b||, log ||x||) parametrizada por
+        # log λ, com derivadas analíticas dos fatores de filtro; máxima no canto
+        g = -F * (1 - F)                     # dF/dlog λ
+        dg = (1 - 2 * F) * F * (1 - F)       # d²F/dlog λ²
+        c = beta ** 2 * s_inv ** 2
+        deta = np.sum(2 * F * g * c, axis=1)
+        ddeta = np.sum(2 * (g ** 2 + F * dg) * c, axis=1)
+        drho = np.sum(-2 * (1 - F) * g * beta ** 2, axis=1)
+        ddrho = np.sum(2 * (g ** 2 - (1 - F) * dg) * beta ** 2, axis=1)
+        dx, dy = drho / (2 * rho), deta / (2 * eta)
+        ddx = (ddrho * rho - drho ** 2) / (2 * rho ** 2)
+        ddy = (ddeta * eta - deta ** 2) / (2 * eta ** 2)
+        curvature = (dx * ddy - ddx * dy) / (dx ** 2 + dy ** 2) ** 1.5
+
+    return {
+        "lambdas": lambdas,
+        "x": X,
+        "residual_norm": np.sqrt(rho),
+        "solution_norm": np.sqrt(eta),
+        "gcv": gcv,
+        "curvature": curvature,
+    }
+
+
+def select_lambda(path, method="lcurve"):
+    """Escolhe λ no caminho: canto da curva L (máxima curvatura) ou mínimo da GCV."""
+    if method == "lcurve":
+        idx = int(np.nanargmax(path["curvature"]))
+    elif method == "gcv":
+        idx = int(np.nanargmin(path["gcv"]))
+    else:
+        raise ValueError(f"Método de seleção de λ inválido: {method}")
+    return float(path["lambdas"][idx]), idx
+
+
+# ============================================================
+# MODO ESPARSO (fazendas grandes)
+# ============================================================
+# Só produtos A·v e Aᵀ·u: memória O(nnz) e nenhuma fatoração densa.
+
+ITERATIVE_SOLVERS = ("lsmr", "lsqr")
+
+
+def issparse(A):
+    """A é uma matriz scipy.sparse? (não importa scipy só para perguntar)"""
+    sp = sys.modules.get("scipy.sparse")
+    return sp is not None and sp.issparse(A)
+
+
+def sparse_matrix(shape, data, row=None, col=None, indptr=None, indices=None):
+    """Monta uma CSR validada a partir de triplas COO ou dos arrays CSR."""
+    from scipy import sparse as sp
+    m, n = (int(d) for d in shape)
+    if m <= 0 or n <= 0:
+        raise ValueError("shape deve ser positivo")
+    data = np.asarray(data, dtype=float)
+    if not np.isfinite(data).all():
+        raise ValueError("A contém valores não finitos")
+
+    if row is not None and col is not None:
+        row = np.asarray(row, dtype=np.int64)
+        col = np.asarray(col, dtype=np.int64)
+        if not len(row) == len(col) == len(data):
+            raise ValueError("row, col e data devem ter o mesmo tamanho")
+        if len(data) and (row.min() < 0 or row.max() >= m or col.min() < 0 or col.max() >= n):
+            raise ValueError("Índices COO fora de shape")
+        # Entradas repetidas são somadas
+        return sp.coo_matrix((data, (row, col)), shape=(m, n)).tocsr()
+
+    if indptr is not None and indices is not None:
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indptr) != m + 1 or indptr[0] != 0 or indptr[-1] != len(data) or np.any(np.diff(indptr) < 0):
+            raise ValueError("indptr inválido para shape e data")
+        if len(indices) != len(data) or (len(indices) and (indices.min() < 0 or indices.max() >= n)):
+            raise ValueError("indices inválidos para shape e data")
+        A = sp.csr_matrix((data, indices, indptr), shape=(m, n))
+        A.sum_duplicates()
+        return A
+
+    raise ValueError("Informe row/col (COO) ou indptr/indices (CSR)")
+
+
+def iterative_lstsq(A, b, lam=0.0, solver="lsmr", atol=1e-10, btol=1e-10, maxiter=None,
+                    equilibrate=False):
+    """min ||A x - b||^2 + lam ||x||^2 por LSMR ou LSQR amortecido (damp = √lam).
+
+    Além de x devolve as normas do resíduo e da solução, iterações, o
+    critério de parada e a estimativa de cond(A) (de [A; √lam I] se lam > 0)
+    que o próprio método acumula, um limite inferior de kappa_2.
+
+    Com `equilibrate=True` o método itera sobre D_r A D_c
+    (equilibration_scales; só D_r se m < n), que costuma convergir em bem
+    menos iterações quando recursos e culturas têm escalas muito
+    diferentes; x e as normas voltam às unidades originais e o limite de
+    kappa é o da matriz equilibrada. O amortecimento passa a valer nas
+    variáveis equilibradas: lam ||D_c⁻¹ x||^2. As escalas voltam em
+    row_scale/col_scale.
+    """
+    from scipy.sparse.linalg import lsmr, lsqr
+    if solver not in ITERATIVE_SOLVERS:
+        raise ValueError(f"Solver inválido: {solver}")
+    if lam < 0:
+        raise ValueError("lam deve ser não negativo")
+    b = np.asarray(b, dtype=float)
+    if b.shape != (A.shape[0],):
+        raise ValueError("Dimensões incompatíveis entre A e b")
+    damp = float(np.sqrt(lam))
+    # Padrão do LSQR (2n) também no LSMR, cujo min(m, n) não basta com
+    # arredondamento em sistemas pequenos e mal condicionados
+    if maxiter is None:
+        maxiter = 2 * A.shape[1]
+
+    A_solve, b_solve = A, b
+    if equilibrate:
+        r, c = equilibration_scales(A)
+        A_solve, b_solve = scale_matrix(A, r, c), r * b
+
+    if solver == "lsmr":
+        x, istop, itn, _, _, _, cond, _ = lsmr(
+            A_solve, b_solve, damp=damp, atol=atol, btol=btol, maxiter=maxiter
+        )
+    else:
+        x, istop, itn, _, _, _, cond, _, _, _ = lsqr(
+            A_solve, b_solve, damp=damp, atol=atol, btol=btol, iter_lim=maxiter
+        )
+    if equilibrate:
+        x = c * x
+    else:
+        r = c = None
+    return {
+        "x": x,
+        "residual_norm": float(np.linalg.norm(b - A @ x)),
+        "solution_norm": float(np.linalg.norm(x)),
+        "iterations": int(itn),
+        "istop": int(istop),
+        # 3 = cond acima de conlim, 7 = limite de iterações
+        "converged": istop not in (3, 7),
+        "kappa_lower_bound": float(cond),
+        "solver": solver,
+        # Escalas usadas (None sem equilibrate), para reaproveitar em kappa_scaled
+        "row_scale": r,
+        "col_scale": c,
+    }
+
+
+# Abaixo desta menor dimensão a SVD densa é mais barata que o Lanczos
+DENSE_COND_MAX_DIM = 200
+# Acima destes não-nulos no Gram a LU do shift-invert pode não caber em
+# memória; kappa fica no limite inferior do LSMR
+SHIFT_INVERT_MAX_NNZ = 20_000_000
+
+
+def _gram_inverse(gram):
+    """Operador (Gram)⁻¹ por LU esparsa, ordenada como matriz simétrica."""
+    from scipy.sparse.linalg import LinearOperator, splu
+    lu = splu(gram, permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0,
+              options={"SymmetricMode": True})
+    return LinearOperator(gram.shape, matvec=lu.solve, dtype=float)
+
+
+def condition_estimate(A, tol=1e-6, maxiter=None, random_state=0):
+    """Estimativa de kappa_2(A) sem SVD completa.
+
+    Valores singulares extremos por Lanczos (ARPACK): o maior por svds, que
+    converge em poucas iterações; o menor por shift-invert (sigma=0) sobre o
+    Gram da menor dimensão, fatorado uma vez por LU esparsa. which="SM" sem
+    shift-invert quase não converge para os menores valores singulares e
+    devolvia kappa errado. Posto incompleto dá inf, como np.linalg.cond.
+    Com Gram grande demais para fatorar, ou se o ARPACK não convergir,
+    recai no limite inferior acumulado pelo LSMR.
+    """
+    from scipy.sparse.csgraph import structural_rank
+    from scipy.sparse.linalg import eigsh, svds, ArpackNoConvergence
+    if min(A.shape) <= DENSE_COND_MAX_DIM:
+        return float(np.linalg.cond(A.toarray(), 2))
+    # Posto estrutural incompleto (colunas/linhas vazias, etc.): kappa = inf
+    # sem gastar o Lanczos, que não converge para valor singular nulo
+    if structural_rank(A) < min(A.shape):
+        return np.inf
+
+    def lower_bound():
+        b = np.random.default_rng(random_state).standard_normal(A.shape[0])
+        return iterative_lstsq(A, b, maxiter=maxiter)["kappa_lower_bound"]
+
+    gram = (A.T @ A if A.shape[0] >= A.shape[1] else A @ A.T).tocsc()
+    if gram.nnz > SHIFT_INVERT_MAX_NNZ:
+        return lower_bound()
+    try:
+        s_max = svds(A, k=1, which="LM", tol=tol, maxiter=maxiter,
+                     return_singular_vectors=False, random_state=random_state)[0]
+        v0 = np.random.default_rng(random_state).standard_normal(gram.shape[0])
+        # Autovalores de Gram⁻¹: o maior deles é 1 / s_min²
+        s_min2 = eigsh(gram, k=1, sigma=0, which="LM", OPinv=_gram_inverse(gram), tol=tol,
+                       maxiter=maxiter, v0=v0, return_eigenvectors=False)[0]
+    except ArpackNoConvergence:
+        return lower_bound()
+    except RuntimeError:
+        # LU do Gram numericamente singular
+        return np.inf
+    s_min = np.sqrt(max(s_min2, 0.0))
+    if s_min <= np.finfo(float).eps * max(A.shape) * s_max:
+        return np.inf
+    return float(s_max / s_min)
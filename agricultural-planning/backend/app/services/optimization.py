@@ -0,0 +1,260 @@
+import numpy as np
+
+# A vai para o HiGHS como matriz esparsa a partir deste tamanho (m·n),
+# desde que a densidade não passe do limite
+SPARSE_MIN_SIZE = 10_000
+SPARSE_MAX_DENSITY = 0.25
+
+METHODS = {"auto": "highs", "simplex": "highs-ds", "ipm": "highs-ipm"}
+
+STATUS = {
+    0: "optimal",
+    1: "iteration_limit",
+    2: "infeasible",
+    3: "unbounded",
+    4: "numerical_error",
+}
+
+
+def _constraint_matrix(A, sparse=None):
+    """A densa (ndarray) ou CSR, conforme `sparse` ou tamanho/densidade."""
+    from scipy import sparse as sp
+    if sp.issparse(A):
+        return sp.csr_matrix(A, dtype=float) if sparse is not False else A.toarray().astype(float)
+    A = np.asarray(A, dtype=float)
+    if sparse is None:
+        sparse = A.size >= SPARSE_MIN_SIZE and np.count_nonzero(A) <= SPARSE_MAX_DENSITY * A.size
+    return sp.csr_matrix(A) if sparse else A
+
+
+def _bound_arrays(bounds, n):
+    """Limites por cultura como vetores (lo, hi); padrão 0 ≤ x < ∞."""
+    lo, hi = np.zeros(n), np.full(n, np.inf)
+    if bounds is not None:
+        if len(bounds) != n:
+            raise ValueError("bounds deve ter um par (mín, máx) por cultura")
+        for j, (l, h) in enumerate(bounds):
+            lo[j] = 0.0 if l is None else l
+            hi[j] = np.inf if h is None else h
+    if np.any(lo > hi):
+        raise ValueError("bounds com mínimo maior que o máximo")
+    return lo, hi
+
+
+class LPBasis:
+    """Base ótima de max c·x s.a. A x + s = b, lo ≤ x ≤ hi, s ≥ 0.
+
+    Guarda a LU da matriz básica B (colunas de [A | I]). Para um novo b,
+    x_B = B⁻¹(b − N x_N); como as variáveis duais não dependem de b, a base
+    continua ótima enquanto x_B respeitar os limites.
+    """
+
+    def __init__(self, A, profit, lo, hi, basic, lu, z, shadow_prices, reduced_costs):
+        self.A = A
+        self.profit = profit
+        m, n = A.shape
+        self.basic = basic
+        self.lower = np.concatenate([lo, np.zeros(m)])
+        self.upper = np.concatenate([hi, np.full(m, np.inf)])
+        nonbasic = np.setdiff1d(np.arange(n + m), basic)
+        # Só colunas de x fora da base com valor não nulo entram no lado direito
+        self.fixed = nonbasic[(nonbasic < n) & (z[nonbasic] != 0)]
+        self.z_fixed = z[self.fixed]
+        self.shadow_prices = shadow_prices
+        self.reduced_costs = reduced_costs
+        self._lu = lu
+
+    @classmethod
+    def from_solution(cls, A, profit, lo, hi, x, slack, tol=1e-9):
+        """Extrai uma base primal e dual viável da solução do HiGHS (ou None)."""
+        m, n = A.shape
+        z = np.concatenate([x, slack])
+        lower = np.concatenate([lo, np.zeros(m)])
+        upper = np.concatenate([hi, np.full(m, np.inf)])
+        scale = max(1.0, np.max(np.abs(z[np.isfinite(z)]), initial=0.0))
+        interior = (z > lower + tol * scale) & (z < upper - tol * scale)
+        basic = list(np.flatnonzero(interior))
+        if len(basic) > m:
+            return None  # não é vértice
+
+        # Solução degenerada: completa a base com colunas independentes
+        # (folgas primeiro, depois variáveis no limite)
+        if len(basic) < m:
+            basic = _complete_basis(A, basic, [j for j in range(n + m)[::-1] if not interior[j]])
+            if basic is None:
+                return None
+        basic = np.sort(np.asarray(basic))
+
+        # Dual da base: Bᵀ y = c_B; confere viabilidade dual antes de aceitar
+        c = np.concatenate([profit, np.zeros(m)])
+        try:
+            lu = _factor(_columns(A, basic))
+        except (ValueError, RuntimeError, np.linalg.LinAlgError):
+            return None
+        y = _solve(lu, c[basic], trans=True)
+        d = c - np.concatenate([_rmatvec(A, y), y])
+        d[basic] = 0.0
+        dtol = 1e-7 * max(1.0, np.max(np.abs(c)))
+        at_upper = np.isfinite(upper) & (z >= upper - tol * scale)
+        at_upper[basic] = False
+        at_lower = ~at_upper
+        at_lower[basic] = False
+        if np.any(d[at_lower] > dtol) or np.any(d[at_upper] < -dtol):
+            return None
+        return cls(A, profit, lo, hi, basic, lu, z, y, d[:n])
+
+    def matches(self, A, profit, lo, hi):
+        """Mesmo problema a menos de b (condição para reaproveitar a base)."""
+        from scipy import sparse as sp
+        if self.A.shape != A.shape or sp.issparse(self.A) != sp.issparse(A):
+            return False
+        same_A = (self.A != A).nnz == 0 if sp.issparse(A) else np.array_equal(self.A, A)
+        return (
+            same_A and np.array_equal(self.profit, profit)
+            and np.array_equal(self.lower[:len(lo)], lo) and np.array_equal(self.upper[:len(hi)], hi)
+        )
+
+    def resolve(self, b, tol=1e-9):
+        """Solução ótima para o novo b, ou None se a base deixou de ser viável."""
+        m, n = self.A.shape
+        rhs = np.asarray(b, dtype=float).copy()
+        if len(self.fixed):
+            rhs -= _columns(self.A, self.fixed) @ self.z_fixed
+        z_B = _solve(self._lu, rhs)
+        scale = max(1.0, np.max(np.abs(z_B), initial=0.0))
+        lower, upper = self.lower[self.basic], self.upper[self.basic]
+        if np.any(z_B < lower - tol * scale) or np.any(z_B > upper + tol * scale):
+            return None
+        z = np.zeros(n + m)
+        z[self.fixed] = self.z_fixed
+        z[self.basic] = np.clip(z_B, lower, upper)
+        return z[:n], z[n:]
+
+
+def _columns(A, idx):
+    """Colunas idx de [A | I] (densas, m×k)."""
+    from scipy import sparse as sp
+    m, n = A.shape
+    idx = np.asarray(idx)
+    cols = np.zeros((m, len(idx)))
+    is_x = idx < n
+    if np.any(is_x):
+        cols[:, is_x] = A[:, idx[is_x]].toarray() if sp.issparse(A) else A[:, idx[is_x]]
+    slack = np.flatnonzero(~is_x)
+    cols[idx[slack] - n, slack] = 1.0
+    return cols
+
+
+def _rmatvec(A, y):
+    return np.asarray(A.T @ y).ravel()
+
+
+def _complete_basis(A, basic, candidates):
+    """Acrescenta candidatos linearmente independentes até m colunas."""
+    m = A.shape[0]
+    Q = np.zeros((m, 0))
+    basic = list(basic)
+    for j in basic:
+        v = _columns(A, [j])[:, 0]
+        r = v - Q @ (Q.T @ v)
+        Q = np.column_stack([Q, r / np.linalg.norm(r)])
+    for j in candidates:
+        if len(basic) == m:
+            break
+        v = _columns(A, [j])[:, 0]
+        norm = np.linalg.norm(v)
+        if norm == 0:
+            continue
+        r = v - Q @ (Q.T @ v)
+        r_norm = np.linalg.norm(r)
+        if r_norm > 1e-8 * norm:
+            basic.append(j)
+            Q = np.column_stack([Q, r / r_norm])
+    return basic if len(basic) == m else None
+
+
+def _factor(B):
+    from scipy.linalg import lu_factor
+    if B.shape[0] != B.shape[1]:
+        raise ValueError("Base não quadrada")
+    lu = lu_factor(B, check_finite=False)
+    if np.min(np.abs(np.diag(lu[0])), initial=np.inf) <= np.finfo(float).eps * np.max(np.abs(B), initial=1.0):
+        raise np.linalg.LinAlgError("Base singular")
+    return lu
+
+
+def _solve(lu, rhs, trans=False):
+    from scipy.linalg import lu_solve
+    return lu_solve(lu, rhs, trans=1 if trans else 0, check_finite=False)
+
+
+def optimize_allocation(A, b, profit, bounds=None, method="auto", sparse=None, basis=None):
+    """Maximiza profit·x sujeito a A x ≤ b e limites por cultura (padrão x ≥ 0).
+
+    `method` escolhe o HiGHS: "simplex" (dual simplex), "ipm" (pontos
+    interiores com crossover) ou "auto". Com `sparse` (ou A grande e
+    esparsa) a matriz vai em CSR. Se `basis` vier de uma solução anterior
+    do mesmo problema (mesmos A, lucro e limites), o novo b é resolvido
+    pela base fatorada, sem chamar o HiGHS, quando ela continua viável.
+
+    Retorna x, lucro, preços-sombra por recurso, folgas, custos reduzidos
+    e a base ótima para o próximo warm start.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Método inválido: {method}")
+    A = _constraint_matrix(A, sparse)
+    from scipy import sparse as sp
+    is_sparse = sp.issparse(A)
+    b = np.asarray(b, dtype=float)
+    profit = np.asarray(profit, dtype=float)
+    m, n = A.shape
+    if b.shape != (m,) or profit.shape != (n,):
+        raise ValueError("Dimensões incompatíveis entre A, b e profit")
+    lo, hi = _bound_arrays(bounds, n)
+
+    if basis is not None and basis.matches(A, profit, lo, hi):
+        warm = basis.resolve(b)
+        if warm is not None:
+            x, slack = warm
+            return _result(
+                "optimal", "Base anterior continua ótima (warm start)", x, slack, b, profit,
+                basis.shadow_prices, basis.reduced_costs, "warm_start", is_sparse, 0, basis
+            )
+
+    from scipy.optimize import linprog
+    res = linprog(
+        -profit, A_ub=A, b_ub=b, bounds=np.column_stack([lo, hi]), method=METHODS[method]
+    )
+    status = STATUS.get(res.status, "numerical_error")
+    if res.status != 0:
+        return _result(status, res.message, None, None, b, profit, None, None,
+                       METHODS[method], is_sparse, res.nit, None)
+
+    # linprog minimiza −lucro: os multiplicadores trocam de sinal
+    shadow_prices = -res.ineqlin.marginals
+    reduced_costs = -(res.lower.marginals + res.upper.marginals)
+    new_basis = LPBasis.from_solution(A, profit, lo, hi, res.x, res.ineqlin.residual)
+    return _result(
+        status, res.message, res.x, res.ineqlin.residual, b, profit, shadow_prices,
+        reduced_costs, METHODS[method], is_sparse, res.nit, new_basis
+    )
+
+
+def _result(status, message, x, slack, b, profit, shadow_prices, reduced_costs,
+            method, is_sparse, iterations, basis):
+    optimal = x is not None
+    return {
+        "status": status,
+        "message": message,
+        "x": x,
+        "profit": float(profit @ x) if optimal else None,
+        "shadow_prices": shadow_prices,
+        "slack": slack,
+        "binding": slack <= 1e-9 * np.maximum(1.0, np.abs(b)) if optimal else None,
+        "reduced_costs": reduced_costs,
+        "method": method,
+        "sparse": is_sparse,
+        "iterations": int(iterations),
+        "warm_start": method == "warm_start",
+        "basis": basis,
+    }
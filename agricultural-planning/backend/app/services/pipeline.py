@@ -0,0 +1,327 @@
+import functools
+import numpy as np
+from ..utils.metrics import timed
+from .linear_algebra import (
+    factorize, solve_linear_system, condition_number,
+    compare_regularized_solution, tikhonov_path, select_lambda
+)
+from .sensitivity import (
+    sensitivity_analysis, local_sensitivity_matrix, monte_carlo_sensitivity,
+    analytic_sensitivity
+)
+
+# Linhas de A tratadas como igualdade (terra, mão de obra, água)
+EQUALITY_ROWS = 3
+# λ de Tikhonov do exemplo mal condicionado
+ILL_LAMBDA = 10.0
+# Valores de rel_perturb oferecidos pelo frontend (slider 1%..30%)
+PRECOMPUTED_PERTURBATIONS = tuple(round(0.01 * k, 2) for k in range(1, 31))
+
+
+def build_ill_conditioned_example():
+    """Exemplo mal condicionado."""
+    A_ill = np.array([
+        [1.0,   1.0,   1.0],
+        [2.01,  2.00,  1.99],
+        [3.01,  3.00,  2.99]
+    ])
+    b_ill = np.array([100.0, 200.0, 300.0])
+    return A_ill, b_ill
+
+
+@functools.lru_cache(maxsize=1)
+def _ill_conditioned_system():
+    A_ill, b_ill = build_ill_conditioned_example()
+    system_ill = factorize(A_ill)
+    x_normal_ill, x_reg_ill = compare_regularized_solution(system_ill, b_ill, lam=ILL_LAMBDA)
+    return system_ill, b_ill, x_normal_ill, x_reg_ill
+
+
+@functools.lru_cache(maxsize=128)
+def ill_conditioned_demo(rel_perturb):
+    """Resultados do exemplo mal condicionado (só dependem de rel_perturb)."""
+    system_ill, b_ill, x_normal_ill, x_reg_ill = _ill_conditioned_system()
+    return {
+        "sens_ill": sensitivity_analysis(system_ill, b_ill, rel_perturb),
+        "lam": ILL_LAMBDA,
+        "x_normal_ill": x_normal_ill,
+        "x_reg_ill": x_reg_ill,
+    }
+
+
+def warm_constants():
+    """Pré-calcula na inicialização o exemplo mal condicionado por rel_perturb."""
+    for rel_perturb in PRECOMPUTED_PERTURBATIONS:
+        ill_conditioned_demo(rel_perturb)
+
+
+def _visualization():
+    # matplotlib/seaborn (~1,5 s de importação) só entram na primeira
+    # renderização ou no aquecimento em segundo plano
+    from ..utils import visualization
+    return visualization
+
+
+def warm_renderer():
+    """Importa a pilha de gráficos e monta os templates do formato padrão."""
+    _visualization().warm_up()
+
+
+# ============================================================
+# GRAFO DE ESTÁGIOS
+# ============================================================
+
+STAGES = {}
+
+
+def stage(*deps):
+    """Registra um estágio nomeado (nome da função) com suas dependências."""
+    def register(fn):
+        STAGES[fn.__name__] = (fn, deps)
+        return fn
+    return register
+
+
+class AnalysisGraph:
+    """Avalia estágios sob demanda, calculando cada um no máximo uma vez."""
+
+    def __init__(self, **values):
+        self.values = dict(values)
+
+    def __getitem__(self, name):
+        if name not in self.values:
+            fn, deps = STAGES[name]
+            args = [self[dep] for dep in deps]
+            # Tempo só do próprio estágio (dependências já calculadas)
+            with timed(name):
+                self.values[name] = fn(*args)
+        return self.values[name]
+
+    def compute(self, names):
+        return {name: self[name] for name in names}
+
+
+@stage("A_base")
+def A_eq(A_base):
+    return A_base[:EQUALITY_ROWS, :]
+
+
+@stage("b_base")
+def b_eq(b_base):
+    return b_base[:EQUALITY_ROWS]
+
+
+@stage("A_eq", "equilibrate")
+def system(A_eq, equilibrate):
+    # Uma única fatoração por requisição
+    return factorize(A_eq, equilibrate=equilibrate)
+
+
+@stage("system", "b_eq", "rel_perturb", "perturb_direction")
+def sens_base(system, b_eq, rel_perturb, perturb_direction):
+    return sensitivity_analysis(system, b_eq, rel_perturb, direction=perturb_direction)
+
+
+@stage("sens_base")
+def sens_well(sens_base):
+    # Mesmo sistema e mesma perturbação do plano base
+    return sens_base
+
+
+@stage("sens_base")
+def x_base(sens_base):
+    return sens_base["x_base"]
+
+
+@stage("system")
+def kappa(system):
+    return condition_number(system)
+
+
+@stage("system")
+def kappa_scaled(system):
+    # Só com equilibragem (senão é o próprio kappa)
+    return system.kappa_scaled if system.equilibrated else None
+
+
+@stage("system", "equilibrate")
+def equilibrated(system, equilibrate):
+    # Pedida mas recusada (A de posto incompleto) vira False
+    return system.equilibrated if equilibrate else None
+
+
+@stage("profit", "x_base")
+def profit_base(profit, x_base):
+    return float(profit @ x_base)
+
+
+@stage("system", "b_eq", "profit", "rel_perturb")
+def profit_pert_pessimistic(system, b_eq, profit, rel_perturb):
+    # Redução de recursos
+    return float(profit @ solve_linear_system(system, b_eq * (1 - rel_perturb)))
+
+
+@stage("system", "b_eq", "profit", "rel_perturb")
+def profit_pert_optimistic(system, b_eq, profit, rel_perturb):
+    # Aumento de recursos
+    return float(profit @ solve_linear_system(system, b_eq * (1 + rel_perturb)))
+
+
+@stage("system", "b_eq")
+def lambda_path(system, b_eq):
+    # Caminho λ completo a partir da SVD já calculada
+    return tikhonov_path(system, b_eq)
+
+
+@stage("lambda_path", "lambda_method")
+def tikhonov(lambda_path, lambda_method):
+    path = lambda_path
+    lam_lcurve, idx_lcurve = select_lambda(path, "lcurve")
+    lam_gcv, idx_gcv = select_lambda(path, "gcv")
+    idx = idx_lcurve if lambda_method == "lcurve" else idx_gcv
+    return {
+        "method": lambda_method,
+        "lambda": float(path["lambdas"][idx]),
+        "lambda_lcurve": lam_lcurve,
+        "lambda_gcv": lam_gcv,
+        "x_reg": path["x"][idx],
+        "path": {
+            "lambdas": path["lambdas"],
+            "residual_norm": path["residual_norm"],
+            "solution_norm": path["solution_norm"],
+            "gcv": path["gcv"],
+            "curvature": path["curvature"],
+        },
+    }
+
+
+@stage("system", "b_eq", "profit", "derivatives")
+def analytic(system, b_eq, profit, derivatives):
+    # Derivadas exatas pela mesma pseudo-inversa; o tensor dx_dA só se pedido
+    return analytic_sensitivity(system, b_eq, profit, tensor=derivatives)
+
+
+@stage("rel_perturb")
+def ill_demo(rel_perturb):
+    return ill_conditioned_demo(round(float(rel_perturb), 6))
+
+
+@stage("ill_demo")
+def sens_ill(ill_demo):
+    return ill_demo["sens_ill"]
+
+
+@stage("system", "b_eq", "profit", "rel_perturb", "mc_options")
+def monte_carlo(system, b_eq, profit, rel_perturb, mc_options):
+    return monte_carlo_sensitivity(
+        system, b_eq, profit, rel_perturb,
+        n_samples=mc_options["samples"],
+        rel_perturb_A=mc_options["perturb_A"],
+        random_state=mc_options["seed"],
+    )
+
+
+@stage("A_base", "x_base")
+def S_base(A_base, x_base):
+    return local_sensitivity_matrix(A_base, x_base)
+
+
+@stage("S_base", "resources", "crops", "chart_format")
+def heatmap(S_base, resources, crops, chart_format):
+    return _visualization().plot_sensitivity_heatmap(S_base, resources, crops, chart_format)
+
+
+@stage("sens_base", "crops", "rel_perturb", "chart_format")
+def comparison(sens_base, crops, rel_perturb, chart_format):
+    return _visualization().plot_base_vs_perturbed(
+        sens_base["x_base"],
+        sens_base["x_pert_b"],
+        crops,
+        fixed_perturb=rel_perturb,
+        chart_format=chart_format
+    )
+
+
+@stage("sens_well", "sens_ill", "chart_format")
+def sensitivity(sens_well, sens_ill, chart_format):
+    return _visualization().plot_sensitivity_comparison(sens_well, sens_ill, chart_format)
+
+
+@stage("ill_demo", "chart_format")
+def regularization(ill_demo, chart_format):
+    return _visualization().plot_regularization(
+        ill_demo["x_normal_ill"], ill_demo["x_reg_ill"], ["C1", "C2", "C3"], ill_demo["lam"],
+        chart_format
+    )
+
+
+NUMERIC_OUTPUTS = (
+    "x_base", "kappa", "kappa_scaled", "equilibrated", "profit_base",
+    "profit_pert_pessimistic", "profit_pert_optimistic", "sens_base", "sens_well", "sens_ill",
+    "ill_demo", "S_base", "tikhonov", "analytic",
+)
+CHART_OUTPUTS = ("heatmap", "comparison", "sensitivity", "regularization")
+
+
+def run_solve_phase(A_base, b_base, profit, rel_perturb, mc_options=None,
+                    lambda_method="lcurve", perturb_direction="random", precomputed=None,
+                    equilibrate=False, derivatives=False):
+    """Fase numérica da análise (soluções, sensibilidade e regularização).
+
+    `mc_options` ({"samples", "perturb_A", "seed"}) liga o Monte Carlo.
+    `precomputed` traz estágios já calculados (ex.: "system" e "lambda_path"
+    de um modelo registrado), que o grafo não recalcula. `equilibrate`
+    fatora as restrições após a equilibragem de linhas e colunas;
+    `derivatives` inclui o tensor dx_dA na sensibilidade analítica.
+    """
+    graph = AnalysisGraph(
+        A_base=A_base, b_base=b_base, profit=profit, rel_perturb=rel_perturb,
+        mc_options=mc_options, lambda_method=lambda_method,
+        perturb_direction=perturb_direction, equilibrate=equilibrate, derivatives=derivatives,
+        **(precomputed or {})
+    )
+    outputs = NUMERIC_OUTPUTS + (("monte_carlo",) if mc_options else ())
+    return graph.compute(outputs)
+
+
+def run_render_phase(numeric, resources, crops, rel_perturb, charts=CHART_OUTPUTS,
+                     chart_format="png"):
+    """Fase de renderização dos gráficos a partir dos resultados numéricos.
+
+    Com `chart_format="spec"` cada gráfico é um dict JSON; nos demais
+    formatos, a imagem em base64.
+    """
+    graph = AnalysisGraph(
+        resources=resources, crops=crops, rel_perturb=rel_perturb,
+        chart_format=chart_format, **numeric
+    )
+    return graph.compute(charts)
+
+
+# Eventos do streaming, na ordem de emissão: primeiro os números da
+# solução, depois sensibilidade, regularização, Monte Carlo e gráficos
+STREAM_GROUPS = (
+    ("solution", ("x_base", "kappa", "kappa_scaled", "equilibrated", "profit_base",
+                  "profit_pert_pessimistic", "profit_pert_optimistic")),
+    ("sensitivity", ("sens_base", "sens_well", "sens_ill", "analytic")),
+    ("regularization", ("tikhonov",)),
+)
+
+
+def stream_plan(mc_options=None, charts=CHART_OUTPUTS):
+    """Grupos (evento, estágios) de uma análise em streaming."""
+    plan = STREAM_GROUPS
+    if mc_options:
+        plan += (("monte_carlo", ("monte_carlo",)),)
+    return plan + tuple(("chart", (chart,)) for chart in charts)
+
+
+def run_stage_group(values, names):
+    """Calcula os estágios `names` a partir dos valores já conhecidos.
+
+    Devolve todos os valores do grafo, inclusive intermediários como a
+    fatoração, para que o grupo seguinte não refaça o trabalho.
+    """
+    graph = AnalysisGraph(**values)
+    graph.compute(names)
+    return graph.values
@@ -0,0 +1,217 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from ..utils.cache import canonical_key, MemoryCache
+from .linear_algebra import factorize, tikhonov_path, FactorizedSystem
+from .pipeline import EQUALITY_ROWS
+
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+# Cada versão guarda um .npy por array: A, b, profit, a SVD (U, s, Vt) e a
+# pseudo-inversa das restrições de igualdade e o caminho λ de Tikhonov
+# para o b registrado (path_*)
+PATH_ARRAYS = ("lambdas", "x", "residual_norm", "solution_norm", "gcv", "curvature")
+
+
+class ModelNotFoundError(Exception):
+    """Nome ou versão sem modelo registrado."""
+
+
+class StoredModel:
+    """Versão registrada; os arrays são mapeados do disco no primeiro acesso.
+
+    Com mmap_mode="r" só as páginas lidas ocupam memória (e ficam no cache
+    de páginas do sistema, compartilhado entre processos), não o heap.
+    """
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self._arrays = {}
+        self._lock = threading.Lock()
+
+    def array(self, name):
+        with self._lock:
+            if name not in self._arrays:
+                path = os.path.join(self.directory, f"{name}.npy")
+                self._arrays[name] = np.load(path, mmap_mode="r")
+            return self._arrays[name]
+
+    @property
+    def A(self):
+        return self.array("A")
+
+    @property
+    def b(self):
+        return self.array("b")
+
+    @property
+    def profit(self):
+        return self.array("profit")
+
+    def system(self):
+        """FactorizedSystem das restrições de igualdade, sem nova SVD."""
+        k = self.meta["equality_rows"]
+        return FactorizedSystem(
+            self.A[:k], svd=(self.array("U"), self.array("s"), self.array("Vt")),
+            pinv=self.array("pinv"),
+        )
+
+    def lambda_path(self):
+        return {name: self.array(f"path_{name}") for name in PATH_ARRAYS}
+
+    def precomputed(self, b=None):
+        """Estágios do grafo de análise já calculados para esta versão.
+
+        O caminho λ depende de b: só entra se as restrições de igualdade
+        de `b` forem as registradas.
+        """
+        values = {"system": self.system()}
+        k = self.meta["equality_rows"]
+        if b is None or np.array_equal(b[:k], self.b[:k]):
+            values["lambda_path"] = self.lambda_path()
+        return values
+
+
+class ModelRegistry:
+    """Modelos nomeados e versionados em MODEL_DIR (padrão data/models).
+
+    Cada versão é gravada num diretório temporário e renomeada para
+    <nome>/<versão> ao final: a versão só existe completa, e duas gravações
+    concorrentes (inclusive de processos diferentes) não disputam o mesmo
+    número. Nada é lido na inicialização; metadados e arrays são carregados
+    no primeiro acesso a cada versão.
+    """
+
+    def __init__(self, directory=None, cache_size=None):
+        self.directory = directory or os.environ.get("MODEL_DIR", "data/models")
+        # Versões abertas (só metadados e mmaps; o conteúdo fica no disco)
+        self._open = MemoryCache(
+            maxsize=cache_size or int(os.environ.get("MODEL_CACHE_SIZE", "64")), ttl=0
+        )
+
+    def _versions(self, name):
+        try:
+            entries = os.listdir(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return []
+        return sorted(int(e) for e in entries if e.isdigit())
+
+    def _read_meta(self, name, version):
+        path = os.path.join(self.directory, name, str(version), "meta.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ModelNotFoundError(f"Modelo não encontrado: {name}@{version}")
+
+    def get(self, name, version=None):
+        """StoredModel de `name` (última versão se `version` for None)."""
+        if not NAME_PATTERN.match(name):
+            raise ModelNotFoundError(f"Modelo não encontrado: {name}")
+        if version is None:
+            versions = self._versions(name)
+            if not versions:
+                raise ModelNotFoundError(f"Modelo não encontrado: {name}")
+            version = versions[-1]
+        model_id = f"{name}@{version}"
+        model = self._open.get(model_id)
+        if model is None:
+            meta = self._read_meta(name, version)
+            model = StoredModel(os.path.join(self.directory, name, str(version)), meta)
+            self._open.set(model_id, model)
+        return model
+
+    def versions(self, name):
+        """Metadados de todas as versões de `name`."""
+        versions = self._versions(name)
+        if not NAME_PATTERN.match(name) or not versions:
+            raise ModelNotFoundError(f"Modelo não encontrado: {name}")
+        return [self._read_meta(name, v) for v in versions]
+
+    def list(self):
+        """Metadados da última versão de cada modelo."""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+        latest = []
+        for name in names:
+            versions = self._versions(name)
+            if NAME_PATTERN.match(name) and versions:
+                latest.append(self._read_meta(name, versions[-1]))
+        return latest
+
+    def register(self, name, resources, crops, A, b, profit, description=None):
+        """Grava uma nova versão com a fatoração e o caminho λ pré-calculados.
+
+        Se a última versão tiver o mesmo conteúdo, devolve-a sem gravar.
+        Devolve (metadados, criada).
+        """
+        if not NAME_PATTERN.match(name):
+            raise ValueError(
+                "Nome inválido: use até 64 letras, dígitos, '_', '.' ou '-'"
+            )
+        A, b, profit = (np.ascontiguousarray(v, dtype=float) for v in (A, b, profit))
+        key = canonical_key((A, b, profit), labels=(list(resources), list(crops)))
+        versions = self._versions(name)
+        if versions:
+            meta = self._read_meta(name, versions[-1])
+            if meta["key"] == key:
+                return meta, False
+
+        k = min(EQUALITY_ROWS, A.shape[0])
+        system = factorize(A[:k])
+        U, s, Vt = system.svd
+        path = tikhonov_path(system, b[:k])
+        arrays = {
+            "A": A, "b": b, "profit": profit,
+            "U": U, "s": s, "Vt": Vt, "pinv": system.pinv(),
+            **{f"path_{p}": path[p] for p in PATH_ARRAYS},
+        }
+        meta = {
+            "name": name, "description": description, "key": key,
+            "resources": list(resources), "crops": list(crops),
+            "shape": list(A.shape), "equality_rows": k,
+            "kappa": float(system.kappa) if np.isfinite(system.kappa) else None,
+            "rank": system.rank,
+            "nbytes": int(sum(a.nbytes for a in arrays.values())),
+        }
+
+        parent = os.path.join(self.directory, name)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+        try:
+            for array_name, array in arrays.items():
+                np.save(os.path.join(staging, f"{array_name}.npy"), array)
+            version = (versions[-1] if versions else 0) + 1
+            while True:
+                meta.update(version=version, id=f"{name}@{version}", created_at=time.time())
+                with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                try:
+                    # rename falha se a versão já existir (gravação concorrente)
+                    os.rename(staging, os.path.join(parent, str(version)))
+                    return meta, True
+                except OSError:
+                    if not os.path.isdir(os.path.join(parent, str(version))):
+                        raise
+                    version += 1
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+
+registry = ModelRegistry()
+
+
+def register_model(name, resources, crops, A, b, profit, description=None):
+    """registry.register como função de módulo (executável no pool de processos)."""
+    return registry.register(name, resources, crops, A, b, profit, description)
@@ -0,0 +1,130 @@
+import os
+import shutil
+import uuid
+
+import numpy as np
+from .linear_algebra import factorize, FactorizedSystem
+from ..utils.sinks import open_sink
+
+
+def _batched_pinv(A):
+    """Pseudo-inversas de uma pilha k×m×n com o mesmo corte de np.linalg.lstsq."""
+    m, n = A.shape[-2:]
+    return np.linalg.pinv(A, rcond=np.finfo(float).eps * max(m, n))
+
+
+def solve_scenarios(A, B, profits=None, ref_index=0):
+    """Resolve todos os cenários (linhas de B) de uma só vez.
+
+    A pode ser uma matriz m×n (ou FactorizedSystem), fatorada uma única vez,
+    ou uma pilha k×m×n com uma matriz por cenário. `profits` é um vetor n
+    (comum) ou uma matriz k×n. O desvio relativo de cada cenário é medido
+    contra a solução do cenário `ref_index`.
+    """
+    kappa, blocks = scenario_blocks(A, B, profits, ref_index)
+    block = next(blocks)
+    return {
+        "x": block["x"],
+        "profit": block.get("profit"),
+        "rel_dev": block["rel_dev"],
+        "kappa": kappa,
+    }
+
+
+def scenario_blocks(A, B, profits=None, ref_index=0, chunk_rows=None):
+    """Como solve_scenarios, em blocos de até `chunk_rows` cenários.
+
+    Valida a entrada e fatora A já na chamada; devolve (kappa, gerador de
+    blocos {"scenario", "x", "profit", "rel_dev"}), de modo que só um bloco
+    de resultados fica em memória por vez. Sem `chunk_rows`, um único bloco.
+    """
+    B = np.asarray(B, dtype=float)
+    if B.ndim != 2:
+        raise ValueError("B deve ser uma matriz (um vetor b por linha)")
+    k = B.shape[0]
+    if not 0 <= ref_index < k:
+        raise ValueError("ref_index fora do intervalo de cenários")
+    if chunk_rows is not None and chunk_rows < 1:
+        raise ValueError("chunk_rows deve ser positivo")
+    if profits is not None:
+        profits = np.asarray(profits, dtype=float)
+
+    kappa = None
+    if isinstance(A, FactorizedSystem) or np.ndim(A) == 2:
+        system = factorize(A)
+        P_T = system.pinv().T
+        kappa = system.kappa
+
+        def solve(rows):
+            # Um único GEMM contra todos os lados direitos empilhados
+            return B[rows] @ P_T
+    else:
+        A = np.asarray(A, dtype=float)
+        if A.ndim != 3 or A.shape[0] != k:
+            raise ValueError("A 3-D deve ter uma matriz por cenário (k×m×n)")
+
+        def solve(rows):
+            return _solve_stack(A[rows], B[rows])
+
+    def profit(X, rows):
+        if profits is None:
+            return None
+        return X @ profits if profits.ndim == 1 else np.einsum("ki,ki->k", X, profits[rows])
+
+    def blocks():
+        size = chunk_rows or k
+        x_ref = solve(slice(ref_index, ref_index + 1))[0] if size < k else None
+        for start in range(0, k, size):
+            rows = slice(start, min(start + size, k))
+            X = solve(rows)
+            ref = X[ref_index] if x_ref is None else x_ref
+            norm_ref = np.linalg.norm(ref)
+            if norm_ref == 0:
+                raise ValueError("Solução do cenário de referência é nula")
+            block = {
+                "scenario": np.arange(rows.start, rows.stop),
+                "x": X,
+                "rel_dev": np.linalg.norm(X - ref, axis=1) / norm_ref,
+            }
+            if profits is not None:
+                block["profit"] = profit(X, rows)
+            yield block
+
+    return kappa, blocks()
+
+
+def _solve_stack(A, B):
+    """Soluções de uma pilha k×m×n, uma matriz por lado direito (linhas de B)."""
+    m, n = A.shape[1:]
+    if m == n:
+        try:
+            return np.linalg.solve(A, B[:, :, np.newaxis])[:, :, 0]
+        except np.linalg.LinAlgError:
+            pass  # alguma matriz singular: recai na pseudo-inversa
+    return np.einsum("kij,kj->ki", _batched_pinv(A), B)
+
+
+def export_scenarios(A, B, profits, ref_index, path, format="npy", chunk_rows=65536):
+    """Resolve os cenários bloco a bloco, gravando cada bloco num sink.
+
+    A memória dos resultados fica limitada a `chunk_rows` cenários,
+    qualquer que seja o total.
+    """
+    kappa, blocks = scenario_blocks(A, B, profits, ref_index, chunk_rows)
+    metadata = {"kappa": None if kappa is None or not np.isfinite(kappa) else float(kappa),
+                "ref_index": ref_index}
+    # Grava ao lado e renomeia: `path` só existe completo
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open_sink(tmp, format, metadata) as sink:
+        for block in blocks:
+            sink.write(block)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Exportação idêntica concluída antes por outra requisição. O sink
+        # npy grava um diretório; o parquet, um arquivo só
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            os.remove(tmp)
+    return {"rows": sink.rows, "columns": list(sink.columns), "kappa": metadata["kappa"]}
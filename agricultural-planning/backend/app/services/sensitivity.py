@@ -1,26 +1,57 @@
 import numpy as np
-from .linear_algebra import solve_linear_system, condition_number
+from .linear_algebra import factorize, FactorizedSystem
 
-def sensitivity_analysis(A, b, rel_perturb=0.05, random_state=0):
-    """Calcula sensibilidade de x em relação a variações em b."""
-    x_base = solve_linear_system(A, b)
+def worst_case_direction(A):
+    """Direção unitária de Δb com maior amplificação ||A⁺Δb|| / ||Δb||.
 
-    rng = np.random.default_rng(random_state)
-    noise = rng.normal(size=b.shape)
-    noise = noise / np.linalg.norm(noise)
+    É o vetor singular à esquerda do menor valor singular não desprezado
+    (u_r); a resposta em x tem direção v_r e ganho 1/s_r. O sinal é fixado
+    para que a maior componente de v_r seja positiva. Vem sempre da SVD de
+    A original (raw_svd, guardada no sistema): a de um sistema equilibrado
+    mede Δb nas unidades escaladas.
+    """
+    system = factorize(A)
+    U, s, Vt = system.raw_svd
+    r = int(np.sum(s > system.rcond * s[0])) if s.size else 0
+    if r == 0:
+        raise ValueError("Matriz nula: direção de pior caso indefinida")
+    u, v = U[:, r - 1], Vt[r - 1]
+    if v[np.argmax(np.abs(v))] < 0:
+        u, v = -u, -v
+    return u, v, s[r - 1]
+
+
+def sensitivity_analysis(A, b, rel_perturb=0.05, random_state=0, direction="random"):
+    """Calcula sensibilidade de x em relação a variações em b.
+
+    `direction="worst"` troca o ruído aleatório pela direção de pior caso
+    (worst_case_direction), determinística.
+    """
+    system = factorize(A)
+
+    if direction == "worst":
+        noise = worst_case_direction(system)[0]
+    elif direction == "random":
+        rng = np.random.default_rng(random_state)
+        noise = rng.normal(size=b.shape)
+        noise = noise / np.linalg.norm(noise)
+    else:
+        raise ValueError(f"Direção inválida: {direction}")
     delta_b = rel_perturb * np.linalg.norm(b) * noise
     b_pert = b + delta_b
 
-    x_pert = solve_linear_system(A, b_pert)
+    # Uma única retrossubstituição para b e b + Δb
+    X = system.solve(np.column_stack([b, b_pert]))
+    x_base, x_pert = X[:, 0], X[:, 1]
 
     delta_x = x_pert - x_base
     rel_dx = np.linalg.norm(delta_x) / np.linalg.norm(x_base)
     rel_db = np.linalg.norm(delta_b) / np.linalg.norm(b)
 
-    kappa = condition_number(A)
+    kappa = system.kappa
     bound = kappa * rel_db
 
-    return {
+    result = {
         "x_base": x_base,
         "x_pert_b": x_pert,
         "rel_dx": rel_dx,
@@ -28,12 +59,266 @@ def sensitivity_analysis(A, b, rel_perturb=0.05, random_state=0):
         "kappa": kappa,
         "bound": bound,
     }
+    if system.equilibrated:
+        result["kappa_scaled"] = system.kappa_scaled
+    return result
+
+def analytic_sensitivity(A, b, profit=None, tensor=True):
+    """Derivadas exatas da solução x = A⁺b a partir da fatoração armazenada.
+
+    Retorna ∂x/∂b = A⁺ (n×m), ∂x/∂A_ij (tensor n×m×n, derivada da
+    pseudo-inversa com posto constante), elasticidades de x por recurso e a
+    direção de pior caso. Com `profit`, também ∂lucro/∂b, ∂lucro/∂A e a
+    elasticidade do lucro por recurso. Com `tensor=False` o tensor ∂x/∂A
+    (O(n²m) de memória) não é montado; ∂lucro/∂A vem direto dos fatores.
+
+    Num sistema equilibrado, x = D_c (D_r A D_c)⁺ D_r b: as derivadas são as
+    de A_s = D_r A D_c com as escalas fixas (potências de 2, constantes por
+    partes), levadas de volta às unidades originais.
+    """
+    system = factorize(A)
+    A_mat = system.A
+    b = np.asarray(b, dtype=float)
+    m, n = A_mat.shape
+    P = system.pinv()
+    x = P @ b
+    # Derivada da pseudo-inversa na matriz fatorada
+    A_s, P_s, x_s, b_s = A_mat, P, x, b
+    if system.equilibrated:
+        rs, cs = system.row_scale, system.col_scale
+        A_s, P_s, x_s, b_s = system.A_scaled, P / np.outer(cs, rs), x / cs, rs * b
+    G = P_s @ P_s.T                # (A_sᵀA_s)⁺
+    w = P_s.T @ x_s
+    # Resíduo e projetor no núcleo são exatamente nulos com posto completo
+    # (linhas / colunas); calculá-los só traria erro de arredondamento
+    r = np.zeros(m) if system.rank == m else b_s - A_s @ x_s
+    N = np.zeros((n, n)) if system.rank == n else np.eye(n) - P_s @ A_s
+
+    # d(A⁺) = −A⁺ dA A⁺ + A⁺A⁺ᵀ dAᵀ(I − AA⁺) + (I − A⁺A) dAᵀ A⁺ᵀA⁺, com dA = E_ij
+    dx_dA = None
+    if tensor:
+        dx_dA = (
+            -P_s[:, :, np.newaxis] * x_s[np.newaxis, np.newaxis, :]
+            + G[:, np.newaxis, :] * r[np.newaxis, :, np.newaxis]
+            + N[:, np.newaxis, :] * w[np.newaxis, :, np.newaxis]
+        )
+        if system.equilibrated:
+            # dx = D_c dy e dA_s = D_r dA D_c
+            dx_dA *= cs[:, np.newaxis, np.newaxis] * np.outer(rs, cs)[np.newaxis]
+
+    # Variação relativa de x_k por variação relativa de b_i
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_elasticity = np.where(x[:, np.newaxis] != 0, P * b[np.newaxis, :] / x[:, np.newaxis], np.nan)
+
+    u, v, s_r = worst_case_direction(system)
+    norm_x = np.linalg.norm(x)
+    result = {
+        "x": x,
+        "dx_db": P,
+        "x_elasticity": x_elasticity,
+        "worst_direction_b": u,
+        "worst_direction_x": v,
+        # ||Δx||/||x|| ÷ ||Δb||/||b|| ao longo de u (≤ kappa se b ∈ Im(A))
+        "worst_amplification": np.linalg.norm(b) / (s_r * norm_x) if norm_x else np.inf,
+        "kappa": system.kappa,
+    }
+    if dx_dA is not None:
+        result["dx_dA"] = dx_dA
+    if system.equilibrated:
+        result["kappa_scaled"] = system.kappa_scaled
+
+    if profit is not None:
+        profit = np.asarray(profit, dtype=float)
+        profit_x = float(profit @ x)
+        dprofit_db = P.T @ profit
+        # profitᵀ ∂x/∂A_ij pelos mesmos três termos, sem o tensor
+        p_s = profit * cs if system.equilibrated else profit
+        dprofit_dA = (
+            -np.outer(P_s.T @ p_s, x_s) + np.outer(r, p_s @ G) + np.outer(w, p_s @ N)
+        )
+        if system.equilibrated:
+            dprofit_dA *= np.outer(rs, cs)
+        result.update({
+            "profit": profit_x,
+            "dprofit_db": dprofit_db,
+            "dprofit_dA": dprofit_dA,
+            "profit_elasticity": dprofit_db * b / profit_x if profit_x else np.full_like(b, np.nan),
+        })
+    return result
+
 
 def local_sensitivity_matrix(A, x):
     """Calcula matriz de sensibilidade local recurso × cultura."""
+    if isinstance(A, FactorizedSystem):
+        A = A.A
     Ax = A @ x
     norm_Ax = np.linalg.norm(Ax)
     if norm_Ax == 0:
         return np.zeros_like(A)
     S = np.abs(A * x[np.newaxis, :]) / norm_Ax
     return S
+
+class _Histogram:
+    """Histogramas de bins fixos em [lo, hi] por coluna, acumulados por bloco.
+
+    Quantis por interpolação linear dentro do bin (erro ≤ largura do bin);
+    `tail_mean` usa também a soma dos valores de cada bin.
+    """
+
+    def __init__(self, lo, hi, bins):
+        self.lo = np.atleast_1d(np.asarray(lo, dtype=float))
+        hi = np.atleast_1d(np.asarray(hi, dtype=float))
+        # Intervalo degenerado (coluna constante): largura mínima positiva
+        tiny = np.finfo(float).eps * (np.abs(self.lo) + 1.0)
+        self.width = np.maximum(hi - self.lo, tiny) / bins
+        self.bins = bins
+        self.counts = np.zeros((len(self.lo), bins), dtype=np.int64)
+        self.sums = np.zeros((len(self.lo), bins))
+        self._offsets = np.arange(len(self.lo)) * bins
+
+    def add(self, values):
+        """Acumula `values` (amostras × colunas, ou 1-D para uma coluna)."""
+        values = values.reshape(len(values), -1)
+        idx = ((values - self.lo) / self.width).astype(np.int64)
+        np.clip(idx, 0, self.bins - 1, out=idx)
+        flat = (idx + self._offsets).ravel()
+        size = self.counts.size
+        self.counts += np.bincount(flat, minlength=size).reshape(self.counts.shape)
+        self.sums += np.bincount(flat, weights=values.ravel(), minlength=size).reshape(self.sums.shape)
+
+    def quantile(self, q):
+        """Quantis `q` de cada coluna (colunas × quantis)."""
+        total = self.counts[0].sum()
+        cum = np.cumsum(self.counts, axis=1)
+        ranks = np.asarray(q, dtype=float) * total
+        out = np.empty((len(self.lo), len(ranks)))
+        rows = np.arange(len(self.lo))
+        for i, rank in enumerate(ranks):
+            j = np.minimum((cum <= rank).sum(axis=1), self.bins - 1)
+            before = cum[rows, j] - self.counts[rows, j]
+            inside = np.clip((rank - before) / np.maximum(self.counts[rows, j], 1), 0.0, 1.0)
+            out[:, i] = self.lo + self.width * (j + inside)
+        return out
+
+    def tail_mean(self, threshold):
+        """Média dos valores ≥ threshold (1ª coluna), com fração do bin de corte."""
+        j = min(max(int((threshold - self.lo[0]) / self.width[0]), 0), self.bins - 1)
+        counts, sums = self.counts[0], self.sums[0]
+        edge = self.lo[0] + self.width[0] * (j + 1)
+        fraction = np.clip((edge - threshold) / self.width[0], 0.0, 1.0)
+        n = counts[j + 1:].sum() + fraction * counts[j]
+        total = sums[j + 1:].sum() + fraction * sums[j]
+        return total / n if n else threshold
+
+
+def monte_carlo_sensitivity(A, b, profit=None, rel_perturb=0.05, n_samples=10000,
+                            rel_perturb_A=0.0, random_state=0, chunk_size=None,
+                            quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), alpha=0.05,
+                            max_chunk_bytes=16 * 2**20, bins=None):
+    """Robustez de x por Monte Carlo vetorizado.
+
+    Cada amostra perturba b com ||Δb|| = rel_perturb ||b|| (como
+    perturb_vector) e, opcionalmente, A com ||ΔA||_F = rel_perturb_A ||A||_F
+    (como perturb_matrix). As amostras passam pela pseudo-inversa já
+    calculada em um único GEMM por bloco; perturbações de A usam a
+    linearização de primeira ordem Δx ≈ A⁺(Δb − ΔA x).
+
+    Nenhuma amostra é guardada: cada bloco entra em médias e variâncias
+    (Welford), máximos e histogramas de bins fixos. O ruído efetivo tem
+    ||Δb − ΔA x|| ≤ R = rel_perturb ||b|| + rel_perturb_A ||A||_F ||x||, então
+    os intervalos dos histogramas (x_k ± ||A⁺_k|| R, etc.) são conhecidos
+    antes da primeira amostra. A memória fica em O(bloco + n·bins),
+    qualquer que seja n_samples; quantis, VaR e CVaR têm erro de no máximo
+    um bin.
+    """
+    if n_samples < 1:
+        raise ValueError("n_samples deve ser positivo")
+    system = factorize(A)
+    A_mat = system.A
+    b = np.asarray(b, dtype=float)
+    m, n = A_mat.shape
+    P = system.pinv()
+    x_base = P @ b
+    norm_x = np.linalg.norm(x_base)
+    if norm_x == 0:
+        raise ValueError("Solução base nula: sensibilidade relativa indefinida")
+
+    if chunk_size is None:
+        per_sample = 8 * (m + 2 * n + (m * n if rel_perturb_A else 0))
+        chunk_size = max(1, min(n_samples, max_chunk_bytes // per_sample))
+    if bins is None:
+        # Contagens e somas dos histogramas de x no mesmo orçamento de um bloco
+        bins = int(np.clip(max_chunk_bytes // (16 * n), 64, 2048))
+
+    # Fluxos separados para b e A: resultado independe do tamanho do bloco
+    rng_b, rng_A = np.random.default_rng(random_state).spawn(2)
+    scale_b = rel_perturb * np.linalg.norm(b)
+    scale_A = rel_perturb_A * np.linalg.norm(A_mat)
+    radius = scale_b + scale_A * norm_x
+    reach_x = np.linalg.norm(P, axis=1) * radius
+    hist_x = _Histogram(-reach_x, reach_x, bins)
+    hist_rel = _Histogram(0.0, np.linalg.norm(P, 2) * radius / norm_x, bins)
+    if profit is not None:
+        profit = np.asarray(profit, dtype=float)
+        reach_p = np.linalg.norm(P.T @ profit) * radius
+        hist_loss = _Histogram(-reach_p, reach_p, bins)
+        loss_sum = 0.0
+
+    count, dx_mean, dx_m2, rel_dx_max = 0, np.zeros(n), np.zeros(n), 0.0
+    for start in range(0, n_samples, chunk_size):
+        k = min(chunk_size, n_samples - start)
+        noise = rng_b.standard_normal((k, m))
+        noise *= scale_b / np.linalg.norm(noise, axis=1, keepdims=True)
+        if rel_perturb_A:
+            noise_A = rng_A.standard_normal((k, m, n))
+            noise_A *= scale_A / np.linalg.norm(noise_A, axis=(1, 2))[:, np.newaxis, np.newaxis]
+            noise -= noise_A @ x_base
+        delta_x = noise @ P.T
+
+        # Welford por blocos (Chan et al.) sobre Δx
+        chunk_mean = delta_x.mean(axis=0)
+        shift = chunk_mean - dx_mean
+        total = count + k
+        dx_m2 += ((delta_x - chunk_mean) ** 2).sum(axis=0) + shift ** 2 * count * k / total
+        dx_mean += shift * k / total
+        count = total
+
+        rel_dx = np.linalg.norm(delta_x, axis=1) / norm_x
+        rel_dx_max = max(rel_dx_max, float(rel_dx.max()))
+        hist_rel.add(rel_dx)
+        hist_x.add(delta_x)
+        if profit is not None:
+            losses = -(delta_x @ profit)
+            loss_sum += float(losses.sum())
+            hist_loss.add(losses)
+
+    rel_total = rel_perturb + rel_perturb_A
+    kappa = system.kappa
+    q = np.asarray(quantiles, dtype=float)
+
+    summary = {
+        "n_samples": n_samples,
+        "quantiles": q,
+        "x_mean": x_base + dx_mean,
+        "x_std": np.sqrt(dx_m2 / n_samples),
+        "x_quantiles": x_base[:, np.newaxis] + hist_x.quantile(q),   # cultura × quantil
+        "rel_dx_quantiles": hist_rel.quantile(q)[0],
+        "rel_dx_max": rel_dx_max,
+        "amplification_max": rel_dx_max / rel_total if rel_total else 0.0,
+        "kappa": kappa,
+        "bound": kappa * rel_total,
+    }
+
+    if profit is not None:
+        profit_base = float(profit @ x_base)
+        # lucro = lucro_base − perda: quantil q do lucro é o 1 − q da perda
+        var = float(hist_loss.quantile([1 - alpha])[0, 0])
+        summary.update({
+            "alpha": alpha,
+            "profit_mean": profit_base - loss_sum / n_samples,
+            "profit_quantiles": profit_base - hist_loss.quantile(1 - q)[0],
+            "profit_var": var,                              # perda no nível 1 - alpha
+            "profit_cvar": float(hist_loss.tail_mean(var)),  # perda média na cauda
+        })
+
+    return summary
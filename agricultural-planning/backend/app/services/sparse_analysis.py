@@ -0,0 +1,37 @@
+import numpy as np
+from .linear_algebra import iterative_lstsq, condition_estimate, scale_matrix
+
+
+def analyze_sparse(A, b, profit=None, lam=0.0, solver="lsmr", atol=1e-10, btol=1e-10,
+                   maxiter=None, estimate_kappa=True, equilibrate=False):
+    """Análise de fazendas grandes com A esparsa (CSR).
+
+    Resolve min ||A x - b||^2 + lam ||x||^2 por LSMR/LSQR, só com produtos
+    matriz-vetor. Com `estimate_kappa`, kappa_2(A) vem dos valores singulares
+    extremos (Lanczos), sem SVD completa; o limite de perturbação
+    rel_dx ≤ kappa·rel_db fica disponível sem fatorar A. Com `equilibrate`,
+    o solver itera sobre D_r A D_c e a resposta traz também kappa_scaled.
+    """
+    b = np.asarray(b, dtype=float)
+    result = iterative_lstsq(A, b, lam=lam, solver=solver, atol=atol, btol=btol,
+                             maxiter=maxiter, equilibrate=equilibrate)
+    # As escalas do solver servem ao kappa_scaled; não vão na resposta
+    r, c = result.pop("row_scale"), result.pop("col_scale")
+    x = result["x"]
+    if profit is not None:
+        profit = np.asarray(profit, dtype=float)
+        if profit.shape != (A.shape[1],):
+            raise ValueError("profit deve ter um valor por variável (coluna de A)")
+    analysis = {
+        **result,
+        "profit": float(profit @ x) if profit is not None else None,
+        "kappa": condition_estimate(A) if estimate_kappa else None,
+        "lam": float(lam),
+        "shape": list(A.shape),
+        "nnz": int(A.nnz),
+    }
+    if equilibrate:
+        analysis["kappa_scaled"] = (
+            condition_estimate(scale_matrix(A, r, c)) if estimate_kappa else None
+        )
+    return analysis
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Incrementar quando o formato da resposta mudar (invalida entradas antigas,
+# inclusive as do cache em disco, e os ETags derivados de canonical_key).
+# v2: tikhonov (caminho λ e seleção), monte_carlo em estatísticas por bloco,
+# campos de sensibilidade analítica e kappa_scaled
+# v3: gráficos com tamanho fixo (sem bbox_inches='tight')
+# v4: equilibrate só nas linhas com m < n, sem escala com posto incompleto,
+# e o campo equilibrated
+# v5: dx_dA só com include=derivatives
+CACHE_VERSION = b"analyze-v5"
+
+
+def canonical_key(arrays, scalars=(), labels=None):
+    """Hash canônico da entrada validada.
+
+    Arrays são normalizados para float64 contíguo (forma + bytes); rótulos
+    só entram quando afetam a saída (gráficos).
+    """
+    h = hashlib.sha256(CACHE_VERSION)
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr, dtype=np.float64)
+        h.update(repr(arr.shape).encode())
+        h.update(arr.tobytes())
+    h.update(np.asarray(scalars, dtype=np.float64).tobytes())
+    if labels is not None:
+        for group in labels:
+            h.update(b"\x1e" + "\x1f".join(group).encode())
+    return h.hexdigest()
+
+
+def variant_key(key, *parts):
+    """Deriva uma chave para uma variante (modo/subconjunto) da mesma entrada."""
+    return hashlib.sha256(":".join((key,) + parts).encode()).hexdigest()
+
+
+class MemoryCache:
+    """LRU em memória com limite de entradas e TTL (segundos)."""
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        """Remove a entrada; devolve o valor (None se ausente ou expirada)."""
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None or (item[0] is not None and item[0] < time.monotonic()):
+            return None
+        return item[1]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """Armazena bytes em arquivos (um por chave) com TTL e limite de entradas."""
+
+    def __init__(self, directory, maxsize=1024, ttl=86400):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl and os.path.getmtime(path) + self.ttl < time.time():
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(value)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".bin")]
+        if len(entries) <= self.maxsize:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.maxsize]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def __len__(self):
+        return sum(1 for e in os.scandir(self.directory) if e.name.endswith(".bin"))
+
+
+class ResultCache:
+    """Fachada do cache de resultados com métricas de acerto/erro."""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """RESULT_CACHE=memory|disk|none, RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_DIR."""
+        kind = os.environ.get("RESULT_CACHE", "memory")
+        size = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+        ttl = float(os.environ.get("RESULT_CACHE_TTL", "3600"))
+        if kind == "none":
+            return cls(None)
+        if kind == "disk":
+            directory = os.environ.get("RESULT_CACHE_DIR", "data/cache")
+            return cls(DiskCache(directory, maxsize=size, ttl=ttl))
+        if kind != "memory":
+            raise ValueError(f"Backend de cache inválido: {kind}")
+        return cls(MemoryCache(maxsize=size, ttl=ttl))
+
+    def get(self, key):
+        value = self.backend.get(key) if self.backend is not None else None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+result_cache = ResultCache.from_env()
+# Resultados numéricos por id de análise, para renderização sob demanda
+analysis_store = MemoryCache(
+    maxsize=int(os.environ.get("ANALYSIS_STORE_SIZE", "512")),
+    ttl=float(os.environ.get("ANALYSIS_STORE_TTL", "3600")),
+)
+# Bases ótimas de LP por problema (A, lucro, limites), para warm start com novo b
+basis_store = MemoryCache(
+    maxsize=int(os.environ.get("BASIS_STORE_SIZE", "256")),
+    ttl=float(os.environ.get("ANALYSIS_STORE_TTL", "3600")),
+)
+# Imagens já renderizadas por (id, gráfico)
+image_cache = ResultCache(MemoryCache(
+    maxsize=int(os.environ.get("IMAGE_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("ANALYSIS_STORE_TTL", "3600")),
+))
+# Sessões de edição incremental (fatoração QR mantida entre requisições)
+session_store = MemoryCache(
+    maxsize=int(os.environ.get("SESSION_STORE_SIZE", "64")),
+    ttl=float(os.environ.get("SESSION_TTL", "1800")),
+)
@@ -0,0 +1,213 @@
+"""Formatos binários de requisição/resposta: MessagePack e buffer float64.
+
+Buffer float64 (application/vnd.agromonitor.float64):
+
+    4 bytes  b"AGF8"
+    4 bytes  uint32 little-endian: tamanho h do cabeçalho
+    h bytes  cabeçalho JSON UTF-8 {"fields": {...}, "arrays": [[nome, forma], ...]}
+             (completado com espaços até múltiplo de 8)
+    ...      dados float64 little-endian de cada array, em ordem C, na ordem de "arrays"
+
+Nomes de arrays aninhados usam ponto ("tikhonov.path.lambdas"). Em
+MessagePack, arrays vão como mapas {"shape", "dtype", "data": bin}; listas
+simples também são aceitas na requisição.
+"""
+import json
+import math
+import struct
+
+import numpy as np
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+FLOAT64 = "application/vnd.agromonitor.float64"
+FORMATS = (JSON, MSGPACK, FLOAT64)
+
+# Outros nomes usados por clientes MessagePack
+_ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+
+MAGIC = b"AGF8"
+_PREFIX = struct.Struct("<4sI")
+
+
+def _media(value):
+    media = value.split(";")[0].strip().lower()
+    return _ALIASES.get(media, media)
+
+
+def request_format(content_type):
+    """Formato do corpo pela Content-Type (JSON se ausente)."""
+    if not content_type:
+        return JSON
+    media = _media(content_type)
+    if media not in FORMATS:
+        raise ValueError(f"Content-Type não suportado: {media}. Opções: {', '.join(FORMATS)}")
+    return media
+
+
+def response_format(accept):
+    """Formato da resposta pelo Accept (maior q; JSON para */*). None se nenhum serve."""
+    if not accept:
+        return JSON
+    best, best_q = None, 0.0
+    for part in accept.split(","):
+        media, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media = _media(media)
+        if media in ("*/*", "application/*"):
+            media = JSON
+        if media in FORMATS and q > best_q:
+            best, best_q = media, q
+    return best
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ValueError("Formato MessagePack indisponível (pacote msgpack não instalado)")
+    return msgpack
+
+
+def decode(body, media_type):
+    """Corpo binário → dict; arrays viram ndarrays sobre o próprio buffer (sem cópia)."""
+    if media_type == MSGPACK:
+        msgpack = _msgpack()
+        try:
+            return msgpack.unpackb(body, raw=False, object_hook=_unpack_array)
+        except (msgpack.UnpackException, ValueError, TypeError) as e:
+            raise ValueError(f"MessagePack inválido: {e}")
+    if media_type == FLOAT64:
+        return decode_float64(body)
+    raise ValueError(f"Formato sem decodificador binário: {media_type}")
+
+
+def encode(payload, media_type):
+    """dict com ndarrays → bytes no formato binário pedido."""
+    if media_type == MSGPACK:
+        return _msgpack().packb(payload, default=_pack_default)
+    if media_type == FLOAT64:
+        return encode_float64(payload)
+    raise ValueError(f"Formato sem codificador binário: {media_type}")
+
+
+def _unpack_array(obj):
+    if set(obj) == {"shape", "dtype", "data"} and isinstance(obj["data"], bytes):
+        dtype = np.dtype(obj["dtype"])
+        if dtype.kind not in "fiu":
+            raise ValueError(f"dtype não numérico: {obj['dtype']}")
+        return np.frombuffer(obj["data"], dtype=dtype).reshape(obj["shape"])
+    return obj
+
+
+def _pack_default(obj):
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind in "fiu":
+            arr = np.ascontiguousarray(obj, dtype=obj.dtype.newbyteorder("<"))
+            return {"shape": list(arr.shape), "dtype": arr.dtype.str, "data": arr.tobytes()}
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+def _plain(value):
+    """Valor do cabeçalho JSON (não finitos viram null, como na resposta JSON)."""
+    if isinstance(value, np.ndarray):
+        return [_plain(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _split_arrays(payload, arrays, prefix=""):
+    """Separa os arrays float do payload (em `arrays`); devolve o restante."""
+    fields = {}
+    for key, value in payload.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            fields[key] = _split_arrays(value, arrays, f"{name}.")
+        elif isinstance(value, np.ndarray) and value.dtype.kind == "f":
+            arrays.append((name, np.ascontiguousarray(value, dtype="<f8")))
+        else:
+            fields[key] = _plain(value)
+    return fields
+
+
+def encode_float64(payload):
+    """Payload → buffer float64: arrays float no corpo, o restante no cabeçalho."""
+    arrays = []
+    fields = _split_arrays(payload, arrays)
+    header = json.dumps(
+        {"fields": fields, "arrays": [[name, list(a.shape)] for name, a in arrays]},
+        ensure_ascii=False, separators=(",", ":")
+    ).encode()
+    # Dados alinhados em 8 bytes
+    header += b" " * (-(_PREFIX.size + len(header)) % 8)
+    return b"".join([_PREFIX.pack(MAGIC, len(header)), header, *(a.data for _, a in arrays)])
+
+
+def _array_specs(specs):
+    """Valida "arrays" do cabeçalho: lista de pares [nome, forma]."""
+    if not isinstance(specs, list):
+        raise TypeError("arrays deve ser uma lista de pares [nome, forma]")
+    for spec in specs:
+        if not (isinstance(spec, list) and len(spec) == 2):
+            raise TypeError(f"item de arrays deve ser um par [nome, forma]: {spec!r}")
+        name, shape = spec
+        if not isinstance(name, str) or not name:
+            raise TypeError(f"nome de array inválido: {name!r}")
+        if not isinstance(shape, list) or not all(
+            isinstance(d, int) and not isinstance(d, bool) and d >= 0 for d in shape
+        ):
+            raise ValueError(f"Forma inválida para {name}: {shape!r}")
+    return [(name, tuple(shape)) for name, shape in specs]
+
+
+def decode_float64(body):
+    """Buffer float64 → dict, com np.frombuffer direto sobre o corpo."""
+    if len(body) < _PREFIX.size:
+        raise ValueError("Buffer float64 truncado")
+    magic, size = _PREFIX.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("Buffer float64 sem o cabeçalho AGF8")
+    offset = _PREFIX.size + size
+    if offset > len(body):
+        raise ValueError("Buffer float64 truncado no cabeçalho")
+    try:
+        header = json.loads(bytes(memoryview(body)[_PREFIX.size:offset]))
+        if not isinstance(header, dict):
+            raise TypeError("o cabeçalho deve ser um objeto")
+        fields, specs = header.get("fields", {}), _array_specs(header["arrays"])
+        if not isinstance(fields, dict):
+            raise TypeError("fields deve ser um objeto")
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Cabeçalho float64 inválido: {e}")
+
+    for name, shape in specs:
+        count = math.prod(shape)
+        if offset + 8 * count > len(body):
+            raise ValueError("Buffer float64 menor que as formas do cabeçalho")
+        array = np.frombuffer(body, dtype="<f8", count=count, offset=offset).reshape(shape)
+        offset += 8 * count
+        target = fields
+        *parents, leaf = name.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+            if not isinstance(target, dict):
+                raise ValueError(f"Array {name} colide com o campo {part}")
+        target[leaf] = array
+    if offset != len(body):
+        raise ValueError("Bytes sobrando após os arrays do buffer float64")
+    return fields
@@ -0,0 +1,163 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from . import metrics
+
+
+class QueueFullError(Exception):
+    """Fila de análises saturada (backpressure)."""
+
+    def __init__(self, retry_after):
+        super().__init__("Fila de análises saturada. Tente novamente em instantes.")
+        self.retry_after = retry_after
+
+
+def _timed_call(fn, args):
+    """Executa fn no worker e devolve o instante (wall clock) de início.
+
+    Os tempos por estágio medidos no worker voltam junto com o resultado.
+    """
+    started_at = time.time()
+    with metrics.collect() as timings:
+        result = fn(*args)
+    return started_at, time.time() - started_at, timings, result
+
+
+class AnalysisExecutor:
+    """Pool limitado (thread ou processo) para as fases pesadas da análise.
+
+    `max_queue` limita quantas tarefas podem aguardar além das que já estão
+    em execução; acima disso `run` levanta QueueFullError.
+    """
+
+    def __init__(self, kind="thread", max_workers=None, max_queue=None, initializer=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de executor inválido: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else 4 * self.max_workers
+        # Executado uma vez em cada processo worker (modo "process")
+        self.initializer = initializer
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+        # Métricas (alteradas apenas no event loop)
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._last_wait = 0.0
+        self._avg_run = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """Configura o executor a partir de variáveis de ambiente."""
+        workers = os.environ.get("ANALYSIS_WORKERS")
+        queue = os.environ.get("ANALYSIS_QUEUE_SIZE")
+        return cls(
+            kind=os.environ.get("ANALYSIS_EXECUTOR", "thread"),
+            max_workers=int(workers) if workers else None,
+            max_queue=int(queue) if queue else None,
+        )
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    @property
+    def pool(self):
+        # Criado sob lock: o aquecimento em segundo plano também o acessa
+        with self._pool_lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    # fork com a thread de aquecimento importando módulos pode
+                    # travar o filho: usa forkserver/spawn
+                    methods = multiprocessing.get_all_start_methods()
+                    context = multiprocessing.get_context(
+                        "forkserver" if "forkserver" in methods else "spawn"
+                    )
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=context,
+                        initializer=self.initializer
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="analysis"
+                    )
+            return self._pool
+
+    def prestart(self):
+        """Sobe os processos worker (e seu initializer) antes da primeira análise."""
+        if self.kind == "process":
+            for future in [self.pool.submit(int) for _ in range(self.max_workers)]:
+                future.result()
+
+    def retry_after(self):
+        """Estimativa (s) até liberar uma vaga, com base no tempo médio de execução."""
+        backlog = max(self._in_flight - self.max_workers, 0) + 1
+        return max(1, math.ceil(self._avg_run * backlog / self.max_workers))
+
+    async def run(self, fn, *args):
+        """Executa fn(*args) no pool, aplicando backpressure."""
+        if self._in_flight >= self.capacity:
+            self._rejected += 1
+            raise QueueFullError(self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        future = self.pool.submit(_timed_call, fn, args)
+        self._in_flight += 1
+        # A vaga só é liberada quando a tarefa termina no pool, mesmo que quem
+        # a aguarda seja cancelado antes (cliente desconectou, timeout)
+        future.add_done_callback(lambda _: self._release(loop))
+        started_at, run_time, timings, result = await asyncio.wrap_future(future)
+
+        wait = max(started_at - submitted_at, 0.0)
+        metrics.record("queue", wait)
+        metrics.extend(timings)
+        self._completed += 1
+        self._last_wait = wait
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        self._avg_run = run_time if self._completed == 1 else 0.9 * self._avg_run + 0.1 * run_time
+        return result
+
+    def _release(self, loop):
+        # Chamado na thread do pool: o contador só muda no event loop
+        try:
+            loop.call_soon_threadsafe(self._decrement)
+        except RuntimeError:
+            # Event loop já encerrado
+            self._decrement()
+
+    def _decrement(self):
+        self._in_flight -= 1
+
+    def stats(self):
+        """Profundidade da fila e tempos de espera."""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": max(self._in_flight - self.max_workers, 0),
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "wait_last_s": self._last_wait,
+            "wait_avg_s": self._wait_total / self._completed if self._completed else 0.0,
+            "wait_max_s": self._wait_max,
+            "run_avg_s": self._avg_run,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+executor = AnalysisExecutor.from_env()
@@ -0,0 +1,285 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from . import metrics
+
+# Estados de um job; "done" e "failed" são finais
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    client      TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    input       BLOB NOT NULL,
+    result      BLOB,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    owner       TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_client ON jobs (client, status);
+"""
+
+# Colunas acrescentadas depois da primeira versão da tabela
+_MIGRATIONS = {"owner": "TEXT", "lease_until": "REAL"}
+
+
+class ClientLimitError(Exception):
+    """Cliente já tem o máximo de jobs na fila ou em execução."""
+
+    def __init__(self, limit):
+        super().__init__(f"Limite de {limit} jobs simultâneos por cliente atingido.")
+        self.limit = limit
+
+
+class JobStore:
+    """Jobs persistidos em SQLite (sobrevivem a reinícios).
+
+    O id do job é a chave de conteúdo da análise: submissões idênticas caem
+    na mesma linha. Uma conexão por thread; as transações que mudam estado
+    usam BEGIN IMMEDIATE, seguras também entre processos.
+
+    Um job em execução pertence a um dono (o processo que o pegou) até
+    lease_until; o dono renova a concessão com heartbeat, e só concessões
+    vencidas voltam para a fila.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in _MIGRATIONS.items():
+                if name not in columns:
+                    try:
+                        conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+                    except sqlite3.OperationalError as e:
+                        # Outro processo migrou a tabela ao mesmo tempo
+                        if "duplicate column" not in str(e):
+                            raise
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, job_id, client, params, input_blob, limit=None):
+        """Enfileira o job, ou devolve o existente com o mesmo id.
+
+        Retorna (status, criado). Jobs que falharam são reenfileirados.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None and row[0] != FAILED:
+                conn.execute("COMMIT")
+                return row[0], False
+            if limit:
+                (active,) = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE client = ? AND status IN (?, ?)",
+                    (client, *ACTIVE)
+                ).fetchone()
+                if active >= limit:
+                    raise ClientLimitError(limit)
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, client, status, params, input, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, client, QUEUED, json.dumps(params), input_blob, time.time())
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return QUEUED, True
+
+    def claim(self, owner, lease):
+        """Marca o job mais antigo da fila como em execução por `owner`, com
+        concessão de `lease` segundos, e o devolve (ou None)."""
+        now = time.time()
+        row = self._connect().execute(
+            "UPDATE jobs SET status = ?, started_at = ?, owner = ?, lease_until = ? WHERE id = ("
+            "  SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1"
+            ") RETURNING id, params, input",
+            (RUNNING, now, owner, now + lease, QUEUED)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def finish(self, job_id, result=None, error=None):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, input = ?, "
+            "owner = NULL, lease_until = NULL WHERE id = ?",
+            # A entrada só é necessária até o job terminar
+            (FAILED if error is not None else DONE, result, error, time.time(), b"", job_id)
+        )
+
+    def get(self, job_id):
+        row = self._connect().execute(
+            "SELECT id, status, error, created_at, started_at, finished_at, result "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "status", "error", "created_at", "started_at", "finished_at", "result")
+        return dict(zip(keys, row))
+
+    def heartbeat(self, owner, lease):
+        """Renova por `lease` segundos a concessão dos jobs em execução de `owner`."""
+        return self._connect().execute(
+            "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ?",
+            (time.time() + lease, owner, RUNNING)
+        ).rowcount
+
+    def requeue_expired(self):
+        """Jobs cujo dono parou de renovar a concessão (processo morto ou
+        reiniciado) voltam para a fila; os de processos vivos ficam."""
+        return self._connect().execute(
+            "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, lease_until = NULL "
+            "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+            (QUEUED, RUNNING, time.time())
+        ).rowcount
+
+    def prune(self, max_age):
+        """Remove jobs finalizados há mais de max_age segundos."""
+        return self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (DONE, FAILED, time.time() - max_age)
+        ).rowcount
+
+    def stats(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)} | dict(rows.fetchall())
+
+
+class JobQueue:
+    """Fila local de análises longas, consumida por threads worker.
+
+    Sem broker externo: a fila é a própria tabela do SQLite. `handler`
+    recebe (params, input_blob) e devolve o resultado em bytes.
+    """
+
+    def __init__(self, path, workers=2, client_limit=4, retention=7 * 86400, poll=1.0,
+                 lease=60.0):
+        self.path = path
+        self.workers = workers
+        self.client_limit = client_limit
+        self.retention = retention
+        self.poll = poll
+        self.lease = lease
+        self.owner = None
+        self.handler = None
+        self._store = None
+        self._threads = []
+        self._wakeup = threading.Condition()
+        self._halt = threading.Event()
+        self._stopping = False
+
+    @classmethod
+    def from_env(cls):
+        """JOB_DB, JOB_WORKERS, JOB_CLIENT_LIMIT, JOB_RETENTION, JOB_LEASE."""
+        return cls(
+            path=os.environ.get("JOB_DB", "data/jobs.sqlite3"),
+            workers=int(os.environ.get("JOB_WORKERS", "2")),
+            client_limit=int(os.environ.get("JOB_CLIENT_LIMIT", "4")),
+            retention=float(os.environ.get("JOB_RETENTION", str(7 * 86400))),
+            lease=float(os.environ.get("JOB_LEASE", "60")),
+        )
+
+    @property
+    def store(self):
+        # Aberto só no primeiro uso: não pesa na inicialização
+        if self._store is None:
+            self._store = JobStore(self.path)
+        return self._store
+
+    def start(self):
+        """Recupera jobs com concessão vencida e sobe os workers e o heartbeat."""
+        self._stopping = False
+        self._halt.clear()
+        # Dono dos jobs pegos por este processo (definido aqui, não no import,
+        # para valer o pid do worker após um fork); único mesmo com pid reaproveitado
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.store.requeue_expired()
+        if self.retention:
+            self.store.prune(self.retention)
+        targets = [(f"job-{i}", self._work) for i in range(self.workers)]
+        for name, target in targets + [("job-heartbeat", self._heartbeat)]:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        self._halt.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, job_id, client, params, input_blob):
+        """Enfileira (ou reaproveita) o job; retorna (status, criado)."""
+        status, created = self.store.submit(
+            job_id, client, params, input_blob, limit=self.client_limit
+        )
+        if created:
+            with self._wakeup:
+                self._wakeup.notify()
+        return status, created
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def stats(self):
+        return {"workers": self.workers, "client_limit": self.client_limit, **self.store.stats()}
+
+    def _work(self):
+        while not self._stopping:
+            job = self.store.claim(self.owner, self.lease)
+            if job is None:
+                # Espera uma submissão (ou o poll, para jobs de outros processos)
+                with self._wakeup:
+                    if not self._stopping:
+                        self._wakeup.wait(self.poll)
+                continue
+            job_id, params, input_blob = job
+            try:
+                with metrics.collect() as timings:
+                    result = self.handler(params, input_blob)
+            except Exception as e:
+                self.store.finish(job_id, error=str(e) or type(e).__name__)
+            else:
+                self.store.finish(job_id, result=result)
+            finally:
+                metrics.observe(timings)
+
+    def _heartbeat(self):
+        # Renova as concessões deste processo e devolve à fila as de processos
+        # que pararam; várias renovações cabem em uma concessão
+        while not self._halt.wait(self.lease / 3):
+            self.store.heartbeat(self.owner, self.lease)
+            self.store.requeue_expired()
+
+
+job_queue = JobQueue.from_env()
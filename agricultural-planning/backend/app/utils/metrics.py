@@ -0,0 +1,205 @@
+"""Tempos por estágio, cabeçalho Server-Timing e métricas Prometheus.
+
+`timed(nome)` registra a duração no coletor da requisição atual (contextvar).
+Workers do pool não herdam o contexto: `collect()` abre um coletor próprio
+no worker e o executor devolve os tempos junto com o resultado.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("timings", default=None)
+
+
+@contextmanager
+def collect():
+    """Coletor de tempos [(nome, segundos)] para o bloco (requisição ou tarefa)."""
+    timings = []
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Mede o bloco; sem coletor ativo, não registra nada."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((name, time.perf_counter() - started))
+
+
+def record(name, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def extend(timings):
+    """Acrescenta tempos vindos de um worker ao coletor atual."""
+    current = _current.get()
+    if current is not None:
+        current.extend(timings)
+
+
+# ============================================================
+# HISTOGRAMAS
+# ============================================================
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = tuple(256 * 4 ** k for k in range(10))  # 256 B .. 64 MiB
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Histograma Prometheus com um rótulo (contagens por bucket, soma e total)."""
+
+    def __init__(self, name, help, label, buckets):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(c), s, n)) for k, (c, s, n) in self._series.items())
+        for label_value, (counts, total, count) in items:
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label}}} {total:.9g}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return "\n".join(lines)
+
+
+stage_seconds = Histogram(
+    "agromonitor_stage_seconds",
+    "Tempo por estágio (parse, estágios do grafo, encode dos gráficos, serialize)",
+    "stage", SECONDS_BUCKETS,
+)
+queue_seconds = Histogram(
+    "agromonitor_queue_wait_seconds", "Espera na fila do pool de análise", "pool", SECONDS_BUCKETS,
+)
+request_seconds = Histogram(
+    "agromonitor_request_seconds", "Duração das requisições por rota", "route", SECONDS_BUCKETS,
+)
+request_bytes = Histogram(
+    "agromonitor_request_bytes", "Tamanho do corpo das requisições por rota", "route", BYTES_BUCKETS,
+)
+response_bytes = Histogram(
+    "agromonitor_response_bytes", "Tamanho do corpo das respostas por rota", "route", BYTES_BUCKETS,
+)
+HISTOGRAMS = (stage_seconds, queue_seconds, request_seconds, request_bytes, response_bytes)
+
+
+def observe(timings):
+    """Leva os tempos de um coletor para os histogramas."""
+    for name, seconds in timings:
+        if name == "queue":
+            queue_seconds.observe("analysis", seconds)
+        else:
+            stage_seconds.observe(name, seconds)
+
+
+def scalar(name, help, value, kind="gauge"):
+    """Métrica sem rótulos (gauge ou counter) no formato de texto."""
+    return f"# HELP {name} {help}\n# TYPE {name} {kind}\n{name} {value:.9g}"
+
+
+def server_timing(timings, total=None):
+    """Valor do cabeçalho Server-Timing (ms; tempos repetidos são somados)."""
+    merged = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    if total is not None:
+        merged["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1e3:.2f}" for name, seconds in merged.items())
+
+
+# ============================================================
+# MIDDLEWARE
+# ============================================================
+
+def _route_name(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class TimingMiddleware:
+    """Middleware ASGI: coletor por requisição, Server-Timing e histogramas.
+
+    O cabeçalho sai com os tempos medidos até o início da resposta (no
+    streaming, só o primeiro grupo); os histogramas recebem tudo ao final.
+    `profiler` (opcional) amostra as pilhas e grava as requisições lentas.
+    """
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        session = self.profiler.start() if self.profiler is not None else None
+
+        async def receive_counted():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        with collect() as timings:
+            async def send_timed(message):
+                if message["type"] == "http.response.start":
+                    value = server_timing(timings, time.perf_counter() - started)
+                    message = {**message, "headers": [
+                        *message.get("headers", []), (b"server-timing", value.encode("latin-1"))
+                    ]}
+                elif message["type"] == "http.response.body":
+                    sizes["response"] += len(message.get("body", b""))
+                await send(message)
+
+            try:
+                await self.app(scope, receive_counted, send_timed)
+            finally:
+                elapsed = time.perf_counter() - started
+                route = _route_name(scope)
+                observe(timings)
+                request_seconds.observe(route, elapsed)
+                request_bytes.observe(route, sizes["request"])
+                response_bytes.observe(route, sizes["response"])
+                if session is not None:
+                    self.profiler.stop(session, f"{scope['method']} {scope['path']}", elapsed)
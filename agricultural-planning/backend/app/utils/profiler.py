@@ -0,0 +1,108 @@
+"""Profiler por amostragem (opt-in) para requisições lentas.
+
+Enquanto houver requisição ativa, uma thread lê `sys._current_frames()` a
+cada `interval` segundos e conta as pilhas no formato "folded"
+(`f1;f2;f3 N`, uma por linha), aceito pelo flamegraph.pl, speedscope e
+similares. Requisições acima de `slow_ms` têm as pilhas gravadas em `directory`.
+
+As amostras cobrem todas as threads do processo (event loop e pool em modo
+thread); com requisições simultâneas, as pilhas de uma entram nas outras.
+Workers em modo processo não são amostrados.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+# Frames mais internos de threads ociosas (workers esperando tarefa, event
+# loop no select): não entram nas amostras
+_IDLE = {
+    ("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select"),
+    ("thread.py", "_worker"), ("process.py", "_wait_for_notification"),
+}
+
+
+def _idle(frame):
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE
+
+
+def _folded(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    def __init__(self, slow_ms, directory, interval=0.005):
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self.interval = interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dumps = 0
+
+    @classmethod
+    def from_env(cls):
+        """PROFILE_SLOW_MS liga o profiler; PROFILE_DIR, PROFILE_INTERVAL_MS."""
+        slow_ms = os.environ.get("PROFILE_SLOW_MS")
+        if not slow_ms:
+            return None
+        return cls(
+            slow_ms=float(slow_ms),
+            directory=os.environ.get("PROFILE_DIR", "data/profiles"),
+            interval=float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1e3,
+        )
+
+    def start(self):
+        """Abre uma sessão de amostragem (um Counter de pilhas)."""
+        session = Counter()
+        with self._lock:
+            self._sessions[id(session)] = session
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def stop(self, session, label, elapsed):
+        """Fecha a sessão e grava as pilhas se a requisição foi lenta."""
+        with self._lock:
+            self._sessions.pop(id(session), None)
+        if elapsed * 1e3 < self.slow_ms or not session:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")
+        path = os.path.join(
+            self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{elapsed * 1e3:.0f}ms-{slug}.folded"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in session.most_common():
+                f.write(f"{stack} {count}\n")
+        self.dumps += 1
+        return path
+
+    def _sample(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._sessions.values())
+                if not sessions:
+                    # Sem requisições ativas a thread termina (volta no próximo start)
+                    self._thread = None
+                    return
+            stacks = [
+                _folded(frame) for ident, frame in sys._current_frames().items()
+                if ident != me and not _idle(frame)
+            ]
+            with self._lock:
+                # Sessões encerradas no meio da amostra já estão sendo gravadas
+                for session in sessions:
+                    if id(session) in self._sessions:
+                        session.update(stacks)
+            time.sleep(self.interval)
@@ -0,0 +1,261 @@
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# Formatos de exportação: blocos .npy (só NumPy, lidos com mmap) e Parquet
+# (pyarrow, opcional)
+SINK_FORMATS = ("npy", "parquet")
+EXTENSIONS = {"npy": "", "parquet": ".parquet"}
+
+
+class SinkUnavailableError(Exception):
+    """Formato cuja dependência opcional não está instalada."""
+
+
+def available(format):
+    """Se o formato pode ser gravado (dependência opcional instalada)."""
+    if format == "parquet":
+        try:
+            _pyarrow()
+        except SinkUnavailableError:
+            return False
+    return format in SINK_FORMATS
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SinkUnavailableError("Parquet requer pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _check_batch(batch, columns):
+    """Colunas do bloco (arrays com a mesma 1ª dimensão) e nº de linhas."""
+    arrays = {name: np.ascontiguousarray(value) for name, value in batch.items()}
+    rows = {a.shape[0] if a.ndim else -1 for a in arrays.values()}
+    if len(rows) != 1 or -1 in rows:
+        raise ValueError("Colunas do bloco devem ter o mesmo número de linhas")
+    layout = {name: {"dtype": a.dtype.str, "shape": list(a.shape[1:])} for name, a in arrays.items()}
+    if columns is not None and layout != columns:
+        raise ValueError("Colunas do bloco diferentes das anteriores")
+    return arrays, layout, rows.pop()
+
+
+class NpySink:
+    """Resultados em blocos: um .npy por coluna e bloco e um manifest.json.
+
+    Cada write grava o bloco em disco e só guarda os offsets; o manifesto,
+    escrito no close, marca a exportação como completa.
+    """
+
+    format = "npy"
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.metadata = metadata or {}
+        self.columns = None
+        self.chunks = []
+        self.rows = 0
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, batch):
+        arrays, self.columns, rows = _check_batch(batch, self.columns)
+        index = len(self.chunks)
+        for name, array in arrays.items():
+            np.save(os.path.join(self.path, f"{name}.{index:06d}.npy"), array)
+        self.chunks.append({"start": self.rows, "rows": rows})
+        self.rows += rows
+
+    def close(self):
+        manifest = {
+            "format": self.format, "rows": self.rows, "chunks": self.chunks,
+            "columns": self.columns or {}, "metadata": self.metadata,
+        }
+        tmp = os.path.join(self.path, "manifest.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.path, "manifest.json"))
+
+    def abort(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class ParquetSink:
+    """Resultados num arquivo Parquet, um row group (record batch) por write.
+
+    Colunas 2-D (ex.: x, cenário × cultura) viram listas de tamanho fixo. O
+    arquivo é escrito ao lado e renomeado no close.
+    """
+
+    format = "parquet"
+
+    def __init__(self, path, metadata=None):
+        self.pa = _pyarrow()
+        self.path = path
+        self.metadata = metadata or {}
+        self.columns = None
+        self.rows = 0
+        self._writer = None
+
+    def _array(self, array):
+        pa = self.pa
+        if array.ndim == 1:
+            return pa.array(array)
+        values = pa.array(array.reshape(-1))
+        return pa.FixedSizeListArray.from_arrays(values, int(np.prod(array.shape[1:])))
+
+    def write(self, batch):
+        arrays, self.columns, rows = _check_batch(batch, self.columns)
+        record = self.pa.RecordBatch.from_arrays(
+            [self._array(a) for a in arrays.values()], names=list(arrays)
+        )
+        if self._writer is None:
+            schema = record.schema.with_metadata({
+                "agromonitor": json.dumps({"metadata": self.metadata, "columns": self.columns})
+            })
+            self._writer = self.pa.parquet.ParquetWriter(self.path + ".tmp", schema)
+        self._writer.write_batch(record, row_group_size=rows)
+        self.rows += rows
+
+    def close(self):
+        if self._writer is None:
+            raise ValueError("Nenhum bloco escrito")
+        self._writer.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self.path + ".tmp"):
+            os.remove(self.path + ".tmp")
+
+
+@contextmanager
+def open_sink(path, format="npy", metadata=None):
+    """Sink de `format` em `path`; em caso de erro, nada fica no disco."""
+    if format not in SINK_FORMATS:
+        raise ValueError(f"Formato inválido: {format}. Opções: {', '.join(SINK_FORMATS)}")
+    sink = (NpySink if format == "npy" else ParquetSink)(path, metadata)
+    try:
+        yield sink
+    except BaseException:
+        sink.abort()
+        raise
+    sink.close()
+
+
+# ===== LEITURA POR INTERVALO =====
+
+class NpyResults:
+    """Leitura de uma exportação NpySink: só os blocos do intervalo, via mmap."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.path = path
+        self.rows = manifest["rows"]
+        self.layout = manifest["columns"]
+        self.columns = list(self.layout)
+        self.metadata = manifest["metadata"]
+        self._chunks = manifest["chunks"]
+
+    def iter_chunks(self, start=0, stop=None, columns=None):
+        """Blocos (dict coluna → array) das linhas [start, stop)."""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        columns = columns or self.columns
+        for index, chunk in enumerate(self._chunks):
+            lo, hi = max(start, chunk["start"]), min(stop, chunk["start"] + chunk["rows"])
+            if lo >= hi:
+                continue
+            yield {
+                name: np.load(
+                    os.path.join(self.path, f"{name}.{index:06d}.npy"), mmap_mode="r"
+                )[lo - chunk["start"]:hi - chunk["start"]]
+                for name in columns
+            }
+
+
+class ParquetResults:
+    """Leitura de uma exportação Parquet: só os row groups do intervalo."""
+
+    def __init__(self, path):
+        pa = _pyarrow()
+        self._file = pa.parquet.ParquetFile(path)
+        info = json.loads(self._file.schema_arrow.metadata[b"agromonitor"])
+        self.metadata = info["metadata"]
+        self.layout = info["columns"]
+        self.columns = list(self.layout)
+        meta = self._file.metadata
+        self.rows = meta.num_rows
+        self._groups = []
+        start = 0
+        for i in range(meta.num_row_groups):
+            rows = meta.row_group(i).num_rows
+            self._groups.append((start, rows))
+            start += rows
+
+    def _numpy(self, column, name):
+        shape = self.layout[name]["shape"]
+        if shape:
+            # flatten (e não .values) respeita o offset do slice
+            column = column.combine_chunks()
+            return column.flatten().to_numpy().reshape((len(column), *shape))
+        return column.to_numpy()
+
+    def iter_chunks(self, start=0, stop=None, columns=None):
+        stop = self.rows if stop is None else min(stop, self.rows)
+        columns = columns or self.columns
+        for index, (group_start, rows) in enumerate(self._groups):
+            lo, hi = max(start, group_start), min(stop, group_start + rows)
+            if lo >= hi:
+                continue
+            table = self._file.read_row_group(index, columns=columns)
+            table = table.slice(lo - group_start, hi - lo)
+            yield {name: self._numpy(table.column(name), name) for name in columns}
+
+
+def open_results(path):
+    """Leitor da exportação em `path` (diretório npy ou arquivo .parquet)."""
+    if os.path.isdir(path):
+        return NpyResults(path)
+    return ParquetResults(path)
+
+
+def read_results(path, start=0, stop=None, columns=None):
+    """Linhas [start, stop) de uma exportação, concatenadas (dict coluna → array)."""
+    results = open_results(path)
+    unknown = [c for c in columns or () if c not in results.columns]
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(unknown)}")
+    columns = columns or results.columns
+    chunks = list(results.iter_chunks(start, stop, columns))
+    if not chunks:
+        layout = results.layout
+        return {
+            name: np.empty((0, *layout[name]["shape"]), dtype=layout[name]["dtype"])
+            for name in columns
+        }
+    return {name: np.concatenate([c[name] for c in chunks]) for name in columns}
+
+
+def prune(directory, max_age):
+    """Remove exportações (e restos .tmp) modificadas há mais de `max_age` segundos."""
+    cutoff = time.time() - max_age
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
@@ -1,18 +1,42 @@
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib import font_manager
 import seaborn as sns
+from seaborn.utils import relative_luminance
 import io
 import base64
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from .metrics import timed
 
 
-def fig_to_base64(fig):
-    """Converte figura matplotlib para base64."""
+# Formatos de saída dos gráficos; "spec" é JSON para o cliente desenhar
+CHART_FORMATS = ('png', 'webp', 'svg', 'spec')
+
+_SAVE_OPTIONS = {
+    'png': {},
+    'webp': {'pil_kwargs': {'lossless': True}},
+    # Sem data nos metadados: mesma entrada, mesmos bytes (ETag)
+    'svg': {'metadata': {'Date': None}},
+}
+
+
+def fig_to_base64(fig, fmt='png', bbox_inches='tight'):
+    """Converte figura matplotlib para base64.
+
+    Templates já diagramados passam `bbox_inches=None`: sem a passada extra
+    de desenho que mede a área ocupada, a imagem tem o tamanho da figura.
+    """
     buffer = io.BytesIO()
-    fig.savefig(buffer, format='png', dpi=120, bbox_inches='tight', facecolor='white', edgecolor='none')
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.read()).decode()
-    plt.close(fig)
-    return image_base64
+    with timed(f'encode_{fmt}'):
+        fig.savefig(
+            buffer, format=fmt, dpi=120, bbox_inches=bbox_inches, facecolor='white',
+            edgecolor='none', **_SAVE_OPTIONS[fmt]
+        )
+        return base64.b64encode(buffer.getvalue()).decode()
 
 
 # Paleta profissional
@@ -30,7 +54,8 @@ FONT_SETTINGS = {
     'size': 10,
 }
 
-plt.rcParams.update({
+# Aplicado uma única vez na importação; depois disso só é lido
+matplotlib.rcParams.update({
     'font.family': 'sans-serif',
     'font.size': 10,
     'axes.labelsize': 11,
@@ -45,13 +70,186 @@ plt.rcParams.update({
     'grid.color': '#F0F0F0',
     'grid.linestyle': '-',
     'grid.linewidth': 0.5,
+    # ids estáveis no SVG (mesma entrada, mesmos bytes)
+    'svg.hashsalt': 'agromonitor',
 })
 
 
-def plot_sensitivity_heatmap(S, resource_labels, crop_labels):
-    """Heatmap profissional de sensibilidade."""
-    fig, ax = plt.subplots(figsize=(8, 5))
-    
+# ============================================================
+# TEMPLATES DE FIGURA
+# ============================================================
+# Figuras Agg (sem pyplot) montadas uma vez por tipo de gráfico e forma;
+# cada requisição só atualiza dados e textos. Um template nunca é usado por
+# duas threads ao mesmo tempo.
+
+MAX_TEMPLATE_KEYS = 64
+
+
+class _TemplatePool:
+    """Templates livres por chave (tipo de gráfico, forma)."""
+
+    def __init__(self, max_keys=MAX_TEMPLATE_KEYS):
+        self.max_keys = max_keys
+        self._free = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, key, build):
+        with self._lock:
+            free = self._free.get(key)
+            template = free.pop() if free else None
+        if template is None:
+            template = build()
+        # Em caso de erro o template é descartado (estado incerto)
+        yield template
+        with self._lock:
+            self._free.setdefault(key, []).append(template)
+            self._free.move_to_end(key)
+            while len(self._free) > self.max_keys:
+                self._free.popitem(last=False)
+
+
+_templates = _TemplatePool()
+
+# O parser de mathtext (rótulos 10^k do eixo log) é compartilhado e não é
+# thread-safe; os demais gráficos renderizam em paralelo
+_mathtext_lock = threading.Lock()
+
+
+def _new_figure(figsize):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def _clean_style(ax):
+    # Estilo limpo
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+
+
+def _set_labels(template, axis, labels, **kwargs):
+    """Atualiza rótulos dos ticks só quando mudam."""
+    labels = list(labels)
+    if template['labels'] == labels:
+        return
+    if axis == 'x':
+        template['ax'].set_xticklabels(labels, **kwargs)
+    else:
+        template['ax'].set_yticklabels(labels, **kwargs)
+    template['labels'] = labels
+
+
+def _layout_key(template):
+    """O que muda a diagramação: rótulos e largura (em caracteres) dos ticks."""
+    ax = template['ax']
+    widths = tuple(
+        max((len(t) for t in axis.major.formatter.format_ticks(axis.get_majorticklocs())), default=0)
+        for axis in (ax.xaxis, ax.yaxis)
+    )
+    return repr(template.get('labels')), widths
+
+
+def _render(template, chart_format='png'):
+    # Diagramação (tight_layout) feita uma vez por template e refeita só
+    # quando rótulos ou largura dos ticks mudam, sempre a partir das margens
+    # de uma figura nova; a figura tem tamanho fixo
+    fig = template['fig']
+    key = _layout_key(template)
+    if template.get('layout') != key:
+        fig.subplots_adjust(**{
+            k: matplotlib.rcParams[f'figure.subplot.{k}']
+            for k in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+        })
+        fig.tight_layout()
+        # Sem motor de layout associado o savefig não faz a passada extra
+        # de desenho que o precede
+        fig.set_layout_engine('none')
+        template['layout'] = key
+    return fig_to_base64(fig, chart_format, bbox_inches=None)
+
+
+def _annotate_bar_tops(ax, bars, fmt):
+    texts = []
+    for bar in bars:
+        texts.append(ax.text(
+            bar.get_x() + bar.get_width()/2.,
+            bar.get_height(),
+            fmt.format(bar.get_height()),
+            ha='center',
+            va='bottom',
+            fontsize=9,
+            fontweight='500',
+            # Dentro da margem do eixo: não entra na diagramação, que assim
+            # não depende dos valores
+            in_layout=False,
+        ))
+    return texts
+
+
+def _update_bars(template, values_by_group):
+    ax = template['ax']
+    for bars, texts, values in zip(template['bars'], template['texts'], values_by_group):
+        for bar, text, value in zip(bars, texts, values):
+            bar.set_height(value)
+            text.set_position((bar.get_x() + bar.get_width()/2., value))
+            text.set_text(template['fmt'].format(value))
+    ax.relim()
+    ax.autoscale_view()
+
+
+# ============================================================
+# ESPECIFICAÇÕES (chart_format="spec")
+# ============================================================
+# Dados e estilo para o cliente desenhar o gráfico; não usa matplotlib.
+# Formatos numéricos seguem a mini-linguagem do Python/d3-format.
+
+HEATMAP_TITLE = 'Sensibilidade: Recurso × Cultura (Plano Base)'
+HEATMAP_RANGE = (0.0, 0.9)
+# RdYlGn do ColorBrewer (11 classes), mesma escala do heatmap renderizado
+HEATMAP_COLORS = [
+    '#a50026', '#d73027', '#f46d43', '#fdae61', '#fee08b', '#ffffbf',
+    '#d9ef8b', '#a6d96a', '#66bd63', '#1a9850', '#006837',
+]
+BAR_PAIR_TITLES = {
+    'base_vs_perturbed': 'Áreas por Cultura: Cenário Base vs Perturbado',
+    'regularization': 'Sistema Mal Condicionado: Solução Padrão vs Regularizada',
+}
+SENSITIVITY_TITLE = 'Comparação de Sensibilidade: Bem vs Mal Condicionado'
+SENSITIVITY_CATEGORIES = ['Bem Condicionado', 'Mal Condicionado']
+# Fração (em escala log) acrescentada ao eixo x para os rótulos das barras
+SENSITIVITY_LABEL_ROOM = 0.12
+SENSITIVITY_SERIES = [
+    ('||Δb||/||b|| (Recursos)', COLORS['success']),
+    ('||Δx||/||x|| (Áreas)', COLORS['warning']),
+]
+
+
+def _spec_values(values):
+    """Valores como listas JSON (não finitos viram None)."""
+    values = np.asarray(values, dtype=float)
+    return np.where(np.isfinite(values), values, None).tolist()
+
+
+def _bar_spec(title, categories, series, values_by_series, value_axis,
+              orientation='vertical', value_format='.0f'):
+    return {
+        'type': 'bar',
+        'orientation': orientation,
+        'title': title,
+        'categories': list(categories),
+        'value_axis': value_axis,
+        'value_format': value_format,
+        'series': [
+            {'label': label, 'color': color, 'opacity': alpha, 'values': _spec_values(values)}
+            for (label, color, alpha), values in zip(series, values_by_series)
+        ],
+    }
+
+
+def _build_heatmap(S, resource_labels, crop_labels):
+    fig, ax = _new_figure((8, 5))
+
     sns.heatmap(
         S,
         annot=True,
@@ -59,8 +257,8 @@ def plot_sensitivity_heatmap(S, resource_labels, crop_labels):
         xticklabels=crop_labels,
         yticklabels=resource_labels,
         cmap='RdYlGn',
-        vmin=0.0,
-        vmax=0.9,
+        vmin=HEATMAP_RANGE[0],
+        vmax=HEATMAP_RANGE[1],
         cbar_kws={'label': 'Sensibilidade Normalizada'},
         linewidths=1,
         linecolor='white',
@@ -68,234 +266,223 @@ def plot_sensitivity_heatmap(S, resource_labels, crop_labels):
         square=False,
         annot_kws={'fontsize': 10, 'weight': 'bold'},
     )
-    
-    ax.set_title('Sensibilidade: Recurso × Cultura (Plano Base)', fontsize=13, fontweight='bold', pad=16)
+
+    ax.set_title(HEATMAP_TITLE, fontsize=13, fontweight='bold', pad=16)
     ax.set_xlabel('Culturas', fontsize=11, fontweight='600')
     ax.set_ylabel('Recursos', fontsize=11, fontweight='600')
-    
+
     # Estilo limpo
     ax.spines['top'].set_visible(False)
     ax.spines['right'].set_visible(False)
     ax.spines['left'].set_visible(True)
     ax.spines['bottom'].set_visible(True)
-    
-    plt.tight_layout()
-    return fig_to_base64(fig)
 
+    return {
+        'fig': fig, 'ax': ax, 'mesh': ax.collections[0], 'texts': list(ax.texts),
+        'labels': (list(resource_labels), list(crop_labels)),
+    }
 
-def plot_base_vs_perturbed(x_base, x_pert, crop_labels, fixed_perturb=0.05):
-    """Gráfico profissional: base vs perturbado (comparação com espaço)."""
-    fig, ax = plt.subplots(figsize=(9, 5))
-    
-    x_indices = np.arange(len(crop_labels))
+
+def plot_sensitivity_heatmap(S, resource_labels, crop_labels, chart_format='png'):
+    """Heatmap profissional de sensibilidade."""
+    S = np.asarray(S, dtype=float)
+    if chart_format == 'spec':
+        return {
+            'type': 'heatmap',
+            'title': HEATMAP_TITLE,
+            'x_axis': {'label': 'Culturas', 'categories': list(crop_labels)},
+            'y_axis': {'label': 'Recursos', 'categories': list(resource_labels)},
+            'values': _spec_values(S),
+            'value_format': '.2f',
+            'color_scale': {
+                'label': 'Sensibilidade Normalizada',
+                'domain': list(HEATMAP_RANGE),
+                'colors': HEATMAP_COLORS,
+            },
+        }
+    if not np.isfinite(S).all():
+        # Células mascaradas mudam a estrutura do gráfico: sem template
+        return _render(_build_heatmap(S, resource_labels, crop_labels), chart_format)
+
+    key = ('heatmap', S.shape)
+    with _templates.acquire(key, lambda: _build_heatmap(S, resource_labels, crop_labels)) as tpl:
+        mesh = tpl['mesh']
+        mesh.set_array(S)
+        colors = mesh.cmap(mesh.norm(S.ravel()))
+        for text, value, color in zip(tpl['texts'], S.flat, colors):
+            text.set_text(f'{value:.2f}')
+            text.set_color('.15' if relative_luminance(color) > .408 else 'w')
+
+        labels = (list(resource_labels), list(crop_labels))
+        if tpl['labels'] != labels:
+            tpl['ax'].set_yticklabels(labels[0])
+            tpl['ax'].set_xticklabels(labels[1])
+            tpl['labels'] = labels
+        return _render(tpl, chart_format)
+
+
+def _build_bar_pair(n, title, series, fmt='{:.0f}'):
+    """Duas séries de barras verticais lado a lado (n categorias)."""
+    fig, ax = _new_figure((9, 5))
+
+    x_indices = np.arange(n)
     width = 0.35
-    
-    bars1 = ax.bar(
-        x_indices - width/2,
-        x_base,
-        width,
-        label='Cenário Base',
-        color=COLORS['primary'],
-        alpha=0.85,
-        edgecolor='white',
-        linewidth=1.5,
-    )
-    
-    bars2 = ax.bar(
-        x_indices + width/2,
-        x_pert,
-        width,
-        label=f'Perturbação {fixed_perturb*100:.1f}%',
-        color=COLORS['secondary'],
-        alpha=0.85,
-        edgecolor='white',
-        linewidth=1.5,
-    )
-    
+
+    bars = []
+    for offset, (label, color, alpha) in zip((-width/2, width/2), series):
+        bars.append(ax.bar(
+            x_indices + offset,
+            np.zeros(n),
+            width,
+            label=label,
+            color=color,
+            alpha=alpha,
+            edgecolor='white',
+            linewidth=1.5,
+        ))
+
     ax.set_xticks(x_indices)
-    ax.set_xticklabels(crop_labels, fontsize=11, fontweight='600')
+    ax.set_xticklabels([''] * n, fontsize=11, fontweight='600')
     ax.set_ylabel('Área (ha)', fontsize=11, fontweight='600')
-    ax.set_title('Áreas por Cultura: Cenário Base vs Perturbado', fontsize=13, fontweight='bold', pad=16)
-    
+    ax.set_title(title, fontsize=13, fontweight='bold', pad=16)
+
     # Anotações nos topos das barras
-    for bar in bars1:
-        height = bar.get_height()
-        ax.text(
-            bar.get_x() + bar.get_width()/2.,
-            height,
-            f'{height:.0f}',
-            ha='center',
-            va='bottom',
-            fontsize=9,
-            fontweight='500',
-        )
-    
-    for bar in bars2:
-        height = bar.get_height()
-        ax.text(
-            bar.get_x() + bar.get_width()/2.,
-            height,
-            f'{height:.0f}',
-            ha='center',
-            va='bottom',
-            fontsize=9,
-            fontweight='500',
-        )
-    
+    texts = [_annotate_bar_tops(ax, group, fmt) for group in bars]
+
     ax.legend(loc='upper right', framealpha=0.95, edgecolor='#E0E0E0', fancybox=False)
     ax.grid(axis='y', alpha=0.3, linestyle='--')
-    
-    # Estilo limpo
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    
-    plt.tight_layout()
-    return fig_to_base64(fig)
+    _clean_style(ax)
 
+    return {'fig': fig, 'ax': ax, 'bars': bars, 'texts': texts, 'fmt': fmt, 'labels': None}
 
-def plot_sensitivity_comparison(sens_well, sens_ill):
-    """Gráfico profissional: bem vs mal condicionado (horizontal bars)."""
-    fig, ax = plt.subplots(figsize=(9, 5))
-    
-    categories = ['Bem Condicionado', 'Mal Condicionado']
-    rel_dx_values = [sens_well['rel_dx'], sens_ill['rel_dx']]
-    rel_db_values = [sens_well['rel_db'], sens_ill['rel_db']]
-    
+
+def plot_base_vs_perturbed(x_base, x_pert, crop_labels, fixed_perturb=0.05, chart_format='png'):
+    """Gráfico profissional: base vs perturbado (comparação com espaço)."""
+    title = BAR_PAIR_TITLES['base_vs_perturbed']
+    series = [('Cenário Base', COLORS['primary'], 0.85),
+              ('Perturbação', COLORS['secondary'], 0.85)]
+    pert_label = f'Perturbação {fixed_perturb*100:.1f}%'
+    if chart_format == 'spec':
+        series[1] = (pert_label,) + series[1][1:]
+        return _bar_spec(title, crop_labels, series, (x_base, x_pert), {'label': 'Área (ha)', 'scale': 'linear'})
+
+    key = ('base_vs_perturbed', len(crop_labels))
+    build = lambda: _build_bar_pair(len(crop_labels), title, series)
+    with _templates.acquire(key, build) as tpl:
+        _update_bars(tpl, (x_base, x_pert))
+        tpl['ax'].get_legend().get_texts()[1].set_text(pert_label)
+        _set_labels(tpl, 'x', crop_labels, fontsize=11, fontweight='600')
+        return _render(tpl, chart_format)
+
+
+def _build_sensitivity_comparison():
+    fig, ax = _new_figure((9, 5))
+
+    categories = SENSITIVITY_CATEGORIES
     y_indices = np.arange(len(categories))
     width = 0.35
-    
-    bars1 = ax.barh(
-        y_indices - width/2,
-        rel_db_values,
-        width,
-        label='||Δb||/||b|| (Recursos)',
-        color=COLORS['success'],
-        alpha=0.85,
-        edgecolor='white',
-        linewidth=1.5,
-    )
-    
-    bars2 = ax.barh(
-        y_indices + width/2,
-        rel_dx_values,
-        width,
-        label='||Δx||/||x|| (Áreas)',
-        color=COLORS['warning'],
-        alpha=0.85,
-        edgecolor='white',
-        linewidth=1.5,
-    )
-    
+
+    bars = []
+    for offset, (label, color) in zip((-width/2, width/2), SENSITIVITY_SERIES):
+        bars.append(ax.barh(
+            y_indices + offset,
+            np.ones(len(categories)),
+            width,
+            label=label,
+            color=color,
+            alpha=0.85,
+            edgecolor='white',
+            linewidth=1.5,
+        ))
+
     ax.set_yticks(y_indices)
     ax.set_yticklabels(categories, fontsize=11, fontweight='600')
     ax.set_xlabel('Valor Relativo (log)', fontsize=11, fontweight='600')
-    ax.set_title('Comparação de Sensibilidade: Bem vs Mal Condicionado', fontsize=13, fontweight='bold', pad=16)
+    ax.set_title(SENSITIVITY_TITLE, fontsize=13, fontweight='bold', pad=16)
     ax.set_xscale('log')
-    
+
     # Anotações
-    for bar in bars1:
-        width_val = bar.get_width()
-        ax.text(
-            width_val,
-            bar.get_y() + bar.get_height()/2.,
-            f'{width_val:.2e}',
-            ha='left',
-            va='center',
-            fontsize=9,
-            fontweight='500',
-            bbox=dict(boxstyle='round,pad=0.3', facecolor='white', edgecolor='none', alpha=0.7),
-        )
-    
-    for bar in bars2:
-        width_val = bar.get_width()
-        ax.text(
-            width_val,
-            bar.get_y() + bar.get_height()/2.,
-            f'{width_val:.2e}',
-            ha='left',
-            va='center',
-            fontsize=9,
-            fontweight='500',
-            bbox=dict(boxstyle='round,pad=0.3', facecolor='white', edgecolor='none', alpha=0.7),
-        )
-    
+    texts = []
+    for group in bars:
+        texts.append([
+            ax.text(
+                bar.get_width(),
+                bar.get_y() + bar.get_height()/2.,
+                '',
+                ha='left',
+                va='center',
+                fontsize=9,
+                fontweight='500',
+                bbox=dict(boxstyle='round,pad=0.3', facecolor='white', edgecolor='none', alpha=0.7),
+                in_layout=False,
+            )
+            for bar in group
+        ])
+
     ax.legend(loc='lower right', framealpha=0.95, edgecolor='#E0E0E0', fancybox=False)
     ax.grid(axis='x', alpha=0.3, linestyle='--')
-    
-    # Estilo limpo
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    
-    plt.tight_layout()
-    return fig_to_base64(fig)
+    _clean_style(ax)
 
+    return {'fig': fig, 'ax': ax, 'bars': bars, 'texts': texts}
 
-def plot_regularization(x_normal, x_reg, crop_labels, lam):
-    """Gráfico profissional: normal vs regularizado."""
-    fig, ax = plt.subplots(figsize=(9, 5))
-    
-    x_indices = np.arange(len(crop_labels))
-    width = 0.35
-    
-    bars1 = ax.bar(
-        x_indices - width/2,
-        x_normal,
-        width,
-        label='Solução Padrão (LS)',
-        color=COLORS['neutral_dark'],
-        alpha=0.7,
-        edgecolor='white',
-        linewidth=1.5,
-    )
-    
-    bars2 = ax.bar(
-        x_indices + width/2,
-        x_reg,
-        width,
-        label=f'Regularizada (λ={lam})',
-        color=COLORS['primary'],
-        alpha=0.85,
-        edgecolor='white',
-        linewidth=1.5,
-    )
-    
-    ax.set_xticks(x_indices)
-    ax.set_xticklabels(crop_labels, fontsize=11, fontweight='600')
-    ax.set_ylabel('Área (ha)', fontsize=11, fontweight='600')
-    ax.set_title('Sistema Mal Condicionado: Solução Padrão vs Regularizada', 
-                 fontsize=13, fontweight='bold', pad=16)
-    
-    # Anotações
-    for bar in bars1:
-        height = bar.get_height()
-        ax.text(
-            bar.get_x() + bar.get_width()/2.,
-            height,
-            f'{height:.0f}',
-            ha='center',
-            va='bottom',
-            fontsize=9,
-            fontweight='500',
-        )
-    
-    for bar in bars2:
-        height = bar.get_height()
-        ax.text(
-            bar.get_x() + bar.get_width()/2.,
-            height,
-            f'{height:.0f}',
-            ha='center',
-            va='bottom',
-            fontsize=9,
-            fontweight='500',
+
+def plot_sensitivity_comparison(sens_well, sens_ill, chart_format='png'):
+    """Gráfico profissional: bem vs mal condicionado (horizontal bars)."""
+    rel_dx_values = [sens_well['rel_dx'], sens_ill['rel_dx']]
+    rel_db_values = [sens_well['rel_db'], sens_ill['rel_db']]
+    if chart_format == 'spec':
+        return _bar_spec(
+            SENSITIVITY_TITLE, SENSITIVITY_CATEGORIES,
+            [(label, color, 0.85) for label, color in SENSITIVITY_SERIES],
+            (rel_db_values, rel_dx_values),
+            {'label': 'Valor Relativo (log)', 'scale': 'log'},
+            orientation='horizontal', value_format='.2e',
         )
-    
-    ax.legend(loc='upper right', framealpha=0.95, edgecolor='#E0E0E0', fancybox=False)
-    ax.grid(axis='y', alpha=0.3, linestyle='--')
-    
-    # Estilo limpo
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    
-    plt.tight_layout()
-    return fig_to_base64(fig)
+
+    with _templates.acquire(('sensitivity_comparison',), _build_sensitivity_comparison) as tpl:
+        for bars, texts, values in zip(tpl['bars'], tpl['texts'], (rel_db_values, rel_dx_values)):
+            for bar, text, value in zip(bars, texts, values):
+                bar.set_width(value)
+                text.set_position((value, bar.get_y() + bar.get_height()/2.))
+                text.set_text(f'{value:.2e}')
+        ax = tpl['ax']
+        ax.relim()
+        ax.autoscale_view()
+        # Espaço à direita para o rótulo da maior barra dentro do eixo (fora
+        # da diagramação, que assim não depende dos valores)
+        left, right = ax.get_xlim()
+        ax.set_xlim(left, right * (right / left) ** SENSITIVITY_LABEL_ROOM, auto=None)
+        with _mathtext_lock:
+            return _render(tpl, chart_format)
+
+
+def plot_regularization(x_normal, x_reg, crop_labels, lam, chart_format='png'):
+    """Gráfico profissional: normal vs regularizado."""
+    title = BAR_PAIR_TITLES['regularization']
+    series = [('Solução Padrão (LS)', COLORS['neutral_dark'], 0.7),
+              ('Regularizada', COLORS['primary'], 0.85)]
+    reg_label = f'Regularizada (λ={lam})'
+    if chart_format == 'spec':
+        series[1] = (reg_label,) + series[1][1:]
+        return _bar_spec(title, crop_labels, series, (x_normal, x_reg), {'label': 'Área (ha)', 'scale': 'linear'})
+
+    key = ('regularization', len(crop_labels))
+    build = lambda: _build_bar_pair(len(crop_labels), title, series)
+    with _templates.acquire(key, build) as tpl:
+        _update_bars(tpl, (x_normal, x_reg))
+        tpl['ax'].get_legend().get_texts()[1].set_text(reg_label)
+        _set_labels(tpl, 'x', crop_labels, fontsize=11, fontweight='600')
+        return _render(tpl, chart_format)
+
+
+def warm_up(n_resources=4, n_crops=3):
+    """Aquece cache de fontes, seaborn e templates do formato padrão."""
+    font_manager.findfont(font_manager.FontProperties(family=['sans-serif']))
+    resources = [f'R{i + 1}' for i in range(n_resources)]
+    crops = [f'C{j + 1}' for j in range(n_crops)]
+    x = np.ones(n_crops)
+    sens = {'rel_dx': 1.0, 'rel_db': 0.05}
+    plot_sensitivity_heatmap(np.zeros((n_resources, n_crops)), resources, crops)
+    plot_base_vs_perturbed(x, x, crops)
+    plot_sensitivity_comparison(sens, sens)
+    plot_regularization(x, x, crops, 1.0)
@@ -0,0 +1,75 @@
+"""Carga em /api/analyze por um cliente ASGI em processo (sem rede).
+
+Cada rodada envia `requests` análises com no máximo `concurrency` em
+paralelo; o tempo medido é o da rodada inteira, e as métricas extras trazem
+vazão, latências p50/p95 por requisição e quantas receberam 503. O cache
+de resultados é desligado e a fila do pool comporta a concorrência do
+caso, para medir a análise e não o cache ou a recusa por backpressure
+(`rejected` deve ficar em 0).
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from harness import benchmark, Metrics
+
+CONCURRENCY = (1, 4, 16)
+PAYLOAD = {
+    "resources": ["Terra", "Mão de obra", "Água", "Fertilizante"],
+    "crops": ["Milho", "Soja", "Trigo"],
+    "A": [[1.0, 1.0, 1.0], [10.0, 8.0, 12.0], [3000.0, 2500.0, 1500.0], [150.0, 120.0, 100.0]],
+    "b": [100.0, 900.0, 220000.0, 12000.0],
+    "profit": [3000.0, 2800.0, 2000.0],
+    "rel_perturb": 0.05,
+}
+
+
+def _app(concurrency):
+    from app.main import app
+    from app.services.pipeline import warm_constants, warm_renderer
+    from app.utils.cache import result_cache
+    from app.utils.executor import executor
+    result_cache.backend = None
+    executor.max_queue = max(executor.max_queue, concurrency)
+    warm_constants()
+    warm_renderer()
+    return app
+
+
+async def _load(app, url, requests, concurrency):
+    import httpx
+    latencies, rejected = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async def one(client):
+        nonlocal rejected
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(url, json=PAYLOAD)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code == 503:
+                rejected += 1  # backpressure do pool (fila cheia)
+            else:
+                response.raise_for_status()
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(*(one(client) for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return Metrics({
+        "requests": requests,
+        "rejected": rejected,
+        "throughput_rps": requests / elapsed,
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1e3),
+        "latency_p95_ms": float(np.percentile(latencies, 95) * 1e3),
+    })
+
+
+@benchmark("endpoint", concurrency=CONCURRENCY, images=("inline", "none"))
+def analyze(concurrency, images):
+    app = _app(concurrency)
+    url = f"/api/analyze?images={images}"
+    requests = max(4, concurrency)
+    return lambda: asyncio.run(_load(app, url, requests, concurrency))
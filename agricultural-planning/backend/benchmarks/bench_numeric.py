@@ -0,0 +1,71 @@
+"""Micro-benchmarks dos serviços numéricos, do modelo base 3×3 até 5000×5000.
+
+`mode="dense"` chama o serviço com a matriz crua (fatoração a cada chamada,
+como no script original); `mode="factorized"` reaproveita um
+FactorizedSystem, como o grafo de estágios faz numa requisição.
+"""
+import numpy as np
+
+from harness import benchmark
+from app.services.linear_algebra import (
+    factorize, solve_linear_system, condition_number, tikhonov_regularization
+)
+from app.services.sensitivity import sensitivity_analysis, local_sensitivity_matrix
+
+SIZES = (3, 100, 1000, 5000)
+MODES = ("dense", "factorized")
+
+
+def base_model():
+    """Linhas de igualdade (terra, mão de obra, água) do modelo agrícola base."""
+    A = np.array([[1.0, 1.0, 1.0], [10.0, 8.0, 12.0], [3000.0, 2500.0, 1500.0]])
+    b = np.array([100.0, 900.0, 220000.0])
+    return A, b
+
+
+def system_of_size(n, seed=0):
+    """Modelo base (n = 3) ou sistema n×n aleatório bem condicionado."""
+    if n == 3:
+        return base_model()
+    rng = np.random.default_rng(seed)
+    A = rng.normal(size=(n, n)) + np.sqrt(n) * np.eye(n)
+    return A, rng.normal(size=n)
+
+
+def _operand(A, mode):
+    return factorize(A) if mode == "factorized" else A
+
+
+@benchmark("numeric", n=SIZES, mode=MODES)
+def solve(n, mode):
+    A, b = system_of_size(n)
+    A = _operand(A, mode)
+    return lambda: solve_linear_system(A, b)
+
+
+@benchmark("numeric", n=SIZES, mode=MODES)
+def kappa(n, mode):
+    A, _ = system_of_size(n)
+    A = _operand(A, mode)
+    return lambda: condition_number(A)
+
+
+@benchmark("numeric", n=SIZES, mode=MODES)
+def tikhonov(n, mode):
+    A, b = system_of_size(n)
+    A = _operand(A, mode)
+    return lambda: tikhonov_regularization(A, b, 10.0)
+
+
+@benchmark("numeric", n=SIZES, mode=MODES)
+def sensitivity(n, mode):
+    A, b = system_of_size(n)
+    A = _operand(A, mode)
+    return lambda: sensitivity_analysis(A, b, 0.05)
+
+
+@benchmark("numeric", n=SIZES)
+def local_sensitivity(n):
+    A, b = system_of_size(n)
+    x = solve_linear_system(A, b)
+    return lambda: local_sensitivity_matrix(A, x)
@@ -0,0 +1,58 @@
+"""Benchmarks de renderização: cada plot_* (com templates já montados, como
+no servidor aquecido) e fig_to_base64 isolado, por formato."""
+import numpy as np
+
+from harness import benchmark
+from app.services.pipeline import run_solve_phase, warm_renderer
+from app.utils import visualization
+
+FORMATS = ("png", "webp", "svg")
+RESOURCES = ["Terra", "Mão de obra", "Água", "Fertilizante"]
+CROPS = ["Milho", "Soja", "Trigo"]
+
+
+def _numeric():
+    A = np.array([[1.0, 1.0, 1.0], [10.0, 8.0, 12.0], [3000.0, 2500.0, 1500.0], [150.0, 120.0, 100.0]])
+    b = np.array([100.0, 900.0, 220000.0, 12000.0])
+    profit = np.array([3000.0, 2800.0, 2000.0])
+    warm_renderer()
+    return run_solve_phase(A, b, profit, 0.05)
+
+
+@benchmark("render", fmt=FORMATS)
+def plot_sensitivity_heatmap(fmt):
+    S = _numeric()["S_base"]
+    return lambda: visualization.plot_sensitivity_heatmap(S, RESOURCES, CROPS, fmt)
+
+
+@benchmark("render", fmt=FORMATS)
+def plot_base_vs_perturbed(fmt):
+    sens = _numeric()["sens_base"]
+    return lambda: visualization.plot_base_vs_perturbed(
+        sens["x_base"], sens["x_pert_b"], CROPS, fixed_perturb=0.05, chart_format=fmt
+    )
+
+
+@benchmark("render", fmt=FORMATS)
+def plot_sensitivity_comparison(fmt):
+    numeric = _numeric()
+    return lambda: visualization.plot_sensitivity_comparison(
+        numeric["sens_well"], numeric["sens_ill"], fmt
+    )
+
+
+@benchmark("render", fmt=FORMATS)
+def plot_regularization(fmt):
+    demo = _numeric()["ill_demo"]
+    return lambda: visualization.plot_regularization(
+        demo["x_normal_ill"], demo["x_reg_ill"], ["C1", "C2", "C3"], demo["lam"], fmt
+    )
+
+
+@benchmark("render", fmt=FORMATS)
+def fig_to_base64(fmt):
+    # Figura fixa do tamanho do heatmap: mede só savefig + base64
+    _numeric()
+    fig, ax = visualization._new_figure((10, 6))
+    ax.bar(CROPS, [25.0, 62.5, 12.5], color=visualization.COLORS["primary"])
+    return lambda: visualization.fig_to_base64(fig, fmt)
@@ -0,0 +1,73 @@
+"""Benchmark de inicialização a frio do backend.
+
+Importa `app.main` em processos Python novos e mede o tempo de importação.
+Falha (código 1) se a mediana passar do orçamento ou se a importação puxar
+a pilha de gráficos, que deve ser carregada só no aquecimento em segundo plano.
+
+Uso (a partir de backend/):
+    python benchmarks/cold_start.py [--runs 5] [--budget-ms 1000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que não podem ser importados antes de /health responder
+DEFERRED_MODULES = ("matplotlib", "seaborn", "pandas", "scipy.linalg", "scipy.stats")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "import_ms": elapsed * 1e3,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def measure(runs):
+    samples, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["import_ms"])
+        loaded.update(result["loaded"])
+    return samples, sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms", type=float,
+        default=float(os.environ.get("COLD_START_BUDGET_MS", 1000)),
+    )
+    args = parser.parse_args(argv)
+
+    samples, loaded = measure(args.runs)
+    median = statistics.median(samples)
+    print(f"import app.main: mediana {median:.0f} ms "
+          f"(mín {min(samples):.0f}, máx {max(samples):.0f}, {args.runs} execuções)")
+    print(f"orçamento: {args.budget_ms:.0f} ms")
+
+    failed = False
+    if loaded:
+        print(f"FALHA: importados na inicialização: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget_ms:
+        print("FALHA: inicialização a frio acima do orçamento")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
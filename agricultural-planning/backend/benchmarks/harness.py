@@ -0,0 +1,165 @@
+"""Registro de benchmarks, medição (tempo e pico de memória) e comparação.
+
+Cada benchmark é uma função de preparação registrada com `@benchmark`; ela
+recebe os parâmetros do caso e devolve a função medida, sem argumentos (o
+custo da preparação fica fora da medição). Se a função medida devolver
+`Metrics`, elas são guardadas como métricas extras do caso (ex.: latências
+p95).
+"""
+import gc
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+CASES = []
+
+
+class Metrics(dict):
+    """Métricas extras devolvidas pela função medida (guardadas no relatório)."""
+
+
+class Case:
+    def __init__(self, group, name, setup, params):
+        self.group = group
+        self.name = name
+        self.setup = setup
+        self.params = params
+
+    @property
+    def id(self):
+        if not self.params:
+            return f"{self.group}/{self.name}"
+        args = ",".join(f"{k}={v}" for k, v in self.params.items())
+        return f"{self.group}/{self.name}[{args}]"
+
+
+def benchmark(group, **grid):
+    """Registra um caso por combinação dos parâmetros em `grid` (listas)."""
+    def register(setup):
+        keys = list(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            CASES.append(Case(group, setup.__name__, setup, dict(zip(keys, values))))
+        return setup
+    return register
+
+
+def _calibrate(fn, min_sample, first_call):
+    """Repetições por amostra para que cada amostra dure ao menos min_sample."""
+    if first_call >= min_sample:
+        return 1
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - started >= min_sample or loops >= 1 << 20:
+            return loops
+        loops *= 4
+
+
+def peak_memory(fn):
+    """Pico de memória alocada (bytes) numa chamada, via tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(fn, max_time=1.0, min_rounds=5, max_rounds=1000, min_sample=1e-3, memory=True):
+    """Estatísticas de tempo por chamada (s) e pico de memória (bytes)."""
+    started = time.perf_counter()
+    result = fn()  # aquecimento
+    loops = _calibrate(fn, min_sample, time.perf_counter() - started)
+    samples = []
+    deadline = time.perf_counter() + max_time
+    while len(samples) < min_rounds or (time.perf_counter() < deadline and len(samples) < max_rounds):
+        started = time.perf_counter()
+        for _ in range(loops):
+            result = fn()
+        samples.append((time.perf_counter() - started) / loops)
+    stats = {
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": len(samples),
+        "loops": loops,
+        "peak_bytes": peak_memory(fn) if memory else None,
+    }
+    if isinstance(result, Metrics):
+        stats["extra"] = dict(result)
+    return stats
+
+
+def environment():
+    import numpy as np
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_cases(cases, max_time=1.0, memory=True, log=print):
+    results = {}
+    for case in cases:
+        fn = case.setup(**case.params)
+        stats = measure(fn, max_time=max_time, memory=memory)
+        results[case.id] = {"group": case.group, "name": case.name, "params": case.params, **stats}
+        peak = stats["peak_bytes"]
+        log(f"{case.id:<58} {stats['median_s'] * 1e3:>11.3f} ms"
+            + (f" {peak / 2**20:>9.2f} MiB" if peak is not None else ""))
+    return {"environment": environment(), "results": results}
+
+
+def save(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(report, baseline, time_tolerance=0.20, memory_tolerance=0.10,
+            min_time_delta=50e-6, min_memory_delta=64 * 1024):
+    """Casos comuns aos dois relatórios: razão atual/base e regressões.
+
+    O tempo comparado é o mínimo das amostras, o menos sujeito a ruído de
+    outros processos. Uma regressão precisa passar da tolerância relativa e
+    do delta absoluto mínimo (abaixo disso a diferença é ruído do
+    cronômetro ou do alocador).
+    """
+    rows = []
+    for case_id, current in report["results"].items():
+        base = baseline["results"].get(case_id)
+        if base is None:
+            continue
+        row = {"id": case_id, "time_ratio": current["min_s"] / base["min_s"], "regressions": []}
+        if (row["time_ratio"] > 1 + time_tolerance
+                and current["min_s"] - base["min_s"] > min_time_delta):
+            row["regressions"].append("time")
+        if current.get("peak_bytes") is not None and base.get("peak_bytes"):
+            row["memory_ratio"] = current["peak_bytes"] / base["peak_bytes"]
+            if (row["memory_ratio"] > 1 + memory_tolerance
+                    and current["peak_bytes"] - base["peak_bytes"] > min_memory_delta):
+                row["regressions"].append("memory")
+        rows.append(row)
+    return rows
@@ -0,0 +1,103 @@
+"""Executa os benchmarks e compara com a linha de base gravada.
+
+Grupos: numeric (serviços de álgebra linear e sensibilidade), render
+(plot_* e fig_to_base64) e endpoint (/api/analyze em processo, por nível
+de concorrência). Grava os resultados em JSON e, com --baseline, falha
+(código 1) se algum caso ficou mais lento ou usou mais memória que a
+tolerância.
+
+Uso (a partir de backend/):
+    python benchmarks/run.py [--group numeric,render] [--max-size 1000 | --full]
+                             [--filter solve] [--output results.json]
+                             [--baseline benchmarks/baseline.json] [--save-baseline]
+"""
+import argparse
+import os
+import sys
+
+import harness
+
+GROUPS = ("numeric", "render", "endpoint")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def load_cases(groups):
+    # Importar o módulo registra os casos do grupo
+    for group in groups:
+        __import__(f"bench_{group}")
+    return [case for case in harness.CASES if case.group in groups]
+
+
+def select(cases, max_size=None, pattern=None):
+    return [
+        case for case in cases
+        if (max_size is None or case.params.get("n", 0) <= max_size)
+        and (pattern is None or pattern in case.id)
+    ]
+
+
+def print_comparison(rows):
+    print()
+    print(f"{'caso':<58} {'tempo':>8} {'memória':>8}")
+    for row in rows:
+        memory = f"{row['memory_ratio']:.2f}x" if "memory_ratio" in row else "-"
+        flag = f"  REGRESSÃO ({', '.join(row['regressions'])})" if row["regressions"] else ""
+        print(f"{row['id']:<58} {row['time_ratio']:>7.2f}x {memory:>8}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--group", default=",".join(GROUPS))
+    parser.add_argument("--max-size", type=int, default=1000,
+                        help="maior n dos micro-benchmarks (padrão 1000)")
+    parser.add_argument("--full", action="store_true", help="inclui 5000×5000")
+    parser.add_argument("--filter", default=None, help="só casos cujo id contém o texto")
+    parser.add_argument("--max-time", type=float, default=1.0, help="segundos por caso")
+    parser.add_argument("--no-memory", action="store_true", help="pula a medição de memória")
+    parser.add_argument("--output", default=None, help="grava o relatório JSON")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="grava o relatório como nova linha de base")
+    parser.add_argument("--time-tolerance", type=float, default=0.20)
+    parser.add_argument("--memory-tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    groups = tuple(g.strip() for g in args.group.split(",") if g.strip())
+    unknown = [g for g in groups if g not in GROUPS]
+    if unknown:
+        parser.error(f"grupos desconhecidos: {', '.join(unknown)}")
+    cases = select(load_cases(groups), None if args.full else args.max_size, args.filter)
+    if not cases:
+        parser.error("nenhum caso selecionado")
+
+    report = harness.run_cases(cases, max_time=args.max_time, memory=not args.no_memory)
+    if args.output:
+        harness.save(report, args.output)
+    if args.save_baseline:
+        harness.save(report, args.baseline)
+        print(f"linha de base gravada em {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"sem linha de base em {args.baseline}; nada a comparar")
+        return 0
+
+    baseline = harness.load(args.baseline)
+    for key in ("machine", "cpu_count", "numpy"):
+        if baseline["environment"].get(key) != report["environment"][key]:
+            print(f"aviso: linha de base de outro ambiente ({key}: "
+                  f"{baseline['environment'].get(key)} ≠ {report['environment'][key]})")
+    rows = harness.compare(
+        report, baseline,
+        time_tolerance=args.time_tolerance, memory_tolerance=args.memory_tolerance
+    )
+    print_comparison(rows)
+    regressions = [row for row in rows if row["regressions"]]
+    if regressions:
+        print(f"FALHA: {len(regressions)} caso(s) acima da tolerância "
+              f"(tempo +{args.time_tolerance:.0%}, memória +{args.memory_tolerance:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
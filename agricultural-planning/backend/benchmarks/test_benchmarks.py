@@ -0,0 +1,23 @@
+"""Os mesmos casos de run.py pelo pytest-benchmark.
+
+    pip install pytest pytest-benchmark
+    pytest benchmarks/ --benchmark-autosave
+    pytest benchmarks/ --benchmark-compare --benchmark-compare-fail=median:20%
+
+BENCH_MAX_SIZE (padrão 1000) limita o n dos micro-benchmarks.
+"""
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from run import GROUPS, load_cases, select  # noqa: E402
+
+CASES = select(load_cases(GROUPS), int(os.environ.get("BENCH_MAX_SIZE", "1000")))
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case.id for case in CASES])
+def test_benchmark(benchmark, case):
+    benchmark.group = case.group
+    benchmark(case.setup(**case.params))
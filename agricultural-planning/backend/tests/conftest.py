@@ -0,0 +1,43 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# Testes rodam a partir de backend/: pytest tests/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(os.path.dirname(BACKEND_DIR))
+for path in (BACKEND_DIR, REPO_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Estado do servidor (jobs, modelos, caches em disco) fora de data/
+DATA_DIR = tempfile.mkdtemp(prefix="agro-tests-")
+atexit.register(shutil.rmtree, DATA_DIR, ignore_errors=True)
+for name, entry in (("JOB_DB", "jobs.sqlite3"), ("MODEL_DIR", "models"),
+                    ("EXPORT_DIR", "exports"), ("RESULT_CACHE_DIR", "cache"),
+                    ("PROFILE_DIR", "profiles")):
+    os.environ.setdefault(name, os.path.join(DATA_DIR, entry))
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Cliente ASGI em processo para a API inteira."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def model_input():
+    return {
+        "resources": ["Terra", "Mão de obra", "Água", "Fertilizante"],
+        "crops": ["Milho", "Soja", "Trigo"],
+        "A": [[1, 1, 1], [10, 8, 12], [3000, 2500, 1500], [150, 120, 100]],
+        "b": [100, 900, 220000, 12000],
+        "profit": [3000, 2800, 2000],
+        "rel_perturb": 0.05,
+    }
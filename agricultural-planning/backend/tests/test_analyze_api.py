@@ -0,0 +1,43 @@
+"""Partes opcionais de /api/analyze selecionadas por include."""
+import json
+
+import numpy as np
+
+
+def test_derivative_tensor_is_opt_in(client, model_input):
+    default = client.post("/api/analyze?images=none", json=model_input)
+    full = client.post("/api/analyze?images=none&include=derivatives", json=model_input)
+    assert default.status_code == full.status_code == 200
+    assert default.headers["etag"] != full.headers["etag"]
+
+    summary = default.json()["analytic_sensitivity"]
+    analytic = full.json()["analytic_sensitivity"]
+    assert "dx_dA" not in summary
+    for key in ("dx_db", "dprofit_db", "dprofit_dA", "x_elasticity", "worst_direction_b"):
+        assert key in summary
+    dx_dA = np.array(analytic["dx_dA"])
+    assert dx_dA.shape == (3, 3, 3)
+    # ∂lucro/∂A do resumo é profitᵀ ∂x/∂A
+    np.testing.assert_allclose(
+        summary["dprofit_dA"], np.einsum("k,kij->ij", model_input["profit"], dx_dA), rtol=1e-10
+    )
+
+
+def test_include_lists_charts_and_extras(client, model_input):
+    body = client.post("/api/analyze?include=heatmap,derivatives&chart_format=spec",
+                       json=model_input).json()
+    assert "heatmap" in body and "comparison" not in body
+    assert "dx_dA" in body["analytic_sensitivity"]
+
+    r = client.post("/api/analyze?include=heatmap,tensor", json=model_input)
+    assert r.status_code == 422
+    assert "tensor" in r.json()["detail"]
+
+
+def test_stream_honours_derivatives(client, model_input):
+    text = client.post("/api/analyze/stream?images=none&include=derivatives", json=model_input).text
+    events = dict(
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in text.strip().split("\n\n")
+    )
+    assert "dx_dA" in events["sensitivity"]["analytic_sensitivity"]
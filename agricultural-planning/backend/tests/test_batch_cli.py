@@ -0,0 +1,65 @@
+"""Modo batch do planejamento_agricola.py (entrada com linhas inválidas e --resume)."""
+import json
+import os
+
+import pytest
+
+import planejamento_agricola as pa
+
+
+def _quiet(*args):
+    pass
+
+
+def _results(output_dir):
+    with open(os.path.join(output_dir, pa.RESULTS_FILE), encoding="utf-8") as f:
+        return {row["id"]: row for row in map(json.loads, f)}
+
+
+@pytest.fixture
+def scenarios(tmp_path):
+    path = tmp_path / "cenarios.jsonl"
+    lines = [json.dumps({"id": f"s{i}", "rel_perturb": 0.01 + i / 1000}) for i in range(10)]
+    lines.insert(3, "not json")
+    lines.insert(7, "[1, 2]")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_malformed_lines_become_errors(scenarios, tmp_path):
+    output = str(tmp_path / "out")
+    checkpoint = pa.run_batch(scenarios, output, workers=1, chunk_size=4, log=_quiet)
+
+    results = _results(output)
+    assert checkpoint["complete"]
+    assert checkpoint["scenarios"] == len(results) == 12
+    assert checkpoint["errors"] == 2
+    assert results["linha 4"]["error"].startswith("JSONDecodeError")
+    assert "objeto JSON" in results["linha 8"]["error"]
+    assert all("error" not in results[f"s{i}"] for i in range(10))
+
+
+def test_resume_after_malformed_line(scenarios, tmp_path):
+    output = str(tmp_path / "out")
+    pa.run_batch(scenarios, output, workers=1, chunk_size=4, log=_quiet)
+    expected = _results(output)
+
+    # Simula uma interrupção depois do primeiro bloco, com um bloco gravado pela metade
+    checkpoint_path = os.path.join(output, pa.CHECKPOINT_FILE)
+    with open(checkpoint_path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    first = checkpoint["chunks"][0]
+    with open(os.path.join(output, pa.RESULTS_FILE), "rb") as f:
+        head = b"".join(f.readline() for _ in range(4))
+    with open(os.path.join(output, pa.RESULTS_FILE), "wb") as f:
+        f.write(head + b'{"id": "meio')
+    checkpoint.update(chunks=[first], offset=len(head), scenarios=4,
+                      errors=head.count(b'"error":'), complete=False)
+    with open(checkpoint_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+
+    resumed = pa.run_batch(scenarios, output, workers=1, chunk_size=4, resume=True, log=_quiet)
+
+    assert resumed["complete"]
+    assert resumed["scenarios"] == 12 and resumed["errors"] == 2
+    assert _results(output) == expected
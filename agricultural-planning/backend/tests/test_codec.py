@@ -0,0 +1,69 @@
+"""Buffer float64 (AGF8): ida e volta e cabeçalhos inválidos viram 400."""
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from app.utils import codec
+
+
+def _buffer(header, data=b""):
+    raw = json.dumps(header).encode()
+    return struct.pack("<4sI", codec.MAGIC, len(raw)) + raw + data
+
+
+def test_round_trip_keeps_nested_arrays():
+    payload = {
+        "x": np.arange(3.0),
+        "tikhonov": {"lambda": 0.5, "path": {"lambdas": np.linspace(0, 1, 4).reshape(2, 2)}},
+        "kappa": np.inf,
+        "crops": ["Milho", "Soja"],
+    }
+    decoded = codec.decode_float64(codec.encode_float64(payload))
+
+    np.testing.assert_array_equal(decoded["x"], payload["x"])
+    np.testing.assert_array_equal(decoded["tikhonov"]["path"]["lambdas"],
+                                  payload["tikhonov"]["path"]["lambdas"])
+    assert decoded["tikhonov"]["lambda"] == 0.5
+    assert decoded["kappa"] is None
+    assert decoded["crops"] == ["Milho", "Soja"]
+
+
+def test_analyze_accepts_float64_body(client, model_input):
+    body = {**model_input, **{k: np.array(model_input[k], dtype=float) for k in ("A", "b", "profit")}}
+    r = client.post("/api/analyze?images=none", content=codec.encode_float64(body),
+                    headers={"content-type": codec.FLOAT64, "accept": codec.FLOAT64})
+    assert r.status_code == 200
+    result = codec.decode_float64(r.content)
+    expected = client.post("/api/analyze?images=none", json=model_input).json()
+    np.testing.assert_allclose(result["x_base"], expected["x_base"])
+
+
+@pytest.mark.parametrize("body", [
+    b"AGF",
+    struct.pack("<4sI", codec.MAGIC, 64) + b'{"arrays": []}',
+    _buffer({"arrays": []})[:-3],
+])
+def test_truncated_buffer(body):
+    with pytest.raises(ValueError):
+        codec.decode_float64(body)
+
+
+@pytest.mark.parametrize("header", [
+    {"arrays": [[1, [2]]]},
+    {"arrays": 5},
+    {"arrays": [["A", 3]]},
+    {"arrays": [["A"]]},
+    {"arrays": [["A", [2, -1]]]},
+    {"arrays": [["A", [True]]]},
+    {"fields": {"A": 1}, "arrays": [["A.x", [1]]]},
+    [1, 2],
+    {"fields": []},
+])
+def test_malformed_header_is_bad_request(client, header):
+    body = _buffer(header, np.zeros(1).tobytes())
+    with pytest.raises(ValueError):
+        codec.decode_float64(body)
+    r = client.post("/api/analyze", content=body, headers={"content-type": codec.FLOAT64})
+    assert r.status_code == 400
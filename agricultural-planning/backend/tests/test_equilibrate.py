@@ -0,0 +1,98 @@
+"""equilibrate=True: a solução não muda onde a escala não deveria mudá-la."""
+import numpy as np
+import pytest
+
+from app.services.linear_algebra import FactorizedSystem, iterative_lstsq
+from app.services.pipeline import run_solve_phase
+from app.services.sensitivity import analytic_sensitivity, sensitivity_analysis, worst_case_direction
+
+
+def _badly_scaled(m, n, rank=None, seed=1):
+    rng = np.random.default_rng(seed)
+    A = rng.normal(size=(m, n)) if rank is None else rng.normal(size=(m, rank)) @ rng.normal(size=(rank, n))
+    return A * np.exp(rng.uniform(-5, 5, m))[:, np.newaxis] * np.exp(rng.uniform(-5, 5, n))
+
+
+@pytest.mark.parametrize("shape", [(3, 5), (4, 4)])
+def test_min_norm_solution_unchanged(shape):
+    A = _badly_scaled(*shape)
+    b = np.random.default_rng(2).normal(size=shape[0]) * np.abs(A).max(axis=1)
+    plain = FactorizedSystem(A)
+    scaled = FactorizedSystem(A, equilibrate=True)
+
+    assert scaled.equilibrated
+    assert scaled.kappa_scaled < scaled.kappa
+    assert scaled.kappa == pytest.approx(plain.kappa)
+    np.testing.assert_allclose(scaled.solve(b), plain.solve(b), rtol=1e-10)
+    np.testing.assert_allclose(scaled.pinv() @ b, plain.pinv() @ b, rtol=1e-10)
+    x = iterative_lstsq(A, b, equilibrate=True, maxiter=1000)["x"]
+    np.testing.assert_allclose(x, plain.solve(b), rtol=1e-8)
+
+
+def test_wide_system_scales_rows_only():
+    scaled = FactorizedSystem(_badly_scaled(3, 5), equilibrate=True)
+    np.testing.assert_array_equal(scaled.col_scale, np.ones(5))
+    assert not np.all(scaled.row_scale == 1)
+
+
+@pytest.mark.parametrize("shape", [(3, 5), (5, 3)])
+def test_rank_deficient_falls_back(shape):
+    A = _badly_scaled(*shape, rank=2)
+    b = A @ np.ones(shape[1])
+    scaled = FactorizedSystem(A, equilibrate=True)
+
+    assert not scaled.equilibrated
+    np.testing.assert_array_equal(scaled.solve(b), FactorizedSystem(A).solve(b))
+
+
+def test_analytic_sensitivity_wide_matches_finite_differences():
+    A = _badly_scaled(3, 5)
+    b = np.random.default_rng(3).normal(size=3) * np.abs(A).max(axis=1)
+    dx_dA = analytic_sensitivity(FactorizedSystem(A, equilibrate=True), b)["dx_dA"]
+    x = FactorizedSystem(A).solve(b)
+    for i, j in [(0, 1), (2, 4)]:
+        h = 1e-6 * abs(A[i, j])
+        A_h = A.copy()
+        A_h[i, j] += h
+        fd = (FactorizedSystem(A_h).solve(b) - x) / h
+        np.testing.assert_allclose(dx_dA[:, i, j], fd, rtol=1e-4, atol=1e-6 * np.abs(fd).max())
+
+
+def test_pipeline_reports_equilibrated():
+    # 3 restrições de igualdade e 5 culturas: A_eq larga
+    A = _badly_scaled(4, 5)
+    b = A @ np.ones(5)
+    profit = np.arange(1.0, 6.0)
+    stages = dict(A_base=A, b_base=b, profit=profit, rel_perturb=0.05)
+
+    plain = run_solve_phase(**stages)
+    scaled = run_solve_phase(**stages, equilibrate=True)
+
+    assert plain["equilibrated"] is None and plain["kappa_scaled"] is None
+    assert scaled["equilibrated"] is True
+    np.testing.assert_allclose(scaled["x_base"], plain["x_base"], rtol=1e-10)
+
+
+def test_worst_direction_reuses_raw_svd(monkeypatch):
+    A = _badly_scaled(5, 3)
+    b = np.random.default_rng(4).normal(size=5)
+    scaled = FactorizedSystem(A, equilibrate=True)
+    plain = FactorizedSystem(A)
+    calls = []
+    svd = np.linalg.svd
+
+    def counted(M, *args, **kwargs):
+        calls.append(M.shape)
+        return svd(M, *args, **kwargs)
+
+    monkeypatch.setattr(np.linalg, "svd", counted)
+    u, v, s_r = worst_case_direction(scaled)
+    sensitivity_analysis(scaled, b, direction="worst")
+    analytic_sensitivity(scaled, b, tensor=False)
+
+    assert len(calls) == 1
+    u_plain, v_plain, s_plain = worst_case_direction(plain)
+    np.testing.assert_allclose(u, u_plain, atol=1e-12)
+    np.testing.assert_allclose(v, v_plain, atol=1e-12)
+    assert s_r == pytest.approx(s_plain)
+    assert scaled.kappa == pytest.approx(plain.kappa)
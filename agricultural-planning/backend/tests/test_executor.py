@@ -0,0 +1,60 @@
+"""Backpressure do AnalysisExecutor com clientes que desistem no meio."""
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.executor import AnalysisExecutor, QueueFullError
+
+
+def test_cancelled_wait_keeps_slot_until_task_finishes():
+    executor = AnalysisExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        task = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # A tarefa continua rodando no pool: a vaga segue ocupada
+        assert executor.stats()["in_flight"] == 1
+        with pytest.raises(QueueFullError):
+            await asyncio.wait_for(executor.run(int), 1)
+
+        release.set()
+        for _ in range(100):
+            if executor.stats()["in_flight"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert executor.stats()["in_flight"] == 0
+        assert await executor.run(int) == 0
+
+    try:
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_cancelled_before_start_frees_slot():
+    executor = AnalysisExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(executor.run(release.wait))
+        queued = asyncio.create_task(executor.run(int))
+        await asyncio.sleep(0.05)
+        assert executor.stats()["in_flight"] == 2
+        # Ainda na fila: o cancelamento tira a tarefa do pool
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        assert executor.stats()["in_flight"] == 1
+        release.set()
+        await running
+
+    try:
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,72 @@
+"""Fila de jobs: só concessões vencidas voltam para a fila."""
+import sqlite3
+import time
+
+from app.utils.jobs import DONE, QUEUED, RUNNING, JobQueue, JobStore
+
+
+def _status(store, job_id):
+    return store.get(job_id)["status"]
+
+
+def test_live_lease_is_not_requeued(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.submit("a", "c1", {}, b"in")
+    assert store.claim("outro-processo", lease=60)[0] == "a"
+
+    assert store.requeue_expired() == 0
+    assert _status(store, "a") == RUNNING
+
+
+def test_expired_lease_is_requeued_and_heartbeat_renews(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.submit("a", "c1", {}, b"in")
+    store.submit("b", "c1", {}, b"in")
+    store.claim("vivo", lease=0.05)
+    store.claim("morto", lease=0.05)
+    time.sleep(0.1)
+    assert store.heartbeat("vivo", lease=60) == 1
+
+    assert store.requeue_expired() == 1
+    assert _status(store, "a") == RUNNING
+    assert _status(store, "b") == QUEUED
+    assert store.claim("vivo", lease=60)[0] == "b"
+
+
+def test_start_keeps_jobs_of_other_live_processes(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    other = JobStore(path)
+    other.submit("a", "c1", {}, b"in")
+    other.claim("outro-processo", lease=60)
+
+    queue = JobQueue(path, workers=1, poll=0.05)
+    queue.handler = lambda params, blob: b"out"
+    queue.start()
+    try:
+        queue.submit("b", "c1", {}, b"in")
+        for _ in range(100):
+            if queue.get("b")["status"] == DONE:
+                break
+            time.sleep(0.02)
+        assert queue.get("b")["status"] == DONE
+        assert queue.get("a")["status"] == RUNNING
+    finally:
+        queue.stop()
+
+
+def test_old_table_gets_lease_columns(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, client TEXT NOT NULL, status TEXT NOT NULL, "
+        "params TEXT NOT NULL, input BLOB NOT NULL, result BLOB, error TEXT, "
+        "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+    )
+    conn.execute("INSERT INTO jobs VALUES ('a', 'c1', 'running', '{}', x'', NULL, NULL, 0, 0, NULL)")
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+    # Linha sem concessão (versão anterior, sem heartbeat) conta como vencida
+    assert store.requeue_expired() == 1
+    assert store.claim("novo", lease=60)[0] == "a"
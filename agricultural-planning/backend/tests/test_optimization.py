@@ -0,0 +1,110 @@
+"""Warm start do LP (LPBasis) contra a solução a frio do HiGHS."""
+import numpy as np
+import pytest
+
+from app.services.optimization import LPBasis, _bound_arrays, _columns, optimize_allocation
+
+A = np.array([[1.0, 1.0, 1.0], [10.0, 8.0, 12.0], [3000.0, 2500.0, 1500.0], [150.0, 120.0, 100.0]])
+B = np.array([100.0, 900.0, 220000.0, 12000.0])
+PROFIT = np.array([3000.0, 2800.0, 2000.0])
+
+
+def _random_lp(seed, m=6, n=5):
+    rng = np.random.default_rng(seed)
+    A = rng.uniform(0.5, 3.0, (m, n))
+    return A, A @ rng.uniform(1.0, 5.0, n) * rng.uniform(0.6, 1.0, m), rng.uniform(1.0, 4.0, n)
+
+
+def _assert_same_optimum(warm, cold):
+    assert warm["status"] == cold["status"] == "optimal"
+    assert warm["profit"] == pytest.approx(cold["profit"], rel=1e-9)
+    np.testing.assert_allclose(warm["x"], cold["x"], rtol=1e-7, atol=1e-7)
+    np.testing.assert_allclose(warm["shadow_prices"], cold["shadow_prices"], rtol=1e-7, atol=1e-7)
+    np.testing.assert_allclose(warm["slack"], cold["slack"], rtol=1e-7, atol=1e-6)
+
+
+def test_basis_reproduces_cold_solution():
+    cold = optimize_allocation(A, B, PROFIT)
+    basis = cold["basis"]
+    assert basis is not None
+
+    # LU da base: B z_B + N z_N = b com as colunas de [A | I]
+    z = np.concatenate([cold["x"], cold["slack"]])
+    lhs = _columns(A, basis.basic) @ z[basis.basic]
+    if len(basis.fixed):
+        lhs += _columns(A, basis.fixed) @ basis.z_fixed
+    np.testing.assert_allclose(lhs, B, rtol=1e-10)
+    x, slack = basis.resolve(B)
+    np.testing.assert_allclose(x, cold["x"], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("scale", [0.999, 1.001, 1.01])
+def test_warm_start_matches_cold_when_basis_stays_feasible(scale):
+    basis = optimize_allocation(A, B, PROFIT)["basis"]
+    b = B * scale
+    warm = optimize_allocation(A, b, PROFIT, basis=basis)
+    cold = optimize_allocation(A, b, PROFIT)
+
+    assert warm["warm_start"] and not cold["warm_start"]
+    assert warm["basis"] is basis
+    _assert_same_optimum(warm, cold)
+
+
+def test_warm_start_falls_back_when_basis_breaks():
+    basis = optimize_allocation(A, B, PROFIT)["basis"]
+    # Terra deixa de limitar e a água passa a limitar: outra base ótima
+    b = B * np.array([3.0, 1.0, 0.5, 1.0])
+    assert basis.resolve(b) is None
+
+    warm = optimize_allocation(A, b, PROFIT, basis=basis)
+    cold = optimize_allocation(A, b, PROFIT)
+    assert not warm["warm_start"]
+    assert warm["basis"] is not basis
+    _assert_same_optimum(warm, cold)
+
+
+def test_warm_start_ignored_for_other_problem():
+    basis = optimize_allocation(A, B, PROFIT)["basis"]
+    profit = PROFIT * np.array([1.0, 1.5, 1.0])
+    warm = optimize_allocation(A, B, profit, basis=basis)
+    assert not warm["warm_start"]
+    _assert_same_optimum(warm, optimize_allocation(A, B, profit))
+    bounds = [(0, 50), (None, None), (10, None)]
+    assert not optimize_allocation(A, B, PROFIT, bounds=bounds, basis=basis)["warm_start"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("sparse", [False, True])
+def test_random_perturbations(seed, sparse):
+    A_r, b_r, profit = _random_lp(seed)
+    bounds = [(0, None), (0.5, None), (0, 4.0), (None, None), (0, None)]
+    basis = optimize_allocation(A_r, b_r, profit, bounds=bounds, sparse=sparse)["basis"]
+    assert basis is not None
+    rng = np.random.default_rng(100 + seed)
+    outcomes = set()
+    for rel in (1e-4, 1e-3, 1e-2, 0.1, 0.5):
+        b = b_r * (1 + rel * rng.uniform(-1, 1, b_r.size))
+        warm = optimize_allocation(A_r, b, profit, bounds=bounds, sparse=sparse, basis=basis)
+        cold = optimize_allocation(A_r, b, profit, bounds=bounds, sparse=sparse)
+        outcomes.add(warm["warm_start"])
+        if cold["status"] != "optimal":
+            assert not warm["warm_start"]
+            continue
+        assert warm["profit"] == pytest.approx(cold["profit"], rel=1e-8)
+        # Viável para o novo b (x pode diferir se houver ótimos alternativos)
+        assert np.all(A_r @ warm["x"] <= b + 1e-8 * np.abs(b))
+    # Perturbações pequenas mantêm a base; as grandes caem no HiGHS
+    assert outcomes == {True, False}
+
+
+def test_dual_infeasible_point_is_rejected():
+    # x = 0 é um vértice viável, mas não ótimo: custos reduzidos positivos
+    lo, hi = _bound_arrays(None, 3)
+    assert LPBasis.from_solution(A, PROFIT, lo, hi, np.zeros(3), B.copy()) is None
+
+
+def test_non_vertex_is_rejected():
+    # Ponto interior: mais variáveis estritamente dentro dos limites que linhas
+    lo, hi = _bound_arrays(None, 3)
+    x = np.array([1.0, 1.0, 1.0])
+    assert LPBasis.from_solution(A[:2], PROFIT, lo, hi, x, B[:2] - A[:2] @ x) is None
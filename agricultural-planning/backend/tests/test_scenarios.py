@@ -0,0 +1,26 @@
+"""Exportação de cenários: a cópia temporária some mesmo se o rename falhar."""
+import os
+
+import numpy as np
+import pytest
+
+from app.services import scenarios
+from app.services.scenarios import export_scenarios
+
+
+@pytest.mark.parametrize("format", ["npy", "parquet"])
+def test_failed_rename_removes_temporary_export(tmp_path, monkeypatch, model_input, format):
+    if format == "parquet":
+        pytest.importorskip("pyarrow")
+    A = np.array(model_input["A"], dtype=float)
+    B = np.array(model_input["b"], dtype=float) * np.linspace(0.9, 1.1, 10)[:, np.newaxis]
+
+    def taken(src, dst):
+        raise FileExistsError(dst)
+
+    monkeypatch.setattr(scenarios.os, "rename", taken)
+    result = export_scenarios(A, B, np.array(model_input["profit"], dtype=float), 0,
+                              str(tmp_path / "export"), format=format, chunk_rows=4)
+
+    assert result["rows"] == 10
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,55 @@
+"""Modo esparso: kappa por shift-invert confere com a SVD densa."""
+import numpy as np
+import pytest
+from scipy import sparse
+
+from app.services import linear_algebra
+from app.services.linear_algebra import condition_estimate, equilibration_scales, scale_matrix
+from app.services.sparse_analysis import analyze_sparse
+
+
+def _sparse_farm(m, n, seed=0):
+    rng = np.random.default_rng(seed)
+    A = sparse.random(m, n, density=0.005, random_state=rng, format="csr") + sparse.eye(m, n, format="csr")
+    rows = sparse.diags(np.exp(rng.uniform(-2, 2, m)))
+    cols = sparse.diags(np.exp(rng.uniform(-2, 2, n)))
+    return (rows @ A @ cols).tocsr()
+
+
+@pytest.mark.parametrize("shape", [(400, 400), (600, 300), (300, 500)])
+def test_condition_estimate_matches_dense(shape):
+    A = _sparse_farm(*shape)
+    assert condition_estimate(A) == pytest.approx(np.linalg.cond(A.toarray()), rel=1e-4)
+
+
+def test_condition_estimate_singular_is_inf():
+    A = _sparse_farm(400, 400).tolil()
+    A[:, 7] = A[:, 3]
+    assert condition_estimate(A.tocsr()) == np.inf
+
+
+def test_condition_estimate_falls_back_to_lower_bound(monkeypatch):
+    A = _sparse_farm(400, 400)
+    monkeypatch.setattr(linear_algebra, "SHIFT_INVERT_MAX_NNZ", 0)
+    kappa = condition_estimate(A)
+    assert 1 < kappa <= np.linalg.cond(A.toarray()) * (1 + 1e-6)
+
+
+def test_analyze_sparse_reuses_solver_scales(monkeypatch):
+    A = _sparse_farm(600, 300)
+    b = A @ np.ones(300)
+    calls = []
+
+    def counted(M):
+        calls.append(M.shape)
+        return equilibration_scales(M)
+
+    monkeypatch.setattr(linear_algebra, "equilibration_scales", counted)
+    result = analyze_sparse(A, b, equilibrate=True, maxiter=2000)
+
+    assert len(calls) == 1
+    assert "row_scale" not in result and "col_scale" not in result
+    r, c = equilibration_scales(A)
+    expected = np.linalg.cond(scale_matrix(A, r, c).toarray())
+    assert result["kappa_scaled"] == pytest.approx(expected, rel=1e-4)
+    np.testing.assert_allclose(result["x"], np.ones(300), rtol=1e-6)
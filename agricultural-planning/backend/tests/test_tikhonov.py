@@ -0,0 +1,33 @@
+"""Caminho de Tikhonov com A exatamente singular."""
+import warnings
+
+import numpy as np
+import pytest
+
+from app.services.linear_algebra import FactorizedSystem, select_lambda, tikhonov_path
+
+# Coluna e linha nulas: a SVD tem um valor singular exatamente 0
+A_SINGULAR = np.array([[1.0, 2.0, 0.0], [3.0, 1.0, 0.0], [0.0, 0.0, 0.0]])
+B = np.array([1.0, 2.0, 3.0])
+
+
+@pytest.mark.parametrize("method", ["lcurve", "gcv"])
+def test_singular_path_is_finite(method):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        path = tikhonov_path(A_SINGULAR, B)
+        lam, index = select_lambda(path, method)
+
+    assert np.isfinite(path["x"]).all()
+    assert np.isfinite(path["residual_norm"]).all() and np.isfinite(path["solution_norm"]).all()
+    assert np.isfinite(lam)
+    # Componente no núcleo de A fica nula para todo λ
+    np.testing.assert_array_equal(path["x"][:, 2], 0.0)
+
+
+def test_singular_filter_factors_without_damping():
+    system = FactorizedSystem(A_SINGULAR)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        x = system.tikhonov(B, 0.0)
+    np.testing.assert_allclose(x, np.linalg.lstsq(A_SINGULAR, B, rcond=None)[0])
@@ -1,5 +1,6 @@
 import {
   Component,
+  OnDestroy,
   Pipe,
   PipeTransform,
   ViewEncapsulation,
@@ -9,13 +10,18 @@ import { HttpClientModule } from '@angular/common/http';
 import { FormsModule } from '@angular/forms';
 import { DomSanitizer, SafeHtml } from '@angular/platform-browser';
 import { trigger, transition, style, animate } from '@angular/animations';
+import { Subscription } from 'rxjs';
 
 import { AnalysisService } from '../../services/analysis.service';
 import {
   AnalysisInterpreterService,
   InterpretedAnalysis,
 } from '../../services/analysis-interpreter.service';
-import { ModelInput, AnalysisOutput } from '../../models/analysis.model';
+import {
+  ModelInput,
+  AnalysisOutput,
+  AnalysisStreamEvent,
+} from '../../models/analysis.model';
 
 /* ========= PIPE STANDALONE PARA HTML SEGURO ========= */
 @Pipe({
@@ -60,7 +66,7 @@ export class SafePipe implements PipeTransform {
     ]),
   ],
 })
-export class AnalysisComponent {
+export class AnalysisComponent implements OnDestroy {
   // ===== NAVEGAÇÃO =====
   showAnalysis: boolean = false;
 
@@ -70,6 +76,11 @@ export class AnalysisComponent {
   error: string | null = null;
   interpretedResult: InterpretedAnalysis | null = null;
 
+  // ===== STREAMING =====
+  firstNumberMs: number | null = null; // tempo até o primeiro número (ms)
+  totalMs: number | null = null; // tempo até o último evento (ms)
+  private streamSub: Subscription | null = null;
+
   // ===== DADOS DE ENTRADA DO MODELO =====
   input: ModelInput = {
     resources: ['Terra', 'Mão de obra', 'Água', 'Fertilizante'],
@@ -92,6 +103,10 @@ export class AnalysisComponent {
     console.log('✅ AnalysisComponent inicializado');
   }
 
+  ngOnDestroy(): void {
+    this.cancelStream();
+  }
+
   // ===== MÉTODOS DE NAVEGAÇÃO =====
 
   /**
@@ -116,32 +131,52 @@ export class AnalysisComponent {
   // ===== MÉTODOS DE ANÁLISE =====
 
   /**
-   * Executa a análise chamando o backend
+   * Executa a análise em streaming: os números aparecem assim que cada
+   * etapa termina no backend, e os gráficos chegam um a um
    */
   analyze(): void {
+    this.cancelStream();
     this.loading = true;
     this.error = null;
+    this.result = null;
     this.interpretedResult = null;
+    this.firstNumberMs = null;
+    this.totalMs = null;
 
     console.log('🔬 Iniciando análise com dados:', this.input);
-
-    this.analysisService.analyze(this.input).subscribe({
-      next: (data: AnalysisOutput) => {
-        console.log('✅ Resposta da API recebida:', data);
-        this.result = data;
-
-        // Gera insights interpretados
-        this.interpretedResult = this.interpreterService.interpret(
-          data,
-          this.input.crops,
-          this.input.resources
-        );
-        console.log(
-          '✅ Interpretação gerada com sucesso:',
-          this.interpretedResult
-        );
-
-        this.loading = false;
+    const started = performance.now();
+    let partial: Partial<AnalysisOutput> = {};
+
+    this.streamSub = this.analysisService.analyzeStream(this.input).subscribe({
+      next: ({ event, data }: AnalysisStreamEvent) => {
+        const { elapsed_ms, ...fields } = data;
+        console.log(`📨 Evento ${event}`, { elapsed_ms });
+
+        if (event === 'error') {
+          this.error = data.detail;
+          this.loading = false;
+          return;
+        }
+        if (event === 'done') {
+          this.totalMs = performance.now() - started;
+          // Interpretação precisa de todos os números
+          this.interpretedResult = this.interpreterService.interpret(
+            this.result as AnalysisOutput,
+            this.input.crops,
+            this.input.resources
+          );
+          this.loading = false;
+          return;
+        }
+
+        if (this.firstNumberMs === null) {
+          this.firstNumberMs = performance.now() - started;
+        }
+        partial =
+          event === 'chart'
+            ? { ...partial, [data.name]: data.data }
+            : { ...partial, ...fields };
+        this.result = partial as AnalysisOutput;
       },
       error: (err) => {
         console.error('❌ Erro na API:', err);
@@ -157,6 +192,15 @@ export class AnalysisComponent {
     });
   }
 
+  /**
+   * Interrompe a análise em andamento (o backend para de calcular)
+   */
+  cancelStream(): void {
+    this.streamSub?.unsubscribe();
+    this.streamSub = null;
+    this.loading = false;
+  }
+
   /**
    * Atualiza o valor da perturbação relativa
    */
@@ -181,6 +225,7 @@ export class AnalysisComponent {
    * Limpa todos os resultados e erros
    */
   clearResults(): void {
+    this.cancelStream();
     this.result = null;
     this.interpretedResult = null;
     this.error = null;
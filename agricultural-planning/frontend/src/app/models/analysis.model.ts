@@ -26,3 +26,18 @@ export interface AnalysisOutput {
     rel_dx_ill?: number;
   };
 }
+
+/** Evento de /api/analyze/stream (Server-Sent Events). */
+export interface AnalysisStreamEvent {
+  event:
+    | 'solution'
+    | 'sensitivity'
+    | 'regularization'
+    | 'monte_carlo'
+    | 'chart'
+    | 'done'
+    | 'error';
+  // elapsed_ms (tempo no servidor) + campos de AnalysisOutput do grupo;
+  // em "chart": { name, format, data }
+  data: any;
+}
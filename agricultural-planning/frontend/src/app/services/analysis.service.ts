@@ -1,7 +1,11 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
-import { ModelInput, AnalysisOutput } from '../models/analysis.model';
+import {
+  ModelInput,
+  AnalysisOutput,
+  AnalysisStreamEvent,
+} from '../models/analysis.model';
 
 @Injectable({
   providedIn: 'root',
@@ -15,4 +19,68 @@ export class AnalysisService {
   analyze(input: ModelInput): Observable<AnalysisOutput> {
     return this.http.post<AnalysisOutput>(`${this.apiUrl}/analyze`, input);
   }
+
+  /**
+   * Análise em streaming (SSE via POST): emite cada grupo de resultados
+   * assim que o backend o calcula. Cancelar a inscrição aborta a requisição
+   * e o backend deixa de calcular os grupos restantes.
+   */
+  analyzeStream(input: ModelInput): Observable<AnalysisStreamEvent> {
+    return new Observable<AnalysisStreamEvent>((subscriber) => {
+      const controller = new AbortController();
+
+      fetch(`${this.apiUrl}/analyze/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Accept: 'text/event-stream',
+        },
+        body: JSON.stringify(input),
+        signal: controller.signal,
+      })
+        .then(async (response) => {
+          if (!response.ok || !response.body) {
+            // Mesmo formato de erro do HttpClient (err.error.detail)
+            const error = await response.json().catch(() => null);
+            throw { status: response.status, error, message: `HTTP ${response.status}` };
+          }
+          const reader = response.body
+            .pipeThrough(new TextDecoderStream())
+            .getReader();
+          let buffer = '';
+          while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let end: number;
+            while ((end = buffer.indexOf('\n\n')) >= 0) {
+              const event = parseSseEvent(buffer.slice(0, end));
+              buffer = buffer.slice(end + 2);
+              if (event) subscriber.next(event);
+            }
+          }
+          subscriber.complete();
+        })
+        .catch((err) => {
+          if (!controller.signal.aborted) subscriber.error(err);
+        });
+
+      return () => controller.abort();
+    });
+  }
+}
+
+/** Converte um bloco "event: ...\ndata: ..." em AnalysisStreamEvent. */
+function parseSseEvent(block: string): AnalysisStreamEvent | null {
+  let event = 'message';
+  const data: string[] = [];
+  for (const line of block.split('\n')) {
+    if (line.startsWith('event:')) event = line.slice(6).trim();
+    else if (line.startsWith('data:')) data.push(line.slice(5).trimStart());
+  }
+  if (!data.length) return null;
+  return {
+    event: event as AnalysisStreamEvent['event'],
+    data: JSON.parse(data.join('\n')),
+  };
 }
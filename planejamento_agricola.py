@@ -1,7 +1,31 @@
+import argparse
+import base64
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-#from scipy import linalg   # SciPy para álgebra linear
+
+# Álgebra linear e sensibilidade vêm dos serviços do backend (FastAPI):
+# o script e a API usam a mesma implementação (fatoração única, SVD etc.)
+BACKEND_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "agricultural-planning", "backend"
+)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.services.linear_algebra import (  # noqa: E402
+    solve_linear_system, condition_number, compare_regularized_solution
+)
+from app.services.sensitivity import sensitivity_analysis, local_sensitivity_matrix  # noqa: E402
+
+# matplotlib.pyplot/seaborn só são importados pelos gráficos interativos
+# (main); o modo batch renderiza sem interface gráfica pelo backend
 
 
 # ============================================================
@@ -37,26 +61,6 @@ def build_base_model():
     return A, b, profit
 
 
-# ============================================================
-# ÁLGEBRA LINEAR: SOLUÇÃO E CONDICIONAMENTO
-# ============================================================
-
-def solve_linear_system(A, b):
-    """
-    Resolve A x ≈ b em mínimos quadrados.
-    """
-    x, residuals, rank, s = np.linalg.lstsq(A, b, rcond=None)
-    return x
-
-
-def condition_number(A):
-    """
-    Número de condição kappa_2(A) (norma 2).
-    Usa numpy.linalg.cond.
-    """
-    return np.linalg.cond(A, 2)
-
-
 # ============================================================
 # ANÁLISE DE SENSIBILIDADE
 # ============================================================
@@ -83,40 +87,6 @@ def perturb_matrix(A, rel_perturb=0.02, random_state=1):
     return A + delta_A, delta_A
 
 
-def sensitivity_analysis(A, b, rel_perturb=0.05, random_state=0):
-    """
-    Calcula sensibilidade de x em relação a variações em b, com perturbação controlada.
-
-    - Usa SEMPRE a mesma fração relativa rel_perturb.
-    - Isso permite comparar honestamente bem vs mal condicionado.
-    """
-    x_base = solve_linear_system(A, b)
-
-    rng = np.random.default_rng(random_state)
-    noise = rng.normal(size=b.shape)
-    noise = noise / np.linalg.norm(noise)
-    delta_b = rel_perturb * np.linalg.norm(b) * noise
-    b_pert = b + delta_b
-
-    x_pert = solve_linear_system(A, b_pert)
-
-    delta_x = x_pert - x_base
-    rel_dx = np.linalg.norm(delta_x) / np.linalg.norm(x_base)
-    rel_db = np.linalg.norm(delta_b) / np.linalg.norm(b)
-
-    kappa = condition_number(A)
-    bound = kappa * rel_db
-
-    return {
-        "x_base": x_base,
-        "x_pert_b": x_pert,
-        "rel_dx": rel_dx,
-        "rel_db": rel_db,
-        "kappa": kappa,
-        "bound": bound,
-    }
-
-
 # ============================================================
 # MATRIZES BEM E MAL CONDICIONADAS
 # ============================================================
@@ -165,45 +135,13 @@ def demo_conditioning(rel_perturb=0.05):
     return sens_well, sens_ill, A_well, b_well, A_ill, b_ill
 
 
-# ============================================================
-# REGULARIZAÇÃO DE TIKHONOV
-# ============================================================
-
-def tikhonov_regularization(A, b, lam):
-    """
-    Resolve min ||A x - b||^2 + lam ||x||^2.
-    """
-    m, n = A.shape
-    I = np.eye(n)
-    AtA = A.T @ A
-    Atb = A.T @ b
-    x_reg = np.linalg.solve(AtA + lam * I, Atb)
-    return x_reg
-
-
-def compare_regularized_solution(A, b, lam=1.0):
-    """
-    Compara solução normal x_regularizada.
-    """
-    x_normal = solve_linear_system(A, b)
-    x_reg = tikhonov_regularization(A, b, lam)
-    return x_normal, x_reg
-
-
 # ============================================================
 # SENSIBILIDADE LOCAL E HEATMAP (com Seaborn)
 # ============================================================
 
-def local_sensitivity_matrix(A, x):
-    Ax = A @ x
-    norm_Ax = np.linalg.norm(Ax)
-    if norm_Ax == 0:
-        return np.zeros_like(A)
-    S = np.abs(A * x[np.newaxis, :]) / norm_Ax
-    return S
-
-
 def plot_sensitivity_heatmap(S, resource_labels, crop_labels, title):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     plt.figure(figsize=(7, 4))
     sns.heatmap(
         S,
@@ -232,6 +170,7 @@ def plot_base_vs_perturbed(x_base, x_pert, crop_labels):
     """
     Gráfico de barras: áreas base vs áreas com b perturbado.
     """
+    import matplotlib.pyplot as plt
     x_indices = np.arange(len(crop_labels))
     width = 0.35
 
@@ -258,6 +197,7 @@ def plot_sensitivity_well_vs_ill(sens_well, sens_ill):
     Gráfico comparando ||Δb||/||b|| e ||Δx||/||x|| para
     sistema bem e mal condicionado.
     """
+    import matplotlib.pyplot as plt
     labels = ["Bem condicionado", "Mal condicionado"]
     rel_db = [sens_well["rel_db"], sens_ill["rel_db"]]
     rel_dx = [sens_well["rel_dx"], sens_ill["rel_dx"]]
@@ -291,6 +231,7 @@ def plot_normal_vs_regularized(x_normal, x_reg, crop_labels, lam):
     Gráfico de barras: solução normal vs Tikhonov para
     o sistema mal condicionado.
     """
+    import matplotlib.pyplot as plt
     x_indices = np.arange(len(crop_labels))
     width = 0.35
 
@@ -319,6 +260,7 @@ def plot_normal_vs_regularized(x_normal, x_reg, crop_labels, lam):
 # ============================================================
 
 def main():
+    import matplotlib.pyplot as plt
     crop_labels = ["Milho", "Soja", "Trigo"]
     resource_labels = ["Terra", "Mão de obra", "Água", "Fertilizante"]
 
@@ -434,5 +376,325 @@ def main():
     plt.show()
 
 
+# ============================================================
+# MODO BATCH: MUITOS CENÁRIOS EM PARALELO, SEM INTERFACE GRÁFICA
+# ============================================================
+# python planejamento_agricola.py batch cenarios.jsonl --output resultados/ \
+#     [--workers 4] [--chunk-size 64] [--charts heatmap,comparison] [--resume]
+
+# Estágios do grafo de análise do backend calculados por cenário
+BATCH_STAGES = (
+    "sens_base", "kappa", "kappa_scaled", "equilibrated", "profit_base",
+    "profit_pert_pessimistic", "profit_pert_optimistic", "tikhonov",
+)
+BATCH_CHARTS = ("heatmap", "comparison", "sensitivity", "regularization")
+CHART_EXTENSIONS = {"png": "png", "webp": "webp", "svg": "svg", "spec": "json"}
+RESULTS_FILE = "results.jsonl"
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def read_scenarios(path):
+    """
+    Lê cenários de um CSV ou JSON-lines, um por linha, sob demanda.
+
+    JSON-lines: objetos com id, A, b, profit, resources, crops e rel_perturb,
+    todos opcionais (o que faltar vem do modelo base).
+    CSV: colunas id e rel_perturb e entradas avulsas b_<i>, profit_<j> e
+    A_<i>_<j> (índices a partir de 0) que substituem as do modelo base.
+    Linha JSON inválida vira {"id": "linha <n>", "_error": ...}, gravada
+    como erro do cenário sem interromper o lote.
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                yield {k: v for k, v in row.items() if v not in (None, "")}
+        return
+    # Em bytes: UTF-8 inválido também é erro só daquela linha
+    with open(path, "rb") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line.decode("utf-8"))
+            except ValueError as e:
+                yield {"id": f"linha {lineno}", "_error": f"{type(e).__name__}: {e}"}
+                continue
+            if isinstance(row, dict):
+                yield row
+            else:
+                yield {"id": f"linha {lineno}",
+                       "_error": f"esperado um objeto JSON, veio {type(row).__name__}"}
+
+
+def scenario_inputs(row):
+    """
+    A, b, profit e rótulos de um cenário (modelo base + substituições).
+    """
+    A, b, profit = build_base_model()
+    A = np.array(row.get("A", A), dtype=float)
+    b = np.array(row.get("b", b), dtype=float)
+    profit = np.array(row.get("profit", profit), dtype=float)
+    for key, value in row.items():
+        name, _, index = key.partition("_")
+        if name == "b" and index:
+            b[int(index)] = float(value)
+        elif name == "profit" and index:
+            profit[int(index)] = float(value)
+        elif name == "A" and index:
+            i, j = index.split("_")
+            A[int(i), int(j)] = float(value)
+    m, n = A.shape
+    if b.shape != (m,) or profit.shape != (n,):
+        raise ValueError(f"dimensões incompatíveis: A {m}×{n}, b {b.shape}, profit {profit.shape}")
+    resources = row.get("resources") or (
+        ["Terra", "Mão de obra", "Água", "Fertilizante"] if m == 4 else [f"R{i + 1}" for i in range(m)]
+    )
+    crops = row.get("crops") or (
+        ["Milho", "Soja", "Trigo"] if n == 3 else [f"C{j + 1}" for j in range(n)]
+    )
+    return A, b, profit, resources, crops
+
+
+def _jsonable(value):
+    """Arrays e escalares NumPy em tipos JSON (não finitos viram null)."""
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return _jsonable(value.tolist())
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def _write_charts(output_dir, scenario_id, values, charts, chart_format):
+    """Grava os gráficos de um cenário em charts/<id>/; devolve os caminhos relativos."""
+    safe_id = "".join(c if c.isalnum() or c in "-_." else "_" for c in scenario_id)
+    directory = os.path.join("charts", safe_id)
+    os.makedirs(os.path.join(output_dir, directory), exist_ok=True)
+    paths = {}
+    for chart in charts:
+        path = os.path.join(directory, f"{chart}.{CHART_EXTENSIONS[chart_format]}")
+        if chart_format == "spec":
+            content = json.dumps(_jsonable(values[chart]), ensure_ascii=False).encode()
+        else:
+            content = base64.b64decode(values[chart])
+        with open(os.path.join(output_dir, path), "wb") as f:
+            f.write(content)
+        paths[chart] = path
+    return paths
+
+
+def solve_scenario(scenario_id, row, options):
+    """
+    Resolve um cenário com o mesmo grafo de análise da API
+    (fatoração única por cenário, sensibilidade, λ de Tikhonov).
+    """
+    from app.services.pipeline import AnalysisGraph
+    A, b, profit, resources, crops = scenario_inputs(row)
+    rel_perturb = float(row.get("rel_perturb", options["rel_perturb"]))
+    graph = AnalysisGraph(
+        A_base=A, b_base=b, profit=profit, rel_perturb=rel_perturb, mc_options=None,
+        lambda_method=options["lambda_method"], perturb_direction=options["perturb_direction"],
+        equilibrate=options["equilibrate"], resources=resources, crops=crops,
+        chart_format=options["chart_format"],
+    )
+    values = graph.compute(BATCH_STAGES + tuple(options["charts"]))
+    sens, tikhonov = values["sens_base"], values["tikhonov"]
+    result = {
+        "id": scenario_id,
+        "x": sens["x_base"],
+        "profit": values["profit_base"],
+        "profit_pessimistic": values["profit_pert_pessimistic"],
+        "profit_optimistic": values["profit_pert_optimistic"],
+        "kappa": values["kappa"],
+        "rel_dx": sens["rel_dx"],
+        "rel_db": sens["rel_db"],
+        "bound": sens["bound"],
+        "lambda": tikhonov["lambda"],
+        "x_reg": tikhonov["x_reg"],
+    }
+    if values["equilibrated"] is not None:
+        result["equilibrated"] = values["equilibrated"]
+    if values["kappa_scaled"] is not None:
+        result["kappa_scaled"] = values["kappa_scaled"]
+    if options["charts"]:
+        result["charts"] = _write_charts(
+            options["output_dir"], scenario_id, values, options["charts"], options["chart_format"]
+        )
+    return _jsonable(result)
+
+
+def run_batch_chunk(chunk, options):
+    """
+    Resolve um bloco de cenários num processo do pool; devolve as linhas JSON.
+    Erro num cenário vira {"id", "error"} sem interromper o bloco.
+    """
+    lines = []
+    for index, row in chunk:
+        scenario_id = str(row.get("id", index))
+        if "_error" in row:
+            result = {"id": scenario_id, "error": row["_error"]}
+        else:
+            try:
+                result = solve_scenario(scenario_id, row, options)
+            except Exception as e:
+                result = {"id": scenario_id, "error": f"{type(e).__name__}: {e}"}
+        lines.append(json.dumps(result, ensure_ascii=False, allow_nan=False))
+    return lines
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _save_checkpoint(path, checkpoint):
+    # Grava ao lado e renomeia: o checkpoint nunca fica pela metade
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def run_batch(input_path, output_dir, workers=None, chunk_size=64, charts=(),
+              chart_format="png", rel_perturb=0.05, lambda_method="lcurve",
+              perturb_direction="random", equilibrate=False, resume=False, log=print):
+    """
+    Resolve os cenários de `input_path` num pool de processos, em blocos.
+
+    Cada bloco concluído é anexado a results.jsonl (uma linha por cenário)
+    e registrado em checkpoint.json junto com o tamanho do arquivo. Com
+    resume=True, linhas após esse tamanho (bloco interrompido no meio) são
+    descartadas e os blocos já registrados são pulados.
+    """
+    workers = workers or os.cpu_count() or 1
+    options = {
+        "charts": list(charts), "chart_format": chart_format, "rel_perturb": rel_perturb,
+        "lambda_method": lambda_method, "perturb_direction": perturb_direction,
+        "equilibrate": equilibrate, "output_dir": os.path.abspath(output_dir),
+    }
+    # Blocos só são comparáveis com a mesma entrada, opções e tamanho de bloco
+    fingerprint = hashlib.sha256(json.dumps([
+        os.path.abspath(input_path), os.path.getsize(input_path), chunk_size,
+        {k: v for k, v in options.items() if k != "output_dir"},
+    ]).encode()).hexdigest()
+
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = os.path.join(output_dir, RESULTS_FILE)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    checkpoint = {"fingerprint": fingerprint, "input": os.path.abspath(input_path),
+                  "chunk_size": chunk_size, "chunks": [], "offset": 0,
+                  "scenarios": 0, "errors": 0, "complete": False}
+    if os.path.exists(checkpoint_path):
+        if not resume:
+            raise SystemExit(f"{output_dir} já tem um checkpoint: use --resume ou outro --output")
+        with open(checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint["fingerprint"] != fingerprint:
+            raise SystemExit("O checkpoint é de outra entrada ou de outras opções")
+        if checkpoint["complete"]:
+            log(f"Nada a fazer: {checkpoint['scenarios']} cenários já resolvidos")
+            return checkpoint
+    done = set(checkpoint["chunks"])
+
+    started = last_log = time.perf_counter()
+    chunks = (
+        (index, chunk)
+        for index, chunk in enumerate(_chunked(enumerate(read_scenarios(input_path)), chunk_size))
+        if index not in done
+    )
+    with open(results_path, "ab") as out, ProcessPoolExecutor(workers) as pool:
+        # Descarta o que foi escrito depois do último bloco registrado
+        out.truncate(checkpoint["offset"])
+
+        def collect(futures):
+            nonlocal last_log
+            for future in futures:
+                index = pending.pop(future)
+                lines = future.result()
+                out.write("".join(line + "\n" for line in lines).encode("utf-8"))
+                out.flush()
+                os.fsync(out.fileno())
+                checkpoint["chunks"].append(index)
+                checkpoint["offset"] = out.tell()
+                checkpoint["scenarios"] += len(lines)
+                checkpoint["errors"] += sum('"error":' in line for line in lines)
+                _save_checkpoint(checkpoint_path, checkpoint)
+            now = time.perf_counter()
+            if now - last_log >= 1.0:
+                last_log = now
+                log(f"{checkpoint['scenarios']} cenários ({checkpoint['errors']} com erro), "
+                    f"{now - started:.1f} s")
+
+        # No máximo 2 blocos por worker em voo: a entrada é lida aos poucos
+        pending = {}
+        try:
+            for index, chunk in chunks:
+                pending[pool.submit(run_batch_chunk, chunk, options)] = index
+                if len(pending) >= 2 * workers:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            while pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise SystemExit("Interrompido: rode de novo com --resume para continuar")
+
+    checkpoint["complete"] = True
+    _save_checkpoint(checkpoint_path, checkpoint)
+    log(f"Concluído: {checkpoint['scenarios']} cenários em {results_path}")
+    return checkpoint
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Planejamento agrícola: demonstração com gráficos ou cenários em lote."
+    )
+    commands = parser.add_subparsers(dest="command")
+    batch = commands.add_parser(
+        "batch", help="resolve cenários de um CSV/JSON-lines em paralelo, sem interface gráfica"
+    )
+    batch.add_argument("input", help="cenários (.csv ou .jsonl)")
+    batch.add_argument("--output", required=True, help="diretório de resultados")
+    batch.add_argument("--workers", type=int, default=None, help="processos (padrão: nº de CPUs)")
+    batch.add_argument("--chunk-size", type=int, default=64, help="cenários por bloco")
+    batch.add_argument("--charts", default="",
+                       help=f"gráficos por cenário, separados por vírgula ({', '.join(BATCH_CHARTS)})")
+    batch.add_argument("--chart-format", choices=tuple(CHART_EXTENSIONS), default="png")
+    batch.add_argument("--rel-perturb", type=float, default=0.05)
+    batch.add_argument("--lambda-method", choices=("lcurve", "gcv"), default="lcurve")
+    batch.add_argument("--perturb-direction", choices=("random", "worst"), default="random")
+    batch.add_argument("--equilibrate", action="store_true",
+                       help="equilibra linhas e colunas de A antes de fatorar")
+    batch.add_argument("--resume", action="store_true", help="continua a partir do checkpoint")
+    args = parser.parse_args(argv)
+
+    if args.command != "batch":
+        main()
+        return 0
+    charts = tuple(c.strip() for c in args.charts.split(",") if c.strip())
+    unknown = [c for c in charts if c not in BATCH_CHARTS]
+    if unknown:
+        parser.error(f"gráficos desconhecidos: {', '.join(unknown)}")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size deve ser positivo")
+    run_batch(
+        args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+        charts=charts, chart_format=args.chart_format, rel_perturb=args.rel_perturb,
+        lambda_method=args.lambda_method, perturb_direction=args.perturb_direction,
+        equilibrate=args.equilibrate, resume=args.resume,
+    )
+    return 0
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())